@@ -49,10 +49,42 @@ def create_app():
         'max_overflow': 10,
     }
     
+    # Server tomonidagi javob keshi (analitika endpointlari); RESPONSE_CACHE=0 bilan o'chiriladi
+    app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE', '1') != '0'
+    app.config['RESPONSE_CACHE_TTL'] = int(os.getenv('RESPONSE_CACHE_TTL', '300'))
+    # Ro'yxat va dashboard GET'lari uchun ETag / 304; CONDITIONAL_GET=0 bilan o'chiriladi
+    app.config['CONDITIONAL_GET_ENABLED'] = os.getenv('CONDITIONAL_GET', '1') != '0'
+    # Mustaqil o'qish so'rovlarini alohida ulanishlarda parallel bajarish (ixtiyoriy, app/parallel.py).
+    # Parallel ulanishlar jarayon bo'yicha PARALLEL_QUERY_MAX_CONNECTIONS bilan cheklanadi (pool_size + max_overflow dan kichik)
+    app.config['PARALLEL_QUERIES'] = os.getenv('PARALLEL_QUERIES', '0') == '1'
+    app.config['PARALLEL_QUERY_MAX_CONNECTIONS'] = int(os.getenv('PARALLEL_QUERY_MAX_CONNECTIONS', '4'))
+    # Bulk importda bitta ko'p qatorli INSERT + commit dagi qatorlar soni
+    app.config['BULK_IMPORT_CHUNK_SIZE'] = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '1000'))
+    # GET /api/changes: id teshigi shu soniyadan eski bo'lsa rollback deb hisoblanadi (eng uzun yozuv tranzaksiyasidan katta)
+    app.config['CHANGES_SAFE_LAG'] = int(os.getenv('CHANGES_SAFE_LAG', '30'))
+    # POST /api/sales uchun write-behind navbati (ixtiyoriy): savdolar paketlab, bitta commit bilan yoziladi
+    app.config['SALES_WRITE_BEHIND'] = os.getenv('SALES_WRITE_BEHIND', '0') == '1'
+    app.config['SALES_WRITE_BEHIND_MAX_BATCH'] = int(os.getenv('SALES_WRITE_BEHIND_MAX_BATCH', '500'))
+    app.config['SALES_WRITE_BEHIND_MAX_DELAY_MS'] = int(os.getenv('SALES_WRITE_BEHIND_MAX_DELAY_MS', '200'))
+    # JSON javoblar orjson orqali (o'rnatilgan bo'lsa); FAST_JSON=0 — standart json
+    app.config['FAST_JSON'] = os.getenv('FAST_JSON', '1') != '0'
+    # PostgreSQL: sales jadvalini oylik bo'limlarga ajratish (ixtiyoriy, app/partitions.py)
+    app.config['SALES_PARTITIONING'] = os.getenv('SALES_PARTITIONING', '0') == '1'
+    app.config['SALES_PARTITION_MONTHS_AHEAD'] = int(os.getenv('SALES_PARTITION_MONTHS_AHEAD', '3'))
+    # Saqlanmagan yopilgan oylar o'qilganda snapshotlarni fon thread'ida qurish; SNAPSHOT_AUTO_BUILD=0 — faqat build_snapshots.py
+    app.config['SNAPSHOT_AUTO_BUILD'] = os.getenv('SNAPSHOT_AUTO_BUILD', '1') != '0'
+    
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
     CORS(app)
+    from app import cache, watermark, changes, spatial, write_behind, json_provider
+    json_provider.init_app(app)
+    cache.init_app(app)
+    watermark.init_app(app)
+    changes.init_app(app)
+    spatial.init_app(app)
+    write_behind.init_app(app)
     
     # JWT error handlers
     @jwt.expired_token_loader
@@ -81,6 +113,8 @@ def create_app():
     from app.routes.config import config_bp
     from app.routes.regions import regions_bp
     from app.routes.shops import shops_bp
+    from app.routes.changes import changes_bp
+    from app.routes.geo import geo_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
@@ -92,6 +126,8 @@ def create_app():
     app.register_blueprint(config_bp, url_prefix='/api/config')
     app.register_blueprint(regions_bp, url_prefix='/api/regions')
     app.register_blueprint(shops_bp, url_prefix='/api/shops')
+    app.register_blueprint(changes_bp, url_prefix='/api/changes')
+    app.register_blueprint(geo_bp, url_prefix='/api/geo')
     
     # Serve frontend HTML files
     @app.route('/')
@@ -106,6 +142,7 @@ def create_app():
         return app.send_static_file(filename)
     
     # Create tables (va MySQL da eski jadvallarga ustun qo'shish)
+    from app import migrations
     with app.app_context():
         try:
             db.create_all()
@@ -130,6 +167,21 @@ def create_app():
                         db.session.rollback()
                         if 'Duplicate column' not in str(e):
                             print(f"  ⚠️  sales.{col}: {e}")
+            # Versiyalangan migratsiyalar (indekslar, sales.client_key va h.k.) — app/migrations.py.
+            # Xatosi yutilmaydi: masalan, client_key unikal indeksisiz sync idempotent emas
+            for version, name in migrations.upgrade():
+                print(f"  ✅ Migratsiya {version}: {name}")
+            from app import partitions
+            partitions.init_layout(app)
+            # Kunlik rollup bo'sh bo'lsa (yangi jadval) — mavjud savdolardan bir marta quriladi
+            from app import rollup
+            if rollup.ensure_populated():
+                print("  ✅ sales_daily_rollup qayta qurildi")
+            watermark.ensure_rows()
+        except migrations.MigrationError as e:
+            print(f"❌ {e}")
+            print("   Sababini tuzating va ilovani qayta ishga tushiring")
+            raise
         except Exception as e:
             print(f"⚠️  Database xatosi: {e}")
             if os.getenv('DATABASE_URL'):
@@ -0,0 +1,324 @@
+"""
+Savdo analitikasi uchun umumiy agregatsiya qatlami.
+
+Dashboard va boshqa statistik endpointlar bir xil `sales` jadvalini turli
+davrlar bo'yicha qayta-qayta yig'ardi. Bu yerda barcha davr bo'laklari
+(kun, oy, yil, o'tgan oy, jami) bitta SELECT ichida shartli SUM orqali
+hisoblanadi. O'qish `sales_daily_rollup` jadvalidan (app/rollup.py) — uning
+hajmi kunlar × mahsulotlar × mijozlar soniga bog'liq, xom savdolar soniga emas.
+"""
+from datetime import date, timedelta
+from calendar import monthrange
+from sqlalchemy import func, case, select, extract
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app import db, snapshots
+from app.models import Sale, Product, Customer, SalesDailyRollup as R
+
+# FILTER (WHERE ...) ni qo'llab-quvvatlaydigan dialektlar; MySQL da CASE ishlatiladi
+_FILTER_DIALECTS = ('postgresql', 'sqlite')
+
+
+def profit_expr():
+    """Foyda: saqlangan profit bor bo'lsa shuni, yo'q bo'lsa amount - (tan narxi * miqdor)"""
+    return func.coalesce(Sale.profit, Sale.amount - (Product.purchase_price * Sale.quantity))
+
+
+def _supports_filter():
+    return db.engine.dialect.name in _FILTER_DIALECTS
+
+
+def sum_if(expr, condition, use_filter=None):
+    """
+    Shartli yig'indi: PostgreSQL/SQLite da SUM(x) FILTER (WHERE ...),
+    MySQL da SUM(CASE WHEN ... THEN x END). Natija ikkalasida ham bir xil (mos qator bo'lmasa NULL).
+    """
+    if use_filter is None:
+        use_filter = _supports_filter()
+    if use_filter:
+        return func.sum(expr).filter(condition)
+    return func.sum(case((condition, expr)))
+
+
+def period_bounds(today):
+    """Dashboard davrlari: bugun, joriy oy, joriy yil va o'tgan oy chegaralari"""
+    this_month_start = today.replace(day=1)
+    last_month_end = this_month_start - timedelta(days=1)
+    return {
+        'today': today,
+        'this_month_start': this_month_start,
+        'this_year_start': today.replace(month=1, day=1),
+        'last_month_start': last_month_end.replace(day=1),
+        'last_month_end': last_month_end,
+    }
+
+
+def _entity_counts(active_only=True):
+    """Mijozlar va faol mahsulotlar soni — asosiy SELECT ga skalyar subquery sifatida qo'shiladi"""
+    customers = select(func.count(Customer.id)).scalar_subquery()
+    products_q = select(func.count(Product.id))
+    if active_only:
+        products_q = products_q.where(Product.status == 'active')
+    return customers.label('customers_count'), products_q.scalar_subquery().label('products_count')
+
+
+def sales_summary(today, use_filter=None):
+    """
+    /api/dashboard/stats uchun barcha ko'rsatkichlar — bitta so'rov, rollup ustidan bitta o'tish.
+    Qaytaradi: dict (xom qiymatlar — Decimal/None), jadval bo'sh bo'lsa ham bitta qator.
+    """
+    b = period_bounds(today)
+    in_today = R.sale_date == b['today']
+    in_month = (R.sale_date >= b['this_month_start']) & (R.sale_date <= b['today'])
+    in_year = (R.sale_date >= b['this_year_start']) & (R.sale_date <= b['today'])
+    in_last_month = (R.sale_date >= b['last_month_start']) & (R.sale_date <= b['last_month_end'])
+
+    columns = [
+        sum_if(R.amount, in_today, use_filter).label('daily_sales'),
+        sum_if(R.amount, in_month, use_filter).label('monthly_sales'),
+        sum_if(R.amount, in_year, use_filter).label('yearly_sales'),
+        func.sum(R.amount).label('total_revenue'),
+        sum_if(R.quantity, in_month, use_filter).label('total_quantity_sold'),
+        func.sum(R.quantity).label('total_quantity_sold_all_time'),
+        sum_if(R.amount, in_last_month, use_filter).label('last_month_sales'),
+        sum_if(R.profit, in_month, use_filter).label('monthly_profit'),
+        func.sum(R.profit).label('total_profit'),
+        func.sum(R.sales_count).label('total_sales_count'),
+    ]
+
+    def run(active_only):
+        return db.session.query(*columns, *_entity_counts(active_only)).select_from(R).one()._asdict()
+
+    try:
+        return run(True)
+    except (OperationalError, ProgrammingError):
+        # Eski bazalarda products.status ustuni bo'lmasligi mumkin
+        db.session.rollback()
+        return run(False)
+
+
+def iter_months(start_year, start_month, end_year, end_month):
+    """(yil, oy) juftliklarini boshidan oxirigacha (ikkalasi ham kiradi) qaytaradi"""
+    y, m = start_year, start_month
+    while (y, m) <= (end_year, end_month):
+        yield y, m
+        m += 1
+        if m > 12:
+            m, y = 1, y + 1
+
+
+def monthly_series(today, year=None):
+    """
+    Oylik savdo, foyda va savdolar soni.
+
+    year berilsa: shu yilning 12 oyi (Yanvar–Dekabr);
+    year=None: birinchi sotuvdan joriy oygacha har oy (period=all).
+    Yopilgan oylarning jamilari saqlangan snapshotlardan (app/snapshots.py) olinadi;
+    qolgan oylar (ochiq va hali saqlanmagan) bitta GROUP BY (yil, oy) so'rovi bilan
+    jonli hisoblanadi.
+    Savdo bo'lmagan oylar nol bilan to'ldiriladi.
+    Qaytaradi: [{'month': 'YYYY-MM', 'sales': float, 'profit': float, 'count': int}, ...]
+    """
+    if year is not None:
+        months = list(iter_months(year, 1, year, 12))
+    else:
+        first = db.session.query(func.min(R.sale_date)).scalar()
+        if first is None:
+            return []
+        months = list(iter_months(first.year, first.month, today.year, today.month))
+    if not months:
+        return []
+
+    stored = snapshots.stored_totals(months, today)
+    buckets = {
+        ym: {'sales': snap['total_sales'], 'profit': snap['total_profit'], 'count': snap['sales_count']}
+        for ym, snap in stored.items()
+    }
+    open_months = [ym for ym in months if ym not in stored]
+    if open_months:
+        y_col = extract('year', R.sale_date)
+        m_col = extract('month', R.sale_date)
+        first_open, last_open = open_months[0], open_months[-1]
+        rows = db.session.query(
+            y_col.label('y'),
+            m_col.label('m'),
+            func.sum(R.amount).label('sales'),
+            func.sum(R.profit).label('profit'),
+            func.sum(R.sales_count).label('count'),
+        ).filter(
+            R.sale_date >= date(first_open[0], first_open[1], 1),
+            R.sale_date <= date(last_open[0], last_open[1], monthrange(last_open[0], last_open[1])[1])
+        ).group_by(y_col, m_col).all()
+        for r in rows:
+            buckets[(int(r.y), int(r.m))] = {
+                'sales': float(r.sales or 0), 'profit': float(r.profit or 0), 'count': int(r.count or 0)
+            }
+
+    series = []
+    for y, m in months:
+        b = buckets.get((y, m), {})
+        series.append({
+            'month': f'{y}-{m:02d}',
+            'sales': float(b.get('sales', 0.0)),
+            'profit': float(b.get('profit', 0.0)),
+            'count': int(b.get('count', 0)),
+        })
+    return series
+
+
+def _in_range(q, start=None, end=None):
+    if start is not None:
+        q = q.filter(R.sale_date >= start)
+    if end is not None:
+        q = q.filter(R.sale_date <= end)
+    return q
+
+
+def period_totals(start=None, end=None):
+    """Davr bo'yicha jami summa, miqdor, savdolar soni va foyda — bitta so'rov"""
+    q = db.session.query(
+        func.sum(R.amount).label('amount'),
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.sales_count).label('count'),
+        func.sum(R.profit).label('profit'),
+    )
+    return _in_range(q, start, end).one()
+
+
+def daily_totals(start=None, end=None):
+    """Kunlik summa, miqdor va savdolar soni (sana bo'yicha tartiblangan)"""
+    q = db.session.query(
+        R.sale_date,
+        func.sum(R.amount).label('amount'),
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.sales_count).label('count'),
+    )
+    return _in_range(q, start, end).group_by(R.sale_date).order_by(R.sale_date).all()
+
+
+def top_products(limit=10, start=None, end=None, order_by='quantity'):
+    """Eng ko'p sotilgan mahsulotlar: id, name, total_quantity, total_amount"""
+    total_quantity = func.sum(R.quantity)
+    total_amount = func.sum(R.amount)
+    q = db.session.query(
+        Product.id,
+        Product.name,
+        total_quantity.label('total_quantity'),
+        total_amount.label('total_amount')
+    ).join(R, R.product_id == Product.id)
+    q = _in_range(q, start, end).group_by(Product.id, Product.name)
+    return q.order_by((total_amount if order_by == 'amount' else total_quantity).desc()).limit(limit).all()
+
+
+def top_customers(limit=10, start=None, end=None, order_by='amount'):
+    """Eng ko'p xarid qilgan mijozlar: id, name, additional_name, total_quantity, total_amount"""
+    total_quantity = func.sum(R.quantity)
+    total_amount = func.sum(R.amount)
+    q = db.session.query(
+        Customer.id,
+        Customer.name,
+        Customer.additional_name,
+        total_quantity.label('total_quantity'),
+        total_amount.label('total_amount')
+    ).join(R, R.customer_id == Customer.id)
+    q = _in_range(q, start, end).group_by(Customer.id, Customer.name, Customer.additional_name)
+    return q.order_by((total_quantity if order_by == 'quantity' else total_amount).desc()).limit(limit).all()
+
+
+def region_sales(start=None, end=None):
+    """
+    Hudud (poligon, customers.geo_region_id) bo'yicha savdo: region_id, total_amount, total_quantity,
+    sales_count, customers_count — rollup + customers, bitta JOIN. region_id None — hududsiz mijozlar
+    """
+    q = db.session.query(
+        Customer.geo_region_id.label('region_id'),
+        func.sum(R.amount).label('total_amount'),
+        func.sum(R.quantity).label('total_quantity'),
+        func.sum(R.sales_count).label('sales_count'),
+        func.count(func.distinct(R.customer_id)).label('customers_count'),
+    ).join(Customer, R.customer_id == Customer.id)
+    return _in_range(q, start, end).group_by(Customer.geo_region_id).order_by(func.sum(R.amount).desc()).all()
+
+
+TIMESERIES_GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+TIMESERIES_METRICS = ('amount', 'quantity', 'profit', 'count')
+
+
+def _add_months(d, months):
+    total = d.year * 12 + (d.month - 1) + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def bucket_start(d, granularity, end):
+    """
+    Sana tushadigan bo'lak boshlanishi. Hafta — `end` da tugaydigan 7 kunlik oynalar
+    (weekly-sales bilan bir xil); oy/chorak/yil — kalendar bo'yicha.
+    """
+    if granularity == 'day':
+        return d
+    if granularity == 'week':
+        return end - timedelta(days=((end - d).days // 7) * 7 + 6)
+    if granularity == 'month':
+        return date(d.year, d.month, 1)
+    if granularity == 'quarter':
+        return date(d.year, 3 * ((d.month - 1) // 3) + 1, 1)
+    return date(d.year, 1, 1)
+
+
+def bucket_end(start, granularity):
+    """Bo'lakning oxirgi kuni (ichiga kiradi)"""
+    if granularity == 'day':
+        return start
+    if granularity == 'week':
+        return start + timedelta(days=6)
+    months = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+    return _add_months(start, months) - timedelta(days=1)
+
+
+def iter_buckets(granularity, start, end):
+    """start..end oralig'ini qoplaydigan bo'lak boshlanishlari"""
+    current = bucket_start(start, granularity, end)
+    while current <= end:
+        yield current
+        current = bucket_end(current, granularity) + timedelta(days=1)
+
+
+def timeseries(granularity, start, end, product_id=None, customer_id=None):
+    """
+    Ixtiyoriy granularlikdagi vaqt qatori — oraliq uzunligidan qat'i nazar bitta GROUP BY so'rovi.
+
+    Kun va hafta uchun rollup sana bo'yicha, oy/chorak/yil uchun (yil, oy) bo'yicha
+    guruhlanadi; haftalar va chorak/yillar Python tomonida shu qatorlardan yig'iladi
+    (MySQL/PostgreSQL/SQLite da bir xil ishlaydi). Bo'sh bo'laklar nol bilan to'ldiriladi.
+    Qaytaradi: [{'start': date, 'end': date, 'amount', 'quantity', 'profit', 'count'}, ...]
+    """
+    if granularity in ('day', 'week'):
+        keys = [R.sale_date]
+    else:
+        keys = [extract('year', R.sale_date).label('y'), extract('month', R.sale_date).label('m')]
+    q = db.session.query(
+        *keys,
+        func.sum(R.amount).label('amount'),
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.profit).label('profit'),
+        func.sum(R.sales_count).label('count'),
+    ).filter(R.sale_date >= start, R.sale_date <= end)
+    if product_id is not None:
+        q = q.filter(R.product_id == product_id)
+    if customer_id is not None:
+        q = q.filter(R.customer_id == customer_id)
+    rows = q.group_by(*keys).all()
+
+    buckets = {
+        b: {'start': b, 'end': bucket_end(b, granularity), 'amount': 0.0, 'quantity': 0, 'profit': 0.0, 'count': 0}
+        for b in iter_buckets(granularity, start, end)
+    }
+    for r in rows:
+        d = r.sale_date if granularity in ('day', 'week') else date(int(r.y), int(r.m), 1)
+        point = buckets.get(bucket_start(d, granularity, end))
+        if point is None:
+            continue
+        point['amount'] += float(r.amount or 0)
+        point['quantity'] += int(r.quantity or 0)
+        point['profit'] += float(r.profit or 0)
+        point['count'] += int(r.count or 0)
+    return [buckets[b] for b in sorted(buckets)]
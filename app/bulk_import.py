@@ -0,0 +1,147 @@
+"""
+Savdolarni ommaviy import qilish (tarixiy ma'lumotlar).
+
+Qator bo'yicha ORM obyektlari va har qator uchun Customer/Product so'rovi o'rniga:
+1. Paketdagi barcha customer_id/product_id ikkita IN so'rovi bilan tekshiriladi;
+2. unit_price, purchase_price_at_sale va profit butun paket uchun bir o'tishda hisoblanadi;
+3. Qatorlar bo'laklab (chunk) ko'p qatorli INSERT bilan yoziladi, har bo'lak alohida commit —
+   100k qatorli import bitta ulkan tranzaksiya bo'lmaydi. Rollup, ETag hisoblagichi,
+   o'zgarishlar jurnali va javob keshi har bo'lak bilan birga yangilanadi.
+
+Qator xatolari avvalgidek: "Qator N: ...".
+"""
+from datetime import datetime
+from app import db, rollup, watermark, cache, changes
+from app.models import Sale, Customer, Product
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def prefetch(rows):
+    """Paketdagi mijoz va mahsulotlar: ({customer_id}, {product_id: purchase_price}) — ikkita IN so'rovi"""
+    customer_ids, product_ids = set(), set()
+    for row in rows:
+        if isinstance(row, dict):
+            customer_ids.add(_as_id(row.get('customer_id')))
+            product_ids.add(_as_id(row.get('product_id')))
+    customer_ids.discard(None)
+    product_ids.discard(None)
+    customers = {
+        cid for (cid,) in db.session.query(Customer.id).filter(Customer.id.in_(customer_ids)).all()
+    } if customer_ids else set()
+    products = {
+        pid: price for pid, price in db.session.query(Product.id, Product.purchase_price).filter(
+            Product.id.in_(product_ids)
+        ).all()
+    } if product_ids else {}
+    return customers, products
+
+
+class RowError(ValueError):
+    """Qator tekshiruvdan o'tmadi (xabar foydalanuvchiga ko'rsatiladi)"""
+
+
+def row_values(sale_data, customers, products, today):
+    """Bitta qatorni tekshiradi va INSERT qiymatlarini qaytaradi; xato bo'lsa RowError (yoki boshqa istisno)"""
+    if not sale_data.get('customer_id') or not sale_data.get('product_id') or not sale_data.get('amount'):
+        raise RowError('customer_id, product_id va amount kiritilishi shart')
+
+    customer_id = _as_id(sale_data['customer_id'])
+    product_id = _as_id(sale_data['product_id'])
+    if customer_id not in customers:
+        raise RowError(f'Mijoz topilmadi (ID: {sale_data["customer_id"]})')
+    if product_id not in products:
+        raise RowError(f'Mahsulot topilmadi (ID: {sale_data["product_id"]})')
+
+    sale_date = today
+    if sale_data.get('sale_date'):
+        try:
+            sale_date = datetime.strptime(sale_data['sale_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise RowError('Noto\'g\'ri sana formati')
+
+    quantity = sale_data.get('quantity', 1)
+    amount = float(sale_data['amount'])
+    purchase_price_at_sale = sale_data.get('purchase_price_at_sale')
+    if purchase_price_at_sale is not None:
+        purchase_price_at_sale = float(purchase_price_at_sale)
+    elif products[product_id] is not None:
+        purchase_price_at_sale = float(products[product_id])
+    else:
+        purchase_price_at_sale = 0
+    return {
+        'customer_id': customer_id,
+        'product_id': product_id,
+        'quantity': quantity,
+        'amount': amount,
+        'unit_price': round(amount / quantity, 2) if quantity else 0,
+        'purchase_price_at_sale': purchase_price_at_sale,
+        'profit': round(amount - (purchase_price_at_sale * quantity), 2),
+        'sale_date': sale_date,
+        'created_at': datetime.utcnow(),
+    }
+
+
+def prepare(rows, first_index=1):
+    """
+    Qatorlarni tekshiradi va INSERT uchun qiymatlarga aylantiradi.
+    Qaytaradi: (values, errors) — values: [(qator raqami, {ustun: qiymat}), ...]
+    first_index — xabarlardagi birinchi qator raqami (oqimli importda davom etadi).
+    """
+    customers, products = prefetch(rows)
+    today = datetime.now().date()
+    values, errors = [], []
+    for idx, sale_data in enumerate(rows, start=first_index):
+        try:
+            values.append((idx, row_values(sale_data, customers, products, today)))
+        except Exception as e:
+            errors.append(f'Qator {idx}: {str(e)}')
+    return values, errors
+
+
+def _rollup_change(v):
+    key = (v['sale_date'], v['product_id'], v['customer_id'])
+    return (key, [float(v['amount']), int(v['quantity'] or 0), float(v['profit']), 1]), 1
+
+
+def _insert_returning_ids(table, rows):
+    """Ko'p qatorli INSERT; qaytaradi: yangi qatorlar id'lari"""
+    if db.engine.dialect.insert_executemany_returning:
+        # PostgreSQL, SQLite: INSERT ... RETURNING id
+        return db.session.execute(table.insert().returning(table.c.id), rows).scalars().all()
+    # MySQL: bitta ko'p qatorli INSERT ("simple insert") id'lari ketma-ket ajratiladi,
+    # LAST_INSERT_ID() — birinchisi
+    first = db.session.execute(table.insert().values(rows)).lastrowid
+    return list(range(first, first + len(rows)))
+
+
+def insert(values, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    prepare() qiymatlarini bo'laklab yozadi; har bo'lak — bitta ko'p qatorli INSERT + rollup + commit.
+    Qaytaradi: (yozilgan qatorlar soni, bo'lak xatolari)
+    """
+    created, errors = 0, []
+    table = Sale.__table__
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        rows = [v for _, v in chunk]
+        try:
+            ids = _insert_returning_ids(table, rows)
+            rollup.apply([_rollup_change(v) for v in rows])
+            changes.record_inserts(Sale, ids)
+            watermark.touch('sales')
+            cache.mark_dirty(db.session)
+            db.session.commit()
+            created += len(rows)
+        except Exception as e:
+            db.session.rollback()
+            errors.append(f'Qatorlar {chunk[0][0]}-{chunk[-1][0]}: {str(e)}')
+    return created, errors
+
@@ -0,0 +1,158 @@
+"""
+Server tomonidagi javob keshi (analitika endpointlari uchun).
+
+Kalit: endpoint yo'li + tartiblangan query parametrlar + bugungi sana.
+Keshdagi javob quyidagilar bilan saqlanadi va ulardan biri o'zgarsa eskiradi:
+- jarayon ichidagi ma'lumot avlodi (generation) — shu jarayonda savdo, mahsulot,
+  mijoz, do'kon yoki hudud yozuvi commit qilinganda oshadi;
+- umumiy data_versions hisoblagichlari (app/watermark.py) — boshqa worker/jarayon
+  yozuvlarini ham ko'radi; har so'rovda bitta PK so'rov;
+- RESPONSE_CACHE_TTL soniya — hisoblagichni chetlab o'tgan yozuvlar uchun chegara.
+
+Kesh jarayon ichida (gunicorn worker) saqlanadi; bir nechta worker bo'lsa
+har biri o'z keshiga ega, lekin hisoblagichlar tufayli eskisini bermaydi.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import request, current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from app import db, watermark
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_state = {'generation': 0, 'hits': 0, 'misses': 0, 'invalidations': 0}
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 300  # soniya
+
+
+def generation():
+    """Joriy ma'lumot avlodi"""
+    return _state['generation']
+
+
+def bump():
+    """Ma'lumot o'zgardi — avlodni oshiradi va keshni tozalaydi"""
+    with _lock:
+        _state['generation'] += 1
+        _state['invalidations'] += 1
+        _entries.clear()
+
+
+def clear():
+    """Keshni va hisoblagichlarni tozalaydi"""
+    with _lock:
+        _entries.clear()
+        _state.update(hits=0, misses=0, invalidations=0)
+
+
+def stats():
+    """Kesh hisoblagichlari: hits, misses, hit_ratio, entries, generation"""
+    with _lock:
+        total = _state['hits'] + _state['misses']
+        return {
+            'enabled': current_app.config.get('RESPONSE_CACHE_ENABLED', True),
+            'generation': _state['generation'],
+            'hits': _state['hits'],
+            'misses': _state['misses'],
+            'invalidations': _state['invalidations'],
+            'hit_ratio': round(_state['hits'] / total, 4) if total else 0.0,
+            'entries': len(_entries),
+        }
+
+
+def _cache_key():
+    args = tuple(sorted((k, v) for k, vs in request.args.lists() for v in vs))
+    return request.path, args, date.today().isoformat()
+
+
+def _versions():
+    """Umumiy hisoblagichlar (kortej) yoki None — data_versions hali yo'q bo'lsa"""
+    try:
+        return tuple(sorted(watermark.current(list(watermark.TRACKED.values())).items()))
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        return None
+
+
+def cached(view):
+    """
+    GET javobini keshlaydi. @jwt_required() dan keyin qo'yiladi (avtorizatsiya har doim tekshiriladi).
+    Faqat 200 javoblar saqlanadi; so'rov davomida DB rollback bo'lsa (xatolik holati) saqlanmaydi.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+            return view(*args, **kwargs)
+        key = _cache_key()
+        versions = _versions()
+        now = time.monotonic()
+        ttl = current_app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+        with _lock:
+            entry = _entries.get(key)
+            if (entry is not None and entry[0] == _state['generation'] and entry[1] == versions
+                    and now - entry[2] < ttl):
+                _entries.move_to_end(key)
+                _state['hits'] += 1
+                return current_app.response_class(entry[3], status=200, mimetype='application/json')
+            _state['misses'] += 1
+            gen = _state['generation']
+
+        g.response_cache_skip = False
+        rv = current_app.make_response(view(*args, **kwargs))
+        if rv.status_code == 200 and not g.response_cache_skip and rv.mimetype == 'application/json':
+            max_entries = current_app.config.get('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+            with _lock:
+                # Hisoblash davomida yozuv bo'lgan bo'lsa — eski natijani saqlamaymiz
+                if gen == _state['generation']:
+                    _entries[key] = (gen, versions, now, rv.get_data())
+                    _entries.move_to_end(key)
+                    while len(_entries) > max_entries:
+                        _entries.popitem(last=False)
+        return rv
+    return wrapper
+
+
+def mark_dirty(session):
+    """ORM'siz (Core INSERT/UPDATE) yozuv — shu session commit bo'lganda kesh avlodi oshadi"""
+    session.info['response_cache_dirty'] = True
+
+
+def _tracked_models():
+    from app.models import Sale, OnlineSale, Product, Customer, Shop, Region
+    return (Sale, OnlineSale, Product, Customer, Shop, Region)
+
+
+def _after_flush(session, flush_context):
+    tracked = _tracked_models()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, tracked):
+            session.info['response_cache_dirty'] = True
+            return
+
+
+def _after_commit(session):
+    if session.info.pop('response_cache_dirty', False):
+        bump()
+
+
+def _after_rollback(session):
+    session.info.pop('response_cache_dirty', None)
+    if has_request_context():
+        g.response_cache_skip = True
+
+
+def init_app(app):
+    """Sozlamalar va SQLAlchemy session hodisalarini ro'yxatdan o'tkazadi (bir marta)"""
+    app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+    app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    app.config.setdefault('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
@@ -0,0 +1,146 @@
+"""
+O'zgarishlar jurnali (change_log) — mijozlar lokal nusxani to'liq ro'yxatni qayta
+yuklamasdan yangilab turishi uchun (GET /api/changes).
+
+sales, products, customers jadvallaridagi har yaratish/yangilash/o'chirish shu tranzaksiya
+ichida jurnalga yoziladi: ORM orqali — after_flush hodisasida (watermark kabi), Core
+ko'p qatorli INSERT (app/bulk_import.py) — record_inserts() bilan yangi id'lar bo'yicha.
+
+Jurnal id'si — cursor. Mijoz oxirgi cursor'dan keyingi o'zgarishlarni tartib bilan oladi:
+upsert (qatorning joriy holati bilan) yoki delete (tombstone). Sahifa ichida bir qator
+bir necha marta o'zgargan bo'lsa, faqat oxirgisi qaytariladi.
+
+id INSERT paytida ajratiladi, commit tartibi boshqa bo'lishi mumkin: A tranzaksiyasi 10 ni,
+B 11 ni oladi va B birinchi commit qiladi — shu orada so'ragan mijoz 11 dan o'tib ketsa,
+10 ni hech qachon ko'rmaydi. Shuning uchun cursor faqat xavfsiz chegaragacha suriladi:
+id ketma-ketligidagi teshik (hali commit qilinmagan yoki rollback bo'lgan id) undan keyingi
+yozuv SAFE_LAG dan yangi bo'lsa, sahifa teshik oldida to'xtaydi. Eskirgan teshik rollback
+(yoki ajratilib ishlatilmagan id) deb hisoblanadi. CHANGES_SAFE_LAG eng uzun yozuv
+tranzaksiyasidan katta bo'lishi kerak; takroriy upsert mijoz uchun zararsiz.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db
+from app.models import ChangeLog, Sale, Product, Customer
+
+TRACKED = {Sale: 'sales', Product: 'products', Customer: 'customers'}
+TABLES = tuple(TRACKED.values())
+UPSERT = 'upsert'
+DELETE = 'delete'
+DEFAULT_SAFE_LAG = 30  # soniya
+LATEST_SCAN = 1000     # latest_cursor: ko'rib chiqiladigan oxirgi yozuvlar
+
+
+def _after_flush(session, flush_context):
+    now = datetime.utcnow()
+    rows = [
+        {'table_name': TRACKED[type(obj)], 'row_id': obj.id, 'op': op, 'changed_at': now}
+        for objects, op in ((session.new, UPSERT), (session.dirty, UPSERT), (session.deleted, DELETE))
+        for obj in objects
+        if type(obj) in TRACKED and (op != UPSERT or obj in session.new or session.is_modified(obj))
+    ]
+    if rows:
+        session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+def record_inserts(model, ids):
+    """Core INSERT dan keyin (shu tranzaksiyada): yangi qatorlar (ids) upsert sifatida"""
+    record_updates(model, ids)
+
+
+def record_updates(model, ids):
+    """Core UPDATE dan keyin (shu tranzaksiyada): o'zgargan qatorlar upsert sifatida"""
+    if ids:
+        now = datetime.utcnow()
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {'table_name': TRACKED[model], 'row_id': row_id, 'op': UPSERT, 'changed_at': now} for row_id in ids
+        ])
+
+
+def _cutoff():
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('CHANGES_SAFE_LAG', DEFAULT_SAFE_LAG))
+
+
+def _settled(entries, since, cutoff):
+    """
+    entries (id o'sish tartibida) ning xavfsiz boshlang'ich qismi: since dan keyingi id'lar
+    ketma-ketligida yangi (cutoff dan keyingi) yozuv oldida teshik bo'lsa — shu yerda to'xtaydi
+    """
+    expected = since + 1
+    for i, entry in enumerate(entries):
+        if entry.id != expected and entry.changed_at is not None and entry.changed_at > cutoff:
+            return entries[:i]
+        expected = entry.id + 1
+    return entries
+
+
+def latest_cursor():
+    """
+    Boshlang'ich cursor (to'liq ro'yxatni yuklashdan oldin): commit qilinmagan bo'lishi mumkin
+    bo'lgan id'lardan oldingi eng katta id. Oxirgi LATEST_SCAN yozuvning hammasi yangi bo'lsa —
+    ehtiyotkor chegara: SAFE_LAG dan eski eng katta id (ortiqcha upsert'lar zararsiz).
+    """
+    cutoff = _cutoff()
+    tail = db.session.query(ChangeLog.id, ChangeLog.changed_at).order_by(
+        ChangeLog.id.desc()
+    ).limit(LATEST_SCAN).all()[::-1]
+    if not tail:
+        return 0
+    if tail[0].changed_at is not None and tail[0].changed_at > cutoff:
+        return db.session.query(func.max(ChangeLog.id)).filter(ChangeLog.changed_at <= cutoff).scalar() or 0
+    settled = _settled(tail[1:], tail[0].id, cutoff)
+    return settled[-1].id if settled else tail[0].id
+
+
+def _load(table_name, ids):
+    """{id: dict} — jadval bo'yicha bitta IN so'rovi"""
+    if table_name == 'sales':
+        rows = Sale.list_query().filter(Sale.id.in_(ids)).all()
+        return {row.id: Sale.row_to_dict(row) for row in rows}
+    model = Product if table_name == 'products' else Customer
+    return {obj.id: obj.to_dict() for obj in model.query.filter(model.id.in_(ids)).all()}
+
+
+def fetch(since, limit, tables=TABLES):
+    """
+    since dan keyingi o'zgarishlar (ko'pi bilan limit ta jurnal yozuvi, xavfsiz chegaragacha).
+    Teshiklarni ko'rish uchun barcha jadvallar yozuvlari o'qiladi, tables bo'yicha keyin saralanadi.
+    Qaytaradi: (changes, next_cursor, has_more)
+    """
+    entries = db.session.query(ChangeLog).filter(
+        ChangeLog.id > since
+    ).order_by(ChangeLog.id).limit(limit + 1).all()
+    page = _settled(entries[:limit], since, _cutoff())
+    has_more = len(entries) > limit and len(page) == limit
+    next_cursor = page[-1].id if page else since
+    entries = [entry for entry in page if entry.table_name in tables]
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.table_name, entry.row_id), None)
+        latest[(entry.table_name, entry.row_id)] = entry
+    upserts = {}
+    for entry in latest.values():
+        if entry.op == UPSERT:
+            upserts.setdefault(entry.table_name, set()).add(entry.row_id)
+    data = {name: _load(name, ids) for name, ids in upserts.items()}
+
+    changes = []
+    for entry in latest.values():
+        item = {'cursor': entry.id, 'table': entry.table_name, 'id': entry.row_id, 'op': entry.op}
+        if entry.op == UPSERT:
+            row = data[entry.table_name].get(entry.row_id)
+            if row is None:
+                # Keyinroq o'chirilgan — tombstone keyingi sahifada keladi
+                continue
+            item['data'] = row
+        changes.append(item)
+    return changes, next_cursor, has_more
+
+
+def init_app(app):
+    """SQLAlchemy session hodisasini ro'yxatdan o'tkazadi (bir marta)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
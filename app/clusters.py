@@ -0,0 +1,153 @@
+"""
+map-data uchun server tomonida markerlarni klasterlash (?zoom=).
+
+Ierarxik grid (Web Mercator): zoom z da har 256px tile CELLS_PER_TILE x CELLS_PER_TILE
+katakka bo'linadi; z-1 katagi — z dagi to'rtta katakning birlashmasi. Eng mayda daraja
+app/spatial.py qatlamidagi nuqtalardan bir marta quriladi, qolganlari undan birlashtiriladi.
+
+Katak bittadan ko'p nuqtaga ega bo'lsa klaster: soni, og'irlik markazi, chegarasi va
+yig'indi (mijozlar — savdo summasi, do'konlar — mahsulotlar soni); bitta nuqtali katak —
+nuqtaning o'zi (odatdagi map-data dict). Istalgan zoomda javob ko'rinish oynasidagi
+katakchalar soni bilan cheklanadi (bir necha yuz).
+
+Natija qatlam avlodi (spatial.PointLayer.generation) va mijozlar uchun sales hisoblagichi
+(data_versions) o'zgarmaguncha keshda turadi.
+"""
+import math
+import threading
+from sqlalchemy import func
+from app import db, spatial, watermark
+from app.models import SalesDailyRollup
+
+MAX_ZOOM = 15  # shu zoom va undan kattasida klasterlanmaydi — nuqtalar o'zi
+CELLS_PER_TILE = 4  # 256px tile -> 64px katak
+
+_lock = threading.Lock()
+_cache = {}  # qatlam nomi -> (kalit, {zoom: {(cx, cy): katak}})
+
+
+def _project(lon, lat):
+    """lon/lat -> Web Mercator [0, 1) x [0, 1)"""
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(max(-85.05112878, min(85.05112878, lat))))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return min(max(x, 0.0), 1 - 1e-12), min(max(y, 0.0), 1 - 1e-12)
+
+
+def _customer_sales():
+    """{customer_id: jami savdo} — rollup ustida bitta GROUP BY"""
+    return {
+        cid: float(total or 0) for cid, total in db.session.query(
+            SalesDailyRollup.customer_id, func.sum(SalesDailyRollup.amount)
+        ).group_by(SalesDailyRollup.customer_id).all()
+    }
+
+
+def _weights(name):
+    if name == 'customers':
+        sales = _customer_sales()
+        return 'sales_amount', lambda item: sales.get(item['id'], 0.0)
+    return 'products_count', lambda item: item.get('products_count') or 0
+
+
+def _build(items, weight):
+    """{zoom: {(cx, cy): [soni, sum_lon, sum_lat, yig'indi, min_lon, min_lat, max_lon, max_lat, nuqta]}}"""
+    scale = (2 ** (MAX_ZOOM - 1)) * CELLS_PER_TILE
+    level = {}
+    for item in items:
+        lon, lat = item['longitude'], item['latitude']
+        if lon is None or lat is None:
+            continue
+        x, y = _project(lon, lat)
+        key = (int(x * scale), int(y * scale))
+        cell = level.get(key)
+        if cell is None:
+            level[key] = [1, lon, lat, weight(item), lon, lat, lon, lat, item]
+        else:
+            cell[0] += 1
+            cell[1] += lon
+            cell[2] += lat
+            cell[3] += weight(item)
+            cell[4], cell[5] = min(cell[4], lon), min(cell[5], lat)
+            cell[6], cell[7] = max(cell[6], lon), max(cell[7], lat)
+            cell[8] = None
+    levels = {MAX_ZOOM - 1: level}
+    for zoom in range(MAX_ZOOM - 2, -1, -1):
+        parent = {}
+        for (cx, cy), child in levels[zoom + 1].items():
+            key = (cx >> 1, cy >> 1)
+            cell = parent.get(key)
+            if cell is None:
+                parent[key] = list(child)
+            else:
+                cell[0] += child[0]
+                cell[1] += child[1]
+                cell[2] += child[2]
+                cell[3] += child[3]
+                cell[4], cell[5] = min(cell[4], child[4]), min(cell[5], child[5])
+                cell[6], cell[7] = max(cell[6], child[6]), max(cell[7], child[7])
+                cell[8] = None
+        levels[zoom] = parent
+    return levels
+
+
+def _levels(name):
+    layer = spatial.LAYERS[name]
+    layer.refresh()
+    key = (layer.generation, watermark.current(['sales']).get('sales') if name == 'customers' else None)
+    with _lock:
+        cached = _cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        label, weight = _weights(name)
+        levels = (label, _build(layer.all(), weight))
+        _cache[name] = (key, levels)
+        return levels
+
+
+def _in_bbox(lon, lat, bbox):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    in_lon = min_lon <= lon <= max_lon if min_lon <= max_lon else (lon >= min_lon or lon <= max_lon)
+    return in_lon and min_lat <= lat <= max_lat
+
+
+def at_zoom(name, zoom, bbox=None):
+    """
+    zoom dagi klasterlar va yakka nuqtalar (bbox berilsa — markazi oynada bo'lganlari).
+    Qaytaradi: (klasterlar, nuqtalar) — nuqtalar odatdagi map-data dict'lari
+    """
+    label, levels = _levels(name)
+    zoom = max(0, min(zoom, MAX_ZOOM - 1))
+    cells = levels[zoom]
+    keys = cells.keys()
+    if bbox is not None and bbox[0] <= bbox[2]:
+        # Kichik oyna — faqat oynaga tushgan katak kalitlari ko'riladi
+        scale = (2 ** zoom) * CELLS_PER_TILE
+        x0, y0 = _project(bbox[0], bbox[3])
+        x1, y1 = _project(bbox[2], bbox[1])
+        span = range(int(x0 * scale), int(x1 * scale) + 1), range(int(y0 * scale), int(y1 * scale) + 1)
+        if len(span[0]) * len(span[1]) < len(cells):
+            keys = [(cx, cy) for cx in span[0] for cy in span[1] if (cx, cy) in cells]
+    groups, points = [], []
+    for cx, cy in keys:
+        cell = cells[(cx, cy)]
+        count = cell[0]
+        lon, lat = cell[1] / count, cell[2] / count
+        if bbox is not None and not _in_bbox(lon, lat, bbox):
+            continue
+        if cell[8] is not None:
+            points.append(cell[8])
+            continue
+        groups.append({
+            'id': f'cluster:{zoom}:{cx}:{cy}',
+            'cluster': True,
+            'count': count,
+            'latitude': round(lat, 6),
+            'longitude': round(lon, 6),
+            label: round(cell[3], 2),
+            'bbox': [cell[4], cell[5], cell[6], cell[7]],
+            'expansion_zoom': zoom + 1,
+        })
+    groups.sort(key=lambda g: -g['count'])
+    points.sort(key=lambda item: item['id'])
+    return groups, points
@@ -0,0 +1,150 @@
+"""
+Savdolarni eksport qilish — oqim (generator) bilan.
+
+Qatorlar server tomoni kursori orqali (stream_results + yield_per) bo'laklab o'qiladi
+va darhol javobga yoziladi: xotira eksport hajmiga bog'liq emas, birinchi bayt
+so'rov boshlanishi bilan keladi.
+
+Formatlar:
+- csv     — har doim mavjud (Excel uchun UTF-8 BOM bilan);
+- arrow   — Apache Arrow IPC stream, pyarrow kerak (ixtiyoriy);
+- parquet — Parquet (har bo'lak alohida row group), pyarrow kerak (ixtiyoriy).
+"""
+import csv
+import io
+
+CSV_BATCH = 2000
+COLUMNAR_BATCH = 20000
+FORMATS = ('csv', 'arrow', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXTENSIONS = {'csv': 'csv', 'arrow': 'arrows', 'parquet': 'parquet'}
+
+# Ustun turlari (columnar formatlar uchun): int, float, str, date, datetime
+SALE_COLUMNS = (
+    ('id', 'int'), ('customer_id', 'int'), ('customer_name', 'str'), ('product_id', 'int'),
+    ('product_name', 'str'), ('quantity', 'int'), ('amount', 'float'), ('unit_price', 'float'),
+    ('purchase_price_at_sale', 'float'), ('profit', 'float'), ('sale_date', 'date'), ('created_at', 'datetime'),
+)
+ONLINE_SALE_COLUMNS = (
+    ('id', 'int'), ('platform', 'str'), ('product_id', 'int'), ('product_name', 'str'),
+    ('quantity', 'int'), ('amount', 'float'), ('sale_date', 'date'), ('created_at', 'datetime'),
+)
+
+
+def columnar_available():
+    """arrow/parquet uchun pyarrow o'rnatilganmi"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _stream(query, batch):
+    """Server tomoni kursori bilan qatorlar — bir vaqtda faqat `batch` ta qator xotirada"""
+    return query.execution_options(stream_results=True, yield_per=batch)
+
+
+def csv_stream(query, to_dict, columns):
+    """CSV qismlari generatori: avval sarlavha (darhol), keyin har CSV_BATCH qatordan"""
+    names = [name for name, _ in columns]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')
+    writer.writerow(names)
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    for i, row in enumerate(_stream(query, CSV_BATCH), 1):
+        d = to_dict(row)
+        writer.writerow(['' if d[n] is None else d[n] for n in names])
+        if i % CSV_BATCH == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _Sink:
+    """pyarrow yozuvchisi uchun fayl o'rnini bosuvchi: yozilgan baytlar drain() bilan javobga uzatiladi"""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(),
+             'date': pa.date32(), 'datetime': pa.timestamp('us')}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def columnar_stream(query, to_dict, columns, fmt):
+    """Arrow IPC yoki Parquet qismlari generatori — har COLUMNAR_BATCH qator bitta record batch / row group"""
+    import pyarrow as pa
+    schema = _arrow_schema(columns)
+    names = [name for name, _ in columns]
+    raw = [name for name, kind in columns if kind in ('date', 'datetime')]
+    sink = _Sink()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    def flush(records):
+        writer.write_batch(pa.RecordBatch.from_pylist(records, schema=schema))
+        return sink.drain()
+
+    records = []
+    try:
+        # Sxema / sarlavha baytlari — birinchi bayt qatorlarni kutmasdan jo'natiladi
+        head = sink.drain()
+        if head:
+            yield head
+        for row in _stream(query, COLUMNAR_BATCH):
+            d = to_dict(row)
+            # Sana/vaqt — ISO satr emas, asl tur bilan
+            for name in raw:
+                d[name] = getattr(row, name)
+            records.append({n: d[n] for n in names})
+            if len(records) >= COLUMNAR_BATCH:
+                yield flush(records)
+                records = []
+        if records:
+            yield flush(records)
+    finally:
+        writer.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
@@ -0,0 +1,25 @@
+"""
+Sparse fieldset: ro'yxat endpointlarida ?fields=id,name,latitude — javobda faqat shu kalitlar.
+
+Xarita va jadval ko'rinishlari o'zlari ishlatadigan ustunlar uchungina to'laydi (kichik
+payload, tezroq serializatsiya). `id` har doim qoladi (lokal nusxa/markerlar kaliti).
+Noma'lum maydon nomlari e'tiborsiz qoldiriladi; parametr berilmasa javob o'zgarmaydi.
+"""
+from flask import request
+
+
+def requested():
+    """?fields= dagi nomlar (frozenset) yoki None"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    names = frozenset(name.strip() for name in raw.split(',') if name.strip())
+    return (names | {'id'}) if names else None
+
+
+def sparse(items, names=None):
+    """Dict'lar ro'yxatidan faqat so'ralgan kalitlar; ?fields= yo'q bo'lsa items o'zi"""
+    names = requested() if names is None else names
+    if not names:
+        return items
+    return [{key: value for key, value in item.items() if key in names} for item in items]
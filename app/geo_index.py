@@ -0,0 +1,144 @@
+"""
+Eng yaqin nuqta va radius bo'yicha qidiruv uchun jarayon ichidagi k-d daraxt (customers, shops).
+
+Nuqtalar birlik sferadagi 3D koordinatalarga (x, y, z) o'tkaziladi: ikki nuqta orasidagi
+vatar (chord) uzunligi haversine masofasi bilan monoton bog'liq, shuning uchun oddiy
+evklid k-d daraxt sferada ham aniq natija beradi (meridian 180° va qutblarda ham).
+Masofa javobda haversine km: d = 2R * asin(chord / 2).
+
+Daraxt app/spatial.py qatlamidan quriladi va qatlam avlodi (generation) o'zgarganda —
+ya'ni yozuvdan keyingi birinchi so'rovda — qayta quriladi (dangasa). Qurish NumPy bilan
+(argpartition, bargdagi LEAF_SIZE nuqtagacha), so'rov — sof Python, 100k nuqtada
+eng yaqin nuqta ~0.1 ms.
+"""
+import heapq
+import math
+import threading
+import numpy as np
+from app import spatial
+
+EARTH_RADIUS_KM = 6371.0088
+LEAF_SIZE = 16
+TARGETS = ('customers', 'shops')
+
+_lock = threading.Lock()
+_trees = {}  # qatlam nomi -> (generation, KDTree)
+
+
+def _to_xyz(lon, lat):
+    lon, lat = np.radians(lon), np.radians(lat)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+class KDTree:
+    """Statik k-d daraxt: ichki tugun — (o'q, chegara, chap, o'ng), barg — (-1, boshi, oxiri)"""
+
+    def __init__(self, items):
+        self.items = [item for item in items if item['longitude'] is not None and item['latitude'] is not None]
+        xyz = _to_xyz(
+            np.array([item['longitude'] for item in self.items], dtype=float),
+            np.array([item['latitude'] for item in self.items], dtype=float),
+        ) if self.items else np.zeros((0, 3))
+        self._order = np.arange(len(self.items))
+        self._xyz = xyz
+        self.nodes = []
+        self.root = self._build(0, len(self.items)) if self.items else None
+        # So'rov tomonida NumPy skalyarlaridan ko'ra Python kortejlari tezroq
+        self.points = [tuple(p) for p in xyz[self._order].tolist()]
+        self.items = [self.items[i] for i in self._order.tolist()]
+        del self._xyz, self._order
+
+    def _build(self, lo, hi):
+        if hi - lo <= LEAF_SIZE:
+            self.nodes.append((-1, lo, hi))
+            return len(self.nodes) - 1
+        block = self._xyz[self._order[lo:hi]]
+        axis = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+        mid = (hi - lo) // 2
+        part = np.argpartition(block[:, axis], mid)
+        self._order[lo:hi] = self._order[lo:hi][part]
+        split = float(self._xyz[self._order[lo + mid], axis])
+        index = len(self.nodes)
+        self.nodes.append(None)
+        left = self._build(lo, lo + mid)
+        right = self._build(lo + mid, hi)
+        self.nodes[index] = (axis, split, left, right)
+        return index
+
+    def nearest(self, lon, lat, k=1, exclude=None):
+        """Eng yaqin k ta nuqta: [(item, km), ...] masofa bo'yicha; exclude — o'tkazib yuboriladigan id"""
+        if self.root is None:
+            return []
+        q = tuple(_to_xyz(np.array([lon]), np.array([lat]))[0].tolist())
+        best = []  # max-heap: (-chord², indeks)
+        stack = [(0.0, self.root)]
+        while stack:
+            bound, node_id = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            node = self.nodes[node_id]
+            if node[0] < 0:
+                for i in range(node[1], node[2]):
+                    p = self.points[i]
+                    d = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+                    if len(best) < k:
+                        if exclude is None or self.items[i]['id'] != exclude:
+                            heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0] and (exclude is None or self.items[i]['id'] != exclude):
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            axis, split, left, right = node
+            diff = q[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            # Avval yaqin tomon ko'riladi (stack — oxirgisi birinchi chiqadi)
+            stack.append((max(bound, diff * diff), far))
+            stack.append((bound, near))
+        return [(self.items[i], chord_to_km(math.sqrt(-d))) for d, i in sorted(best, reverse=True)]
+
+    def within(self, lon, lat, radius_km):
+        """radius_km ichidagi nuqtalar: [(item, km), ...] masofa bo'yicha"""
+        if self.root is None:
+            return []
+        q = tuple(_to_xyz(np.array([lon]), np.array([lat]))[0].tolist())
+        r = km_to_chord(radius_km)
+        r2 = r * r
+        found = []
+        stack = [self.root]
+        while stack:
+            node = self.nodes[stack.pop()]
+            if node[0] < 0:
+                for i in range(node[1], node[2]):
+                    p = self.points[i]
+                    d = (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+                    if d <= r2:
+                        found.append((d, i))
+                continue
+            axis, split, left, right = node
+            if q[axis] - r <= split:
+                stack.append(left)
+            if q[axis] + r >= split:
+                stack.append(right)
+        found.sort()
+        return [(self.items[i], chord_to_km(math.sqrt(d))) for d, i in found]
+
+
+def tree(name):
+    """Qatlam uchun daraxt; qatlam o'zgargan bo'lsa qayta quriladi"""
+    layer = spatial.LAYERS[name]
+    layer.refresh()
+    with _lock:
+        cached = _trees.get(name)
+        if cached is not None and cached[0] == layer.generation:
+            return cached[1]
+        built = KDTree(layer.all())
+        _trees[name] = (layer.generation, built)
+        return built
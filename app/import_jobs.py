@@ -0,0 +1,195 @@
+"""
+Fayldan (CSV/XLSX) savdo importi — fon vazifasi sifatida.
+
+Yuklangan fayl diskka oqim bilan saqlanadi va so'rov darhol 202 qaytaradi.
+Import jarayon ichidagi bitta fon thread'ida (navbat) bajariladi: fayl qatorma-qator
+o'qiladi, BATCH_SIZE qatordan paketlarga bo'linadi va app/bulk_import.py orqali
+yoziladi — xotira fayl hajmiga bog'liq emas, gunicorn thread'lari band bo'lmaydi.
+
+Holat: GET /api/sales/import-jobs/<id> — qayta ishlangan/xato qatorlar, tezlik.
+Vazifalar holati jarayon xotirasida (render.yaml: bitta worker); tugagan (done/failed) vazifalardan
+eng eskilari MAX_JOBS dan oshganda o'chiriladi — navbatdagi va bajarilayotganlari hech qachon.
+
+Ustunlar (sarlavha qatori): customer_id, product_id, amount, quantity, sale_date (YYYY-MM-DD),
+purchase_price_at_sale (ixtiyoriy).
+"""
+import csv
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from app import bulk_import
+
+BATCH_SIZE = 1000
+MAX_JOBS = 100
+FINISHED = ('done', 'failed')
+MAX_ERRORS = 200
+FORMATS = ('csv', 'xlsx')
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sales-import')
+
+
+def detect_format(filename):
+    """Fayl kengaytmasidan format (csv/xlsx) yoki None"""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return ext if ext in FORMATS else None
+
+
+def xlsx_available():
+    """XLSX o'qish uchun openpyxl o'rnatilganmi"""
+    try:
+        import openpyxl  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def _iter_xlsx(path):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [str(h).strip() if h is not None else '' for h in header]
+        for values in rows:
+            if values and any(v is not None for v in values):
+                yield dict(zip(keys, values))
+    finally:
+        wb.close()
+
+
+def _normalize(row):
+    """Fayl qatorini bulk_import.prepare() kutadigan ko'rinishga: bo'sh katakchalar tashlanadi, son/sana turlari"""
+    out = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = key.strip().lower()
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        if isinstance(value, (datetime, date)):
+            value = value.strftime('%Y-%m-%d')
+        out[key] = value
+    if 'quantity' in out:
+        try:
+            out['quantity'] = int(float(out['quantity']))
+        except (TypeError, ValueError):
+            pass
+    return out
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _update(job_id, **fields):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        if job['_clock'] is not None:
+            elapsed = time.monotonic() - job['_clock']
+            job['rows_per_second'] = round(job['rows_processed'] / elapsed, 1) if elapsed > 0 else 0.0
+
+
+def _run(app, job_id, path, fmt, chunk_size):
+    reader = _iter_xlsx if fmt == 'xlsx' else _iter_csv
+    _update(job_id, status='running', started_at=_now(), _clock=time.monotonic())
+    processed = failed = created = 0
+    errors = []
+    try:
+        with app.app_context():
+            batch = []
+            rows = reader(path)
+            while True:
+                row = next(rows, None)
+                if row is not None:
+                    batch.append(_normalize(row))
+                if batch and (row is None or len(batch) >= BATCH_SIZE):
+                    values, row_errors = bulk_import.prepare(batch, first_index=processed + 1)
+                    batch_created, chunk_errors = bulk_import.insert(values, chunk_size)
+                    processed += len(batch)
+                    created += batch_created
+                    failed += len(batch) - batch_created
+                    errors.extend((row_errors + chunk_errors)[:max(0, MAX_ERRORS - len(errors))])
+                    batch = []
+                    _update(job_id, rows_processed=processed, rows_created=created, rows_failed=failed,
+                            errors=list(errors))
+                if row is None:
+                    break
+        _update(job_id, status='done', finished_at=_now())
+    except Exception as e:
+        errors.append(f'Fayl o\'qishda xatolik: {str(e)}')
+        _update(job_id, status='failed', finished_at=_now(), errors=errors[:MAX_ERRORS])
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _evict():
+    """MAX_JOBS dan ortiqcha eng eski tugagan vazifalarni o'chiradi (_lock ichida chaqiriladi)"""
+    excess = len(_jobs) - MAX_JOBS
+    if excess <= 0:
+        return
+    finished = [job_id for job_id, job in _jobs.items() if job['status'] in FINISHED]
+    for job_id in finished[:excess]:
+        del _jobs[job_id]
+
+
+def submit(app, file_storage, fmt):
+    """
+    Yuklangan faylni vaqtinchalik faylga oqim bilan saqlaydi va importni navbatga qo'yadi.
+    Qaytaradi: vazifa holati (dict)
+    """
+    fd, path = tempfile.mkstemp(prefix='sales-import-', suffix='.' + fmt)
+    with os.fdopen(fd, 'wb') as out:
+        file_storage.save(out)
+    job_id = uuid.uuid4().hex
+    job = {
+        'id': job_id,
+        'filename': file_storage.filename,
+        'format': fmt,
+        'status': 'queued',
+        'rows_processed': 0,
+        'rows_created': 0,
+        'rows_failed': 0,
+        'rows_per_second': 0.0,
+        'errors': [],
+        'created_at': _now(),
+        'started_at': None,
+        'finished_at': None,
+        '_clock': None,
+    }
+    with _lock:
+        _jobs[job_id] = job
+        _evict()
+    chunk_size = app.config.get('BULK_IMPORT_CHUNK_SIZE', bulk_import.DEFAULT_CHUNK_SIZE)
+    _runner.submit(_run, app, job_id, path, fmt, chunk_size)
+    return get(job_id)
+
+
+def get(job_id):
+    """Vazifa holati nusxasi yoki None"""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {k: (list(v) if k == 'errors' else v) for k, v in job.items() if not k.startswith('_')}
@@ -0,0 +1,57 @@
+"""
+Tezkor JSON provayder: orjson o'rnatilgan bo'lsa jsonify/request.get_json shu orqali ishlaydi,
+bo'lmasa Flask'ning standart (stdlib json) provayderi.
+
+Chiqish standart provayder bilan bir xil qoldiriladi: kalitlar tartiblangan (JSON_SORT_KEYS),
+Decimal/date/datetime Flask qoidasi bo'yicha (default() orqali), debug rejimida chiroyli format.
+Farq: ASCII bo'lmagan belgilar \\uXXXX emas, to'g'ridan-to'g'ri UTF-8 bilan yoziladi.
+FAST_JSON=0 bilan o'chiriladi.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover — ixtiyoriy paket
+    orjson = None
+
+
+def available():
+    return orjson is not None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """orjson bilan dumps/loads/response; orjson yo'q bo'lsa DefaultJSONProvider'ning o'zi"""
+
+    def _option(self, pretty=False):
+        # datetime/date -> default() (Flask: HTTP sana formati), boshqa noma'lum turlar ham default()
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=kwargs.get('default', self.default),
+                            option=self._option(bool(kwargs.get('indent')))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._option(pretty)) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_app(app):
+    """orjson mavjud va FAST_JSON yoqilgan bo'lsa provayderni almashtiradi"""
+    if app.config.get('FAST_JSON', True) and available():
+        app.json = FastJSONProvider(app)
@@ -0,0 +1,172 @@
+"""
+Versiyalangan sxema migratsiyalari (MySQL va PostgreSQL).
+
+db.create_all() faqat yangi jadvallarni yaratadi — mavjud jadvalga indeks yoki ustun
+qo'shmaydi. Bu yerdagi har migratsiya tartib raqami bilan bir marta bajariladi va
+schema_migrations jadvaliga yoziladi. Ilova ishga tushganda upgrade() chaqiriladi;
+qo'lda: python3 run_migrations.py (holat: --status).
+
+Indekslar modelning __table_args__ da e'lon qilinadi (yangi bazada create_all yaratadi),
+migratsiya esa mavjud bazada yetishmaganlarini qo'shadi:
+- PostgreSQL: CREATE INDEX CONCURRENTLY — yozuvlar bloklanmaydi;
+- MySQL (InnoDB): ikkilamchi indeks online (INPLACE) quriladi.
+
+Yangi migratsiya: funksiya yozing va MIGRATIONS oxiriga keyingi raqam bilan qo'shing.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, text, select, update, func
+from app import db
+from app.models import SchemaMigration, Sale, Product
+
+
+class MigrationError(RuntimeError):
+    """Migratsiya qo'llanmadi — ilova ishga tushmasligi kerak"""
+
+
+def _index(name):
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(name)
+
+
+def create_indexes(names):
+    """Model e'lon qilgan indekslarni mavjud bo'lmasa yaratadi; qaytaradi: yaratilganlar ro'yxati"""
+    inspector = inspect(db.engine)
+    created = []
+    for name in names:
+        index = _index(name)
+        table = index.table.name
+        if name in {ix['name'] for ix in inspector.get_indexes(table)}:
+            continue
+        if db.engine.dialect.name == 'postgresql':
+            columns = ', '.join(c.name for c in index.columns)
+            unique = 'UNIQUE ' if index.unique else ''
+            # CONCURRENTLY tranzaksiya ichida ishlamaydi — alohida autocommit ulanish
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                try:
+                    conn.execute(text(f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})'))
+                except Exception:
+                    # Muvaffaqiyatsiz CONCURRENTLY yaroqsiz (INVALID) indeks qoldiradi — keyingi urinishda
+                    # IF NOT EXISTS uni "bor" deb o'tkazib yubormasligi uchun o'chiriladi
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+                    raise
+        else:
+            index.create(bind=db.engine)
+        created.append(name)
+    return created
+
+
+def add_columns(table_name, names):
+    """Model e'lon qilgan ustunlarni (NULL, FK bilan) mavjud bo'lmasa qo'shadi; qaytaradi: qo'shilganlar"""
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table_name)}
+    table = db.metadata.tables[table_name]
+    dialect = db.engine.dialect.name
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f'ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(db.engine.dialect)} NULL'
+        fk = next(iter(column.foreign_keys), None)
+        if fk is not None:
+            target = f'{fk.column.table.name} ({fk.column.name})' + (f' ON DELETE {fk.ondelete}' if fk.ondelete else '')
+            # MySQL ustun ichidagi REFERENCES ni e'tiborsiz qoldiradi — alohida FOREIGN KEY
+            ddl += f', ADD FOREIGN KEY ({name}) REFERENCES {target}' if dialect == 'mysql' else f' REFERENCES {target}'
+        with db.engine.begin() as conn:
+            conn.execute(text(ddl))
+        added.append(name)
+    return added
+
+
+def _sales_analytics_indexes():
+    """sales: (sale_date), (product_id, sale_date), (customer_id, sale_date); online_sales: (platform, sale_date)"""
+    return create_indexes([
+        'ix_sales_sale_date',
+        'ix_sales_product_id_sale_date',
+        'ix_sales_customer_id_sale_date',
+        'ix_online_sales_platform_sale_date',
+        'ix_sales_daily_rollup_product_id_sale_date',
+        'ix_sales_daily_rollup_customer_id_sale_date',
+    ])
+
+
+def _geo_region_columns():
+    """customers, shops: geo_region_id (hudud poligoni bo'yicha, app/region_assign.py) + indeks"""
+    add_columns('customers', ['geo_region_id'])
+    add_columns('shops', ['geo_region_id'])
+    return create_indexes(['ix_customers_geo_region_id', 'ix_shops_geo_region_id'])
+
+
+def _sales_client_key():
+    """sales: client_key (POST /api/sales/sync idempotency kaliti) + unikal indeks"""
+    add_columns('sales', ['client_key'])
+    created = create_indexes(['ix_sales_client_key'])
+    # Idempotentlik shu indeksga tayanadi — u bo'lmasa yoki unikal bo'lmasa migratsiya qo'llanmaydi
+    index = next((ix for ix in inspect(db.engine).get_indexes('sales') if ix['name'] == 'ix_sales_client_key'), None)
+    if index is None or not index['unique']:
+        raise MigrationError('sales.ix_sales_client_key unikal indeksi yaratilmadi')
+    return created
+
+
+def _sales_profit_backfill():
+    """
+    sales: profit NULL bo'lgan eski qatorlar uchun purchase_price_at_sale va profit to'ldiriladi
+    (saqlangan tan narx, bo'lmasa mahsulotning hozirgi narxi — Sale.to_dict ko'rsatayotgan qiymat).
+    Shundan keyin rollup foydasi mahsulot narxi o'zgarishiga bog'liq bo'lmaydi; rollup qayta quriladi.
+    """
+    from app import rollup
+    sales = Sale.__table__
+    price = select(Product.purchase_price).where(Product.id == sales.c.product_id).scalar_subquery()
+    purchase = func.coalesce(sales.c.purchase_price_at_sale, price, 0)
+    filled = db.session.execute(update(sales).where(sales.c.profit.is_(None)).values(
+        purchase_price_at_sale=purchase,
+        profit=sales.c.amount - purchase * sales.c.quantity,
+    )).rowcount
+    db.session.commit()
+    rollup.rebuild()
+    return filled
+
+
+# (versiya, nom, funksiya) — tartib bilan; qo'llanganlari o'zgartirilmaydi
+MIGRATIONS = [
+    (1, 'sales_analytics_indexes', _sales_analytics_indexes),
+    (2, 'geo_region_columns', _geo_region_columns),
+    (3, 'sales_client_key', _sales_client_key),
+    (4, 'sales_profit_backfill', _sales_profit_backfill),
+]
+
+
+def applied():
+    """Qo'llangan versiyalar: {version: applied_at}"""
+    return dict(db.session.query(SchemaMigration.version, SchemaMigration.applied_at).all())
+
+
+def pending():
+    done = applied()
+    return [(version, name, fn) for version, name, fn in MIGRATIONS if version not in done]
+
+
+def upgrade():
+    """
+    Qo'llanmagan migratsiyalarni tartib bilan bajaradi; qaytaradi: [(versiya, nom), ...].
+    Xato bo'lsa MigrationError — keyingi migratsiyalar bajarilmaydi, qo'llanmagan deb qoladi.
+    """
+    result = []
+    todo = pending()
+    # O'qish tranzaksiyasi yopiladi — aks holda CREATE INDEX CONCURRENTLY shu sessiyani kutib qoladi
+    db.session.commit()
+    for version, name, fn in todo:
+        try:
+            fn()
+        except MigrationError:
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            raise MigrationError(f'Migratsiya {version} ({name}): {e}') from e
+        db.session.add(SchemaMigration(version=version, name=name, applied_at=datetime.utcnow()))
+        db.session.commit()
+        result.append((version, name))
+    return result
@@ -68,6 +68,8 @@ class Customer(db.Model):
     address = db.Column(db.Text)  # Manzil
     latitude = db.Column(db.Numeric(10, 7))  # Mijoz koordinatalari (xarita uchun)
     longitude = db.Column(db.Numeric(10, 7))
+    # Koordinata tushgan hudud poligoni (app/region_assign.py, migratsiya 2)
+    geo_region_id = db.Column(db.Integer, db.ForeignKey('regions.id', ondelete='SET NULL'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -80,12 +82,19 @@ class Customer(db.Model):
             'address': self.address,
             'latitude': float(self.latitude) if self.latitude else None,
             'longitude': float(self.longitude) if self.longitude else None,
+            'geo_region_id': self.geo_region_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class Sale(db.Model):
     __tablename__ = 'sales'
+    __table_args__ = (
+        # Analitika: sana oralig'i, mahsulot/mijoz bo'yicha sana oralig'i (app/migrations.py, 1-versiya)
+        db.Index('ix_sales_sale_date', 'sale_date'),
+        db.Index('ix_sales_product_id_sale_date', 'product_id', 'sale_date'),
+        db.Index('ix_sales_customer_id_sale_date', 'customer_id', 'sale_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -97,34 +106,154 @@ class Sale(db.Model):
     profit = db.Column(db.Numeric(10, 2))  # Foyda: amount - (purchase_price_at_sale * quantity)
     sale_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    client_key = db.Column(db.String(64), unique=True, index=True)  # Mobil/offline mijoz idempotency kaliti (POST /api/sales/sync)
     
     # Relationships
     customer = db.relationship('Customer', backref='sales')
     product = db.relationship('Product', backref='sales')
     
     def to_dict(self):
-        amt = float(self.amount) if self.amount else None
-        qty = self.quantity or 0
-        unit_price = float(self.unit_price) if self.unit_price is not None else (round(amt / qty, 2) if qty and amt else None)
-        purchase = float(self.purchase_price_at_sale) if self.purchase_price_at_sale is not None else (float(self.product.purchase_price) if self.product and self.product.purchase_price is not None else None)
-        profit = float(self.profit) if self.profit is not None else (round(amt - (purchase or 0) * qty, 2) if amt is not None and qty else None)
+        return _sale_dict(
+            self,
+            self.customer.name if self.customer else None,
+            self.product.name if self.product else None,
+            self.product.purchase_price if self.product else None
+        )
+    
+    @classmethod
+    def list_query(cls):
+        """
+        Ro'yxat uchun bitta JOIN'li ustun proyeksiyasi — har savdo uchun customer/product lazy-load yo'q.
+        Filtr va tartib Sale ustunlari bilan odatdagidek qo'shiladi; natija qatorlari Sale.row_to_dict() bilan.
+        """
+        return db.session.query(
+            *[getattr(cls, c) for c in _SALE_COLUMNS],
+            Customer.name.label('customer_name'),
+            Product.name.label('product_name'),
+            Product.purchase_price.label('product_purchase_price')
+        ).select_from(cls).outerjoin(
+            Customer, cls.customer_id == Customer.id
+        ).outerjoin(Product, cls.product_id == Product.id)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """list_query() qatoridan to_dict() bilan bir xil JSON"""
+        return _sale_dict(row, row.customer_name, row.product_name, row.product_purchase_price)
+
+
+_SALE_COLUMNS = ('id', 'customer_id', 'product_id', 'quantity', 'amount', 'unit_price',
+                 'purchase_price_at_sale', 'profit', 'sale_date', 'created_at')
+
+
+def _sale_dict(sale, customer_name, product_name, product_purchase_price):
+    """Sale JSON — ORM obyekti ham, list_query() qatori ham (bir xil atributlar) uchun"""
+    amt = float(sale.amount) if sale.amount else None
+    qty = sale.quantity or 0
+    unit_price = float(sale.unit_price) if sale.unit_price is not None else (round(amt / qty, 2) if qty and amt else None)
+    purchase = float(sale.purchase_price_at_sale) if sale.purchase_price_at_sale is not None else (float(product_purchase_price) if product_purchase_price is not None else None)
+    profit = float(sale.profit) if sale.profit is not None else (round(amt - (purchase or 0) * qty, 2) if amt is not None and qty else None)
+    return {
+        'id': sale.id,
+        'customer_id': sale.customer_id,
+        'customer_name': customer_name,
+        'product_id': sale.product_id,
+        'product_name': product_name,
+        'quantity': sale.quantity,
+        'amount': amt,
+        'unit_price': unit_price,
+        'purchase_price_at_sale': purchase,
+        'profit': profit,
+        'sale_date': sale.sale_date.isoformat() if sale.sale_date else None,
+        'created_at': sale.created_at.isoformat() if sale.created_at else None
+    }
+
+class SalesDailyRollup(db.Model):
+    """Kunlik savdo yig'indisi (sana, mahsulot, mijoz) — dashboard shu jadvaldan o'qiydi (app/rollup.py)"""
+    __tablename__ = 'sales_daily_rollup'
+    __table_args__ = (
+        # PK (sale_date, ...) sana oralig'ini yopadi; mahsulot/mijoz filtrli timeseries uchun
+        db.Index('ix_sales_daily_rollup_product_id_sale_date', 'product_id', 'sale_date'),
+        db.Index('ix_sales_daily_rollup_customer_id_sale_date', 'customer_id', 'sale_date'),
+    )
+    
+    sale_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, primary_key=True)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    profit = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def to_dict(self):
         return {
-            'id': self.id,
-            'customer_id': self.customer_id,
-            'customer_name': self.customer.name if self.customer else None,
-            'product_id': self.product_id,
-            'product_name': self.product.name if self.product else None,
-            'quantity': self.quantity,
-            'amount': amt,
-            'unit_price': unit_price,
-            'purchase_price_at_sale': purchase,
-            'profit': profit,
             'sale_date': self.sale_date.isoformat() if self.sale_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'product_id': self.product_id,
+            'customer_id': self.customer_id,
+            'amount': float(self.amount) if self.amount is not None else 0.0,
+            'quantity': self.quantity or 0,
+            'profit': float(self.profit) if self.profit is not None else 0.0,
+            'sales_count': self.sales_count or 0
         }
 
+class MonthlySnapshot(db.Model):
+    """Yopilgan oy uchun tayyor agregatlar — oy ichidagi savdo o'zgarmaguncha qayta ishlatiladi (app/snapshots.py)"""
+    __tablename__ = 'monthly_snapshots'
+    
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    total_sales = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    total_profit = db.Column(db.Numeric(16, 2), nullable=False, default=0)
+    details = db.Column(db.Text)  # JSON: top_products, top_customers, daily_sales
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        import json
+        details = json.loads(self.details) if self.details else {}
+        return {
+            'year': self.year,
+            'month': self.month,
+            'total_sales': float(self.total_sales) if self.total_sales is not None else 0.0,
+            'total_quantity': self.total_quantity or 0,
+            'sales_count': self.sales_count or 0,
+            'total_profit': float(self.total_profit) if self.total_profit is not None else 0.0,
+            'top_products': details.get('top_products', []),
+            'top_customers': details.get('top_customers', []),
+            'daily_sales': details.get('daily_sales', [])
+        }
+
+class DataVersion(db.Model):
+    """Jadval yozuv hisoblagichi — har commitda oshadi; ETag/304 uchun arzon watermark (app/watermark.py)"""
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)  # jadval nomi: sales, products, ...
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeLog(db.Model):
+    """sales/products/customers o'zgarishlari jurnali — GET /api/changes uchun (app/changes.py)"""
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)  # cursor: o'sib boradi
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert | delete
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SchemaMigration(db.Model):
+    """Qo'llangan sxema migratsiyalari — har versiya bir marta bajariladi (app/migrations.py)"""
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class OnlineSale(db.Model):
     __tablename__ = 'online_sales'
+    __table_args__ = (
+        db.Index('ix_online_sales_platform_sale_date', 'platform', 'sale_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     platform = db.Column(db.String(50), nullable=False)  # uzum_market, yandex_market
@@ -138,16 +267,33 @@ class OnlineSale(db.Model):
     product = db.relationship('Product', backref='online_sales')
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'platform': self.platform,
-            'product_id': self.product_id,
-            'product_name': self.product.name if self.product else None,
-            'quantity': self.quantity,
-            'amount': float(self.amount) if self.amount else None,
-            'sale_date': self.sale_date.isoformat() if self.sale_date else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return _online_sale_dict(self, self.product.name if self.product else None)
+    
+    @classmethod
+    def list_query(cls):
+        """Ro'yxat uchun JOIN'li proyeksiya (mahsulot nomi bilan) — Sale.list_query() kabi"""
+        return db.session.query(
+            cls.id, cls.platform, cls.product_id, cls.quantity, cls.amount, cls.sale_date, cls.created_at,
+            Product.name.label('product_name')
+        ).select_from(cls).outerjoin(Product, cls.product_id == Product.id)
+    
+    @staticmethod
+    def row_to_dict(row):
+        """list_query() qatoridan to_dict() bilan bir xil JSON"""
+        return _online_sale_dict(row, row.product_name)
+
+
+def _online_sale_dict(sale, product_name):
+    return {
+        'id': sale.id,
+        'platform': sale.platform,
+        'product_id': sale.product_id,
+        'product_name': product_name,
+        'quantity': sale.quantity,
+        'amount': float(sale.amount) if sale.amount else None,
+        'sale_date': sale.sale_date.isoformat() if sale.sale_date else None,
+        'created_at': sale.created_at.isoformat() if sale.created_at else None
+    }
 
 
 # Hududlar va Do'konlar (Regions & Shops)
@@ -169,17 +315,13 @@ class Region(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    shops = db.relationship('Shop', backref='region', lazy=True)
+    shops = db.relationship('Shop', backref='region', lazy=True, foreign_keys='Shop.region_id')
 
     def to_dict(self):
         shops_count = len(self.shops) if self.shops else 0
-        import json
-        poly = None
-        if self.polygon_coordinates:
-            try:
-                poly = json.loads(self.polygon_coordinates) if isinstance(self.polygon_coordinates, str) else self.polygon_coordinates
-            except Exception:
-                poly = None
+        # Poligon matni o'zgarmaguncha qayta o'qilmaydi (app/region_geometry.py)
+        from app import region_geometry
+        poly = region_geometry.parsed(self.id, self.polygon_coordinates)
         return {
             'id': self.id,
             'name': self.name,
@@ -201,6 +343,8 @@ class Shop(db.Model):
     longitude = db.Column(db.Numeric(10, 7))
     size = db.Column(db.String(20), default='medium')
     status = db.Column(db.String(20), default='active')
+    # Koordinata tushgan hudud poligoni (region_id — qo'lda belgilangani; app/region_assign.py)
+    geo_region_id = db.Column(db.Integer, db.ForeignKey('regions.id', ondelete='SET NULL'), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -212,6 +356,7 @@ class Shop(db.Model):
             'name': self.name,
             'region_id': self.region_id,
             'region_name': self.region.name if self.region else None,
+            'geo_region_id': self.geo_region_id,
             'phone': self.phone,
             'latitude': float(self.latitude) if self.latitude else None,
             'longitude': float(self.longitude) if self.longitude else None,
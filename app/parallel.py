@@ -0,0 +1,80 @@
+"""
+Bitta so'rov ichidagi mustaqil o'qish so'rovlarini parallel bajarish (ixtiyoriy).
+
+Har bir vazifa alohida thread'da, o'z app context'i va o'z session'i bilan —
+ya'ni pool'dan alohida ulanish oladi. Endpoint kechikishi so'rovlar
+yig'indisi emas, eng sekin so'rov darajasiga tushadi.
+
+Pool'ni band qilib qo'ymaslik uchun: parallel thread'lar jarayon bo'yicha
+umumiy semafor bilan cheklanadi (PARALLEL_QUERY_MAX_CONNECTIONS). Bo'sh joy
+bo'lmasa vazifa kutmaydi — so'rovning o'z ulanishida ketma-ket bajariladi.
+Vazifalardan bittasi doim chaqiruvchi thread'da ishlaydi.
+
+Yoqish: PARALLEL_QUERIES=1 (standart: o'chiq).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+DEFAULT_MAX_CONNECTIONS = 4
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _pool(app):
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                size = max(1, int(app.config.get('PARALLEL_QUERY_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)))
+                _slots = threading.BoundedSemaphore(size)
+                _executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='parallel-query')
+    return _executor, _slots
+
+
+def _call(app, slots, fn):
+    try:
+        # Yangi app context — alohida session/ulanish; chiqishda session yopiladi va ulanish pool'ga qaytadi
+        with app.app_context():
+            return fn()
+    finally:
+        slots.release()
+
+
+def run(tasks):
+    """
+    tasks: {nom: argumentsiz funksiya} — faqat o'qish, bir-biriga bog'liq emas.
+    Qaytaradi: {nom: natija}. Xatolik chaqiruvchiga uzatiladi.
+    Natijalar ORM obyektlari emas, qator/qiymat bo'lishi kerak (boshqa session'ga bog'lanmasligi uchun).
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('PARALLEL_QUERIES') or len(tasks) < 2:
+        return {name: fn() for name, fn in tasks.items()}
+
+    executor, slots = _pool(app)
+    names = list(tasks)
+    futures = {}
+    inline = [names[-1]]
+    for name in names[:-1]:
+        if slots.acquire(blocking=False):
+            futures[name] = executor.submit(_call, app, slots, tasks[name])
+        else:
+            inline.append(name)
+
+    results = {}
+    error = None
+    try:
+        for name in inline:
+            results[name] = tasks[name]()
+    finally:
+        # Parallel vazifalar har doim kutiladi — ulanishlar pool'ga qaytmaguncha chiqmaymiz
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                error = error or e
+    if error is not None:
+        raise error
+    return {name: results[name] for name in names}
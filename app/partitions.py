@@ -0,0 +1,163 @@
+"""
+PostgreSQL: sales jadvalini oylik RANGE bo'limlarga (partition) ajratish — ixtiyoriy, SALES_PARTITIONING=1.
+
+sales — sale_date bo'yicha e'lon qilingan (declarative) partitioned jadval; har oy alohida
+bo'lim (sales_y2026m01, ...) va oraliqdan tashqari sanalar uchun sales_default.
+Sana filtri bor so'rovlarda planner keraksiz bo'limlarni tashlab yuboradi: joriy oy
+so'rovlari butun tarix indekslarini emas, bitta-ikkita bo'limni o'qiydi.
+
+- migrate()          — mavjud oddiy jadvalni bo'limlarga ko'chiradi (bitta tranzaksiya,
+                       jadval butunlay bloklanadi — texnik tanaffusda bajaring);
+- ensure_partitions() — kelgusi oylar bo'limlarini oldindan yaratadi (ilova ishga tushganda
+                       va cron orqali: python3 manage_partitions.py).
+
+Cheklovlar (PostgreSQL talabi — unikal indeks bo'lim kalitini o'z ichiga olishi kerak):
+PK (id, sale_date), client_key unikal indeksi (client_key, sale_date). Sync endpointi
+kalitlarni baribir bitta IN so'rovi bilan oldindan tekshiradi (app/sales_sync.py).
+"""
+from datetime import date
+from sqlalchemy import text
+from app import db
+from app.models import Sale
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_PARTITION = 'sales_default'
+
+
+def enabled(app):
+    return bool(app.config.get('SALES_PARTITIONING')) and db.engine.dialect.name == 'postgresql'
+
+
+def _month(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'sales_y{month.year}m{month.month:02d}'
+
+
+def is_partitioned():
+    """sales allaqachon partitioned jadvalmi (pg_class.relkind = 'p')"""
+    return db.session.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('sales')"
+    )).scalar() == 'p'
+
+
+def partitions():
+    """Mavjud bo'limlar: [(nom, chegara), ...] — nom bo'yicha tartiblangan"""
+    return [tuple(row) for row in db.session.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('sales')
+        ORDER BY c.relname
+    """))]
+
+
+def _bounds(month):
+    return f"FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+
+
+def _create_partition(month):
+    """
+    Oylik bo'lim: avval alohida jadval, sales_default dagi shu oy qatorlari unga ko'chiriladi,
+    keyin ATTACH — default bo'limda shu oraliq qatorlari bo'lsa ham xato bermaydi.
+    """
+    name = partition_name(month)
+    start, end = month.isoformat(), _next_month(month).isoformat()
+    db.session.execute(text(f'CREATE TABLE {name} (LIKE sales INCLUDING DEFAULTS)'))
+    db.session.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_range "
+                            f"CHECK (sale_date >= DATE '{start}' AND sale_date < DATE '{end}')"))
+    if db.session.execute(text("SELECT to_regclass(:name)"), {'name': DEFAULT_PARTITION}).scalar():
+        moved = f"sale_date >= DATE '{start}' AND sale_date < DATE '{end}'"
+        db.session.execute(text(f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {moved}'))
+        db.session.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE {moved}'))
+    # CHECK cheklovi ATTACH paytidagi to'liq tekshiruv skanini keraksiz qiladi
+    db.session.execute(text(f'ALTER TABLE sales ATTACH PARTITION {name} FOR VALUES {_bounds(month)}'))
+    db.session.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT {name}_range'))
+
+
+def ensure_partitions(months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """Joriy oy va keyingi months_ahead oy bo'limlarini yaratadi (bor bo'lsa o'tkazib yuboradi); qaytaradi: yaratilganlar"""
+    month = _month(today or date.today())
+    created = []
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        if db.session.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+            _create_partition(month)
+            created.append(name)
+        month = _next_month(month)
+    db.session.commit()
+    return created
+
+
+def _create_indexes():
+    """Model indekslari partitioned jadvalda; unikallariga bo'lim kaliti (sale_date) qo'shiladi"""
+    db.session.execute(text('ALTER TABLE sales ADD PRIMARY KEY (id, sale_date)'))
+    db.session.execute(text('ALTER TABLE sales ADD FOREIGN KEY (customer_id) REFERENCES customers (id)'))
+    db.session.execute(text('ALTER TABLE sales ADD FOREIGN KEY (product_id) REFERENCES products (id)'))
+    for index in Sale.__table__.indexes:
+        columns = [c.name for c in index.columns]
+        if index.unique and 'sale_date' not in columns:
+            columns.append('sale_date')
+        unique = 'UNIQUE ' if index.unique else ''
+        db.session.execute(text(f'CREATE {unique}INDEX {index.name} ON sales ({", ".join(columns)})'))
+
+
+def migrate(months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """
+    Oddiy sales jadvalini oylik bo'limlarga ko'chiradi (bitta tranzaksiya; xatoda hech narsa o'zgarmaydi).
+    Qaytaradi: ko'chirilgan qatorlar soni
+    """
+    today = today or date.today()
+    try:
+        db.session.execute(text('LOCK TABLE sales IN ACCESS EXCLUSIVE MODE'))
+        first = db.session.execute(text('SELECT MIN(sale_date) FROM sales')).scalar() or today
+        sequence = db.session.execute(text("SELECT pg_get_serial_sequence('sales', 'id')")).scalar()
+        db.session.execute(text('ALTER TABLE sales RENAME TO sales_unpartitioned'))
+        db.session.execute(text(
+            'CREATE TABLE sales (LIKE sales_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (sale_date)'
+        ))
+        if sequence:
+            # id ketma-ketligi eski jadval bilan birga o'chib ketmasligi uchun
+            db.session.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY sales.id'))
+        db.session.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF sales DEFAULT'))
+        month, last = _month(first), _month(today)
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        while month <= last:
+            db.session.execute(text(
+                f'CREATE TABLE {partition_name(month)} PARTITION OF sales FOR VALUES {_bounds(month)}'
+            ))
+            month = _next_month(month)
+        moved = db.session.execute(text('INSERT INTO sales SELECT * FROM sales_unpartitioned')).rowcount
+        db.session.execute(text('DROP TABLE sales_unpartitioned'))
+        # Indekslar ko'chirishdan keyin — qatorma-qator yangilashdan tezroq
+        _create_indexes()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return moved
+
+
+def init_layout(app):
+    """
+    Ilova ishga tushganda (SALES_PARTITIONING=1, PostgreSQL): bo'sh jadval darhol bo'limlarga
+    o'tkaziladi, partitioned jadval uchun kelgusi oylar bo'limlari yaratiladi.
+    To'ldirilgan oddiy jadval avtomatik ko'chirilmaydi — manage_partitions.py --migrate.
+    """
+    if not enabled(app):
+        return
+    months_ahead = app.config.get('SALES_PARTITION_MONTHS_AHEAD', DEFAULT_MONTHS_AHEAD)
+    if is_partitioned():
+        for name in ensure_partitions(months_ahead):
+            print(f"  ✅ {name} bo'limi yaratildi")
+    elif db.session.query(Sale.id).first() is None:
+        migrate(months_ahead)
+        print("  ✅ sales oylik bo'limlarga o'tkazildi")
+    else:
+        print("  ℹ️  SALES_PARTITIONING=1, lekin sales hali oddiy jadval: python manage_partitions.py --migrate")
@@ -0,0 +1,185 @@
+"""
+Mijoz va do'konlarni hudud poligonlariga biriktirish (point-in-polygon, NumPy).
+
+Poligonlar app/region_geometry.py keshidan olinadi (har biri bir marta o'qiladi); har
+hudud uchun qirralar massivi va bbox tayyorlanadi (regions jadvali hisoblagichi o'zgarmaguncha
+keshda). Nuqtalar bitta so'rov bilan olinadi; har hudud uchun faqat bbox ichidagi nuqtalar
+ustida nur kesish (even-odd) testi bitta vektorlangan NumPy ifodasi bilan bajariladi —
+teshiklar va MultiPolygon qismlari shu qoida bilan to'g'ri hisoblanadi.
+
+Natija customers.geo_region_id / shops.geo_region_id ustunlarida saqlanadi: hudud bo'yicha
+savdo — bitta JOIN (sales_daily_rollup -> customers, app/analytics.py: region_sales).
+Nuqta bir nechta hududga tushsa, maydoni eng kichigi tanlanadi (ichma-ich hududlar).
+shops.region_id — qo'lda belgilanadigan hudud, bu yerda o'zgartirilmaydi.
+
+- assign() — to'liq qayta biriktirish (POST /api/regions/assign, python3 assign_regions.py);
+- reassign_around() — hudud poligoni o'zgarganda faqat eski/yangi poligon bbox'idagi nuqtalar
+             (xatosi hudud saqlanishiga ta'sir qilmaydi);
+- locate() — bitta nuqta (mijoz/do'kon yaratish va koordinatasi o'zgarganda).
+"""
+import threading
+import numpy as np
+from sqlalchemy import update, and_, or_
+from app import db, watermark, changes, region_geometry
+from app.models import Region, Customer, Shop
+
+TARGETS = {'customers': Customer, 'shops': Shop}
+CHUNK_ELEMENTS = 2_000_000  # nuqtalar x qirralar matritsasi bo'lagi (xotirani cheklash uchun)
+UPDATE_CHUNK = 1000
+
+_lock = threading.Lock()
+_cache = {'version': None, 'regions': None}
+
+
+def _prepare(region_id, polygons):
+    """Hudud poligonlari -> {'id', 'area', 'bbox', 'edges'} yoki None (bo'sh/noto'g'ri)"""
+    rings = [np.asarray(ring, dtype=float) for rings in polygons for ring in rings]
+    rings = [ring for ring in rings if np.isfinite(ring).all()]
+    if not rings:
+        return None
+    x1 = np.concatenate([ring[:, 0] for ring in rings])
+    y1 = np.concatenate([ring[:, 1] for ring in rings])
+    x2 = np.concatenate([np.roll(ring[:, 0], -1) for ring in rings])
+    y2 = np.concatenate([np.roll(ring[:, 1], -1) for ring in rings])
+    area = sum(abs(float(np.dot(ring[:, 0], np.roll(ring[:, 1], -1)) - np.dot(np.roll(ring[:, 0], -1), ring[:, 1]))) / 2
+               for ring in rings)
+    # Gorizontal qirralar nurni hech qachon kesmaydi — oldindan tashlanadi
+    keep = y1 != y2
+    x1, y1, x2, y2 = x1[keep], y1[keep], x2[keep], y2[keep]
+    slope = (x2 - x1) / (y2 - y1)
+    return {
+        'id': region_id,
+        'area': area,
+        'bbox': (float(x1.min()), float(y1.min()), float(x1.max()), float(y1.max())) if len(x1) else None,
+        'edges': (x1, y1, y2, slope),
+    }
+
+
+def regions():
+    """Tayyorlangan hudud poligonlari (maydoni o'sish tartibida) — regions hisoblagichi bo'yicha keshda"""
+    version = watermark.current(['regions']).get('regions')
+    with _lock:
+        if _cache['regions'] is not None and version is not None and _cache['version'] == version:
+            return _cache['regions']
+        prepared = [
+            _prepare(region_id, region_geometry.polygons(region_id, raw)) for region_id, raw in
+            db.session.query(Region.id, Region.polygon_coordinates).filter(Region.polygon_coordinates.isnot(None))
+        ]
+        prepared = sorted((p for p in prepared if p and p['bbox']), key=lambda p: p['area'])
+        _cache.update(version=version, regions=prepared)
+        return prepared
+
+
+def _contains(region, lon, lat):
+    """Nuqtalar massivi poligon ichidami (even-odd) — nuqtalar x qirralar bo'laklab, vektorlangan"""
+    x1, y1, y2, slope = region['edges']
+    inside = np.zeros(len(lon), dtype=bool)
+    step = max(1, CHUNK_ELEMENTS // max(1, len(x1)))
+    for start in range(0, len(lon), step):
+        px, py = lon[start:start + step, None], lat[start:start + step, None]
+        crosses = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * slope)
+        inside[start:start + step] = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside
+
+
+def locate_all(lon, lat, prepared=None):
+    """lon/lat massivlari -> hudud id massivi (-1 — hech qaysi hududda emas; NaN ham -1)"""
+    prepared = regions() if prepared is None else prepared
+    lon, lat = np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+    found = np.full(len(lon), -1, dtype=np.int64)
+    for region in prepared:
+        min_lon, min_lat, max_lon, max_lat = region['bbox']
+        # Kichik hudud allaqachon olgan nuqtalar qayta tekshirilmaydi
+        candidates = np.flatnonzero(
+            (found < 0) & (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+        )
+        if len(candidates):
+            found[candidates[_contains(region, lon[candidates], lat[candidates])]] = region['id']
+    return found
+
+
+def locate(lon, lat):
+    """Bitta nuqta uchun hudud id'si yoki None"""
+    if lon is None or lat is None:
+        return None
+    region_id = int(locate_all([float(lon)], [float(lat)])[0])
+    return region_id if region_id >= 0 else None
+
+
+def bbox(region_id, raw):
+    """Hudud poligonining bbox'i (min_lon, min_lat, max_lon, max_lat) yoki None (poligon yo'q)"""
+    points = [p for polygon in region_geometry.polygons(region_id, raw) for ring in polygon for p in ring]
+    if not points:
+        return None
+    lon = [p[0] for p in points]
+    lat = [p[1] for p in points]
+    return min(lon), min(lat), max(lon), max(lat)
+
+
+def assign(names=tuple(TARGETS), bboxes=None):
+    """
+    Mijoz/do'konlarni qayta biriktiradi; faqat o'zgarganlari yoziladi (hudud bo'yicha
+    IN bo'laklari, Core UPDATE + watermark/change_log). Commit qiladi.
+    bboxes berilsa — faqat shu bbox'lardan biriga tushgan nuqtalar (SQL filtri).
+    Qaytaradi: {jadval: {'total', 'assigned', 'unassigned', 'changed'}}
+    """
+    prepared = regions()
+    stats, touched = {}, []
+    for name in names:
+        model = TARGETS[name]
+        query = db.session.query(model.id, model.longitude, model.latitude, model.geo_region_id)
+        if bboxes is not None:
+            query = query.filter(or_(*[
+                and_(model.longitude.between(min_lon, max_lon), model.latitude.between(min_lat, max_lat))
+                for min_lon, min_lat, max_lon, max_lat in bboxes
+            ]))
+        rows = query.all()
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        lon = np.array([float(r[1]) if r[1] is not None else np.nan for r in rows], dtype=float)
+        lat = np.array([float(r[2]) if r[2] is not None else np.nan for r in rows], dtype=float)
+        current = np.array([r[3] if r[3] is not None else -1 for r in rows], dtype=np.int64)
+        found = locate_all(lon, lat, prepared)
+        changed = found != current
+
+        by_region = {}
+        for item_id, region_id in zip(ids[changed].tolist(), found[changed].tolist()):
+            by_region.setdefault(region_id, []).append(item_id)
+        table = model.__table__
+        for region_id, item_ids in by_region.items():
+            for start in range(0, len(item_ids), UPDATE_CHUNK):
+                db.session.execute(update(table).where(table.c.id.in_(item_ids[start:start + UPDATE_CHUNK])).values(
+                    geo_region_id=region_id if region_id >= 0 else None
+                ))
+        if changed.any():
+            touched.append(name)
+            if model in changes.TRACKED:
+                changes.record_updates(model, ids[changed].tolist())
+        assigned = int(np.count_nonzero(found >= 0))
+        stats[name] = {
+            'total': len(ids),
+            'assigned': assigned,
+            'unassigned': len(ids) - assigned,
+            'changed': int(np.count_nonzero(changed)),
+        }
+    if touched:
+        watermark.touch(*touched)
+    db.session.commit()
+    return stats
+
+
+def reassign_around(*bboxes):
+    """
+    Hudud poligoni o'zgargandan keyin (yaratish/tahrirlash): faqat eski va yangi poligon
+    bbox'idagi mijoz/do'konlar qayta biriktiriladi — boshqa nuqtalarning hududi o'zgara olmaydi.
+    Xato bo'lsa rollback qilinadi va None qaytadi: hudud allaqachon saqlangan, biriktirishni
+    keyin POST /api/regions/assign bilan to'liq qayta bajarish mumkin.
+    """
+    bboxes = [b for b in bboxes if b]
+    if not bboxes:
+        return None
+    try:
+        return assign(bboxes=bboxes)
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️  Hududga qayta biriktirishda xato: {e}")
+        return None
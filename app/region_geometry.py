@@ -0,0 +1,217 @@
+"""
+Hudud poligonlari keshi: har poligon bir marta o'qiladi, zoom darajalari uchun soddalashtiriladi.
+
+Region.polygon_coordinates — GeoJSON matni (Polygon, MultiPolygon, Feature, FeatureCollection
+yoki xom koordinatalar massivi, [lon, lat]). Kesh yozuvi hudud id'si va shu matn bo'yicha:
+matn o'zgarmaguncha json.loads ham, soddalashtirish ham qayta bajarilmaydi (nom/status
+o'zgarishi geometriyani bekor qilmaydi).
+
+- parsed()   — asl JSON obyekti (Region.to_dict, /occupied-regions);
+- polygons() — normallashtirilgan [poligon[halqa[[lon, lat], ...]]] (app/region_assign.py);
+- feature_collection(zoom) — GET /api/regions/geojson: LEVELS dagi zoom uchun Douglas–Peucker
+  bilan soddalashtirilgan (chidamlilik — shu zoomda ~1 piksel) FeatureCollection. Tayyor JSON
+  va gzip tanasi regions/shops hisoblagichlari o'zgarmaguncha keshda.
+"""
+import gzip
+import json
+import math
+import threading
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+from app import db, watermark
+from app.models import Region, Shop
+
+LEVELS = (3, 6, 9, 12)  # soddalashtirilgan darajalar; zoom > 12 — to'liq aniqlik
+GZIP_LEVEL = 6
+STATUSES = ('occupied', 'in_progress', 'planned')  # feature_collection status filtri (keshlanadi)
+
+_lock = threading.RLock()
+_entries = {}  # region id -> {'raw', 'parsed', 'polygons', 'levels': {daraja: poligonlar}}
+_bodies = {}   # (daraja, status) -> (kalit, json baytlar, gzip baytlar); status — None yoki STATUSES
+
+
+def _is_position(value):
+    return isinstance(value, list) and len(value) >= 2 and all(isinstance(v, (int, float)) for v in value[:2])
+
+
+def _normalize(geometry):
+    """GeoJSON obyekti yoki massiv -> [poligon[halqa]] (halqalar yopiq, [lon, lat])"""
+    if isinstance(geometry, dict):
+        kind = geometry.get('type')
+        if kind == 'FeatureCollection':
+            return [p for feature in geometry.get('features') or [] for p in _normalize(feature)]
+        if kind == 'Feature':
+            return _normalize(geometry.get('geometry'))
+        if kind == 'GeometryCollection':
+            return [p for part in geometry.get('geometries') or [] for p in _normalize(part)]
+        return _normalize(geometry.get('coordinates'))
+    if not isinstance(geometry, list) or not geometry:
+        return []
+    if _is_position(geometry[0]):
+        rings = [geometry]                      # bitta halqa
+    elif geometry[0] and _is_position(geometry[0][0]):
+        rings = geometry                        # Polygon: halqalar
+    else:
+        return [p for part in geometry for p in _normalize(part)]  # MultiPolygon
+    closed = []
+    for ring in rings:
+        ring = [[float(p[0]), float(p[1])] for p in ring if _is_position(p)]
+        if ring and ring[0] != ring[-1]:
+            ring.append(ring[0])
+        if len(ring) >= 4:
+            closed.append(ring)
+    return [closed] if closed else []
+
+
+def _entry(region_id, raw):
+    """Kesh yozuvi — matn o'zgargan bo'lsa (yoki yo'q bo'lsa) qayta o'qiladi"""
+    with _lock:
+        entry = _entries.get(region_id)
+        if entry is not None and entry['raw'] == raw:
+            return entry
+        try:
+            parsed = json.loads(raw) if isinstance(raw, str) else raw
+            polygons = _normalize(parsed)
+        except (ValueError, TypeError, KeyError):
+            parsed, polygons = None, []
+        entry = {'raw': raw, 'parsed': parsed, 'polygons': polygons, 'levels': {}}
+        _entries[region_id] = entry
+        return entry
+
+
+def parsed(region_id, raw):
+    """polygon_coordinates ning asl JSON ko'rinishi (yoki None) — keshdan"""
+    return _entry(region_id, raw)['parsed'] if raw else None
+
+
+def polygons(region_id, raw):
+    return _entry(region_id, raw)['polygons'] if raw else []
+
+
+def tolerance(level):
+    """level zoomidagi bitta piksel (256px tile, ekvator) — gradusda"""
+    return 360.0 / (256 * 2 ** level)
+
+
+def level_for(zoom):
+    """zoom uchun daraja: shu zoomdan kichik bo'lmagan eng yaqin LEVELS qiymati; None — to'liq"""
+    if zoom is None:
+        return None
+    return next((level for level in LEVELS if level >= zoom), None)
+
+
+def douglas_peucker(points, tol):
+    """(n, 2) massiv -> soddalashtirilgan massiv (birinchi va oxirgi nuqta har doim qoladi)"""
+    n = len(points)
+    if n <= 2:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        inner = points[start + 1:end]
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            # Yopiq halqa (boshi = oxiri) — boshlang'ich nuqtagacha masofa
+            dist = np.hypot(inner[:, 0] - a[0], inner[:, 1] - a[1])
+        else:
+            dist = np.abs(dx * (inner[:, 1] - a[1]) - dy * (inner[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tol:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def _simplify(source, level):
+    """Poligonlarni level chidamliligi bilan soddalashtiradi; 4 nuqtadan kam qolgan halqalar tashlanadi"""
+    tol = tolerance(level)
+    digits = min(7, max(1, math.ceil(-math.log10(tol)) + 1))
+    result = []
+    for rings in source:
+        simplified = [np.round(douglas_peucker(np.asarray(ring), tol), digits) for ring in rings]
+        if len(simplified[0]) < 4:
+            continue
+        result.append([ring.tolist() for ring in simplified if len(ring) >= 4])
+    if not result and source:
+        # Juda kichik hudud — eng aqalli tashqi halqa saqlanadi (chidamlilik kamaytiriladi)
+        ring = np.asarray(source[0][0])
+        while tol > 1e-9:
+            tol /= 4
+            simplified = douglas_peucker(ring, tol)
+            if len(simplified) >= 4:
+                break
+        if len(simplified) < 4:
+            simplified = ring
+        result.append([np.round(simplified, 7).tolist()])
+    return result
+
+
+def _geometry(region_id, raw, level):
+    entry = _entry(region_id, raw)
+    if not entry['polygons']:
+        return None
+    if level is None:
+        source = entry['polygons']
+    else:
+        with _lock:
+            source = entry['levels'].get(level)
+            if source is None:
+                source = entry['levels'][level] = _simplify(entry['polygons'], level)
+    if len(source) == 1:
+        return {'type': 'Polygon', 'coordinates': source[0]}
+    return {'type': 'MultiPolygon', 'coordinates': source}
+
+
+def feature_collection(zoom=None, status=None):
+    """
+    Hududlar FeatureCollection'i (faqat poligoni borlari): (json baytlar, gzip baytlar).
+    properties: id, name, status, shops_count. Tana regions/shops o'zgarmaguncha keshda.
+    """
+    level = level_for(zoom)
+    versions = watermark.current(['regions', 'shops'])
+    key = tuple(sorted(versions.items()))
+    with _lock:
+        cached = _bodies.get((level, status))
+        if cached is not None and versions and cached[0] == key:
+            return cached[1], cached[2]
+
+    shops_count = db.session.query(
+        Shop.region_id, func.count(Shop.id).label('n')
+    ).group_by(Shop.region_id).subquery()
+    query = db.session.query(
+        Region.id, Region.name, Region.status, Region.polygon_coordinates, shops_count.c.n
+    ).outerjoin(shops_count, shops_count.c.region_id == Region.id).filter(
+        Region.polygon_coordinates.isnot(None)
+    )
+    if status:
+        query = query.filter(Region.status == status)
+    features = []
+    for row in query.order_by(Region.name).all():
+        geometry = _geometry(row.id, row.polygon_coordinates, level)
+        if geometry is None:
+            continue
+        features.append({
+            'type': 'Feature',
+            'id': row.id,
+            'geometry': geometry,
+            'properties': {'id': row.id, 'name': row.name, 'status': row.status, 'shops_count': row.n or 0},
+        })
+    body = current_app.json.dumps({'type': 'FeatureCollection', 'features': features}).encode('utf-8')
+    compressed = gzip.compress(body, GZIP_LEVEL)
+    with _lock:
+        if status is None:
+            # O'chirilgan hududlar yozuvlari tozalanadi
+            alive = {feature['id'] for feature in features}
+            for region_id in [r for r in _entries if r not in alive]:
+                del _entries[region_id]
+        _bodies[(level, status)] = (key, body, compressed)
+    return body, compressed
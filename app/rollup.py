@@ -0,0 +1,145 @@
+"""
+Kunlik savdo rollup jadvali (sales_daily_rollup).
+
+Har bir (sana, mahsulot, mijoz) uchun summa, miqdor, foyda va savdolar soni
+saqlanadi. Savdo yaratilganda/yangilanganda/o'chirilganda shu tranzaksiya
+ichida yangilanadi, shuning uchun dashboard so'rovlari xom `sales` qatorlari
+soniga emas, kunlar × mahsulotlar soniga bog'liq bo'ladi.
+"""
+from sqlalchemy import func, select, delete, and_
+from app import db, watermark, cache
+from app.models import Sale, Product, SalesDailyRollup
+from app.analytics import profit_expr
+from app import snapshots
+
+_KEY = ('sale_date', 'product_id', 'customer_id')
+_VALUES = ('amount', 'quantity', 'profit', 'sales_count')
+
+
+def _sale_profit(sale):
+    """Savdo foydasi — o'qish ifodasi bilan bir xil: saqlangan profit yoki amount - (tan narxi * miqdor)"""
+    if sale.profit is not None:
+        return float(sale.profit)
+    product = sale.product or (Product.query.get(sale.product_id) if sale.product_id else None)
+    if product is None or product.purchase_price is None or sale.amount is None:
+        return 0.0
+    return float(sale.amount) - float(product.purchase_price) * (sale.quantity or 0)
+
+
+def snapshot(sale):
+    """Savdoning rollup'ga qo'shadigan hissasi: (kalit, [summa, miqdor, foyda, soni])"""
+    key = (sale.sale_date, sale.product_id, sale.customer_id)
+    return key, [float(sale.amount or 0), int(sale.quantity or 0), _sale_profit(sale), 1]
+
+
+def apply(changes):
+    """
+    changes: [(snapshot, ishora), ...] — ishora +1 (qo'shish) yoki -1 (ayirish).
+    Bir xil kalitdagi o'zgarishlar birlashtiriladi va bitta upsert bilan yoziladi.
+    Commit qilmaydi — chaqiruvchi tranzaksiyasi ichida ishlaydi.
+    """
+    deltas = {}
+    for (key, values), sign in changes:
+        acc = deltas.setdefault(key, [0.0, 0, 0.0, 0])
+        for i, v in enumerate(values):
+            acc[i] += sign * v
+    rows = [
+        {**dict(zip(_KEY, key)), **dict(zip(_VALUES, (round(v[0], 2), v[1], round(v[2], 2), v[3])))}
+        for key, v in deltas.items()
+        if any(v)
+    ]
+    if not rows:
+        return
+    _upsert(rows)
+    # O'zgargan sanalar tushgan yopilgan oylarning snapshotlari qayta quriladi
+    snapshots.invalidate_dates({r['sale_date'] for r in rows})
+    if any(r['sales_count'] < 0 for r in rows):
+        _prune([tuple(r[k] for k in _KEY) for r in rows if r['sales_count'] < 0])
+
+
+def record(sale, sign=1):
+    """Bitta savdoni rollup'ga qo'shadi (sign=1) yoki ayiradi (sign=-1)"""
+    apply([(snapshot(sale), sign)])
+
+
+def _upsert(rows):
+    """Dialektga mos atomar INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE (qiymatlar qo'shiladi)"""
+    table = SalesDailyRollup.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update({c: table.c[c] + stmt.inserted[c] for c in _VALUES})
+    elif dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_KEY),
+            set_={c: table.c[c] + stmt.excluded[c] for c in _VALUES}
+        )
+    else:
+        for r in rows:
+            row = db.session.get(SalesDailyRollup, tuple(r[k] for k in _KEY))
+            if row is None:
+                db.session.add(SalesDailyRollup(**r))
+            else:
+                for c in _VALUES:
+                    setattr(row, c, (getattr(row, c) or 0) + r[c])
+        db.session.flush()
+        return
+    db.session.execute(stmt, rows)
+
+
+def _prune(keys):
+    """Savdolari qolmagan (sales_count <= 0) qatorlarni o'chiradi"""
+    table = SalesDailyRollup.__table__
+    for sale_date, product_id, customer_id in keys:
+        db.session.execute(delete(table).where(and_(
+            table.c.sale_date == sale_date,
+            table.c.product_id == product_id,
+            table.c.customer_id == customer_id,
+            table.c.sales_count <= 0
+        )))
+
+
+def rebuild():
+    """
+    Rollup jadvalini `sales` dan to'liq qayta quradi (bitta INSERT ... SELECT ... GROUP BY) va commit qiladi.
+    ETag hisoblagichi va javob keshi ham yangilanadi — eski raqamlar 304/keshdan qaytmaydi.
+    """
+    table = SalesDailyRollup.__table__
+    source = select(
+        Sale.sale_date,
+        Sale.product_id,
+        Sale.customer_id,
+        func.sum(Sale.amount),
+        func.sum(Sale.quantity),
+        func.coalesce(func.sum(profit_expr()), 0),
+        func.count(Sale.id)
+    ).select_from(Sale).outerjoin(
+        Product, Sale.product_id == Product.id
+    ).group_by(Sale.sale_date, Sale.product_id, Sale.customer_id)
+    try:
+        db.session.execute(delete(table))
+        db.session.execute(table.insert().from_select(list(_KEY) + list(_VALUES), source))
+        snapshots.invalidate_all()
+        watermark.touch('sales')
+        cache.mark_dirty(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return db.session.query(func.count()).select_from(table).scalar()
+
+
+def ensure_populated():
+    """Rollup bo'sh, lekin savdolar mavjud bo'lsa (yangi o'rnatish/yangilanish) — bir marta qayta quradi"""
+    if db.session.query(SalesDailyRollup.sale_date).first() is not None:
+        return False
+    if db.session.query(Sale.id).first() is None:
+        return False
+    rebuild()
+    return True
@@ -4,6 +4,7 @@ from app import db
 from app.models import User, Sale, Product, Customer
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from app import analytics
 import os
 
 ai_bp = Blueprint('ai', __name__)
@@ -28,33 +29,17 @@ def get_business_context():
     today = datetime.now().date()
     month_start = today.replace(day=1)
     
-    # Asosiy statistikalar
-    total_sales = db.session.query(func.sum(Sale.amount)).filter(
-        Sale.sale_date >= month_start
-    ).scalar() or 0
+    # Asosiy statistikalar (kunlik rollup jadvalidan)
+    total_sales = analytics.period_totals(month_start).amount or 0
     
     customers_count = Customer.query.count()
     products_count = Product.query.filter_by(status='active').count()
     
     # Eng ko'p sotilgan mahsulotlar
-    top_products = db.session.query(
-        Product.name,
-        func.sum(Sale.quantity).label('quantity')
-    ).select_from(Product).join(Sale, Product.id == Sale.product_id).filter(
-        Sale.sale_date >= month_start
-    ).group_by(Product.name).order_by(
-        func.sum(Sale.quantity).desc()
-    ).limit(5).all()
+    top_products = analytics.top_products(5, start=month_start)
     
     # Eng ko'p xarid qilgan mijozlar
-    top_customers = db.session.query(
-        Customer.name,
-        func.sum(Sale.amount).label('amount')
-    ).select_from(Customer).join(Sale, Customer.id == Sale.customer_id).filter(
-        Sale.sale_date >= month_start
-    ).group_by(Customer.name).order_by(
-        func.sum(Sale.amount).desc()
-    ).limit(5).all()
+    top_customers = analytics.top_customers(5, start=month_start)
     
     context = f"""
 Nur & Garden Management System - Biznes ma'lumotlari:
@@ -66,11 +51,11 @@ Mahsulotlar soni: {products_count}
 Eng ko'p sotilgan mahsulotlar:
 """
     for product in top_products:
-        context += f"- {product.name}: {product.quantity} dona\n"
+        context += f"- {product.name}: {product.total_quantity} dona\n"
     
     context += "\nEng ko'p xarid qilgan mijozlar:\n"
     for customer in top_customers:
-        context += f"- {customer.name}: {customer.amount:,.0f} so'm\n"
+        context += f"- {customer.name}: {customer.total_amount:,.0f} so'm\n"
     
     return context
 
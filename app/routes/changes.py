@@ -0,0 +1,32 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import changes
+
+changes_bp = Blueprint('changes', __name__)
+
+CHANGES_PAGE_DEFAULT = 500
+CHANGES_PAGE_MAX = 5000
+
+@changes_bp.route('', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """
+    O'zgarishlar oqimi (sales, products, customers) — lokal nusxani delta bilan yangilash.
+    Query: since= (oldingi javobdagi next_cursor), limit=500 (1..5000), tables=sales,products,customers
+    Javob: {'changes': [{'cursor', 'table', 'id', 'op': upsert|delete, 'data'}], 'next_cursor', 'has_more'}
+    since berilmasa — o'zgarishlarsiz joriy cursor: avval shu cursor'ni olib, keyin to'liq ro'yxatlarni yuklang.
+    """
+    user_id = int(get_jwt_identity())
+    limit = min(CHANGES_PAGE_MAX, max(1, request.args.get('limit', type=int) or CHANGES_PAGE_DEFAULT))
+    tables = tuple(t for t in request.args.get('tables', ','.join(changes.TABLES)).split(',') if t)
+    if not tables or any(t not in changes.TABLES for t in tables):
+        return jsonify({'error': f'tables faqat: {", ".join(changes.TABLES)}'}), 400
+    
+    if request.args.get('since') is None:
+        return jsonify({'changes': [], 'next_cursor': changes.latest_cursor(), 'has_more': False}), 200
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': 'since butun son bo\'lishi kerak'}), 400
+    
+    items, next_cursor, has_more = changes.fetch(since, limit, tables)
+    return jsonify({'changes': items, 'next_cursor': next_cursor, 'has_more': has_more}), 200
@@ -1,18 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from app import db, snapshots, fields, spatial, clusters, region_assign
 from app.models import Customer
 from datetime import datetime
+from app.watermark import conditional
 
 customers_bp = Blueprint('customers', __name__)
 
 @customers_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('customers')
 def get_customers():
     """Barcha mijozlarni qaytaradi"""
     user_id = int(get_jwt_identity())
     customers = Customer.query.order_by(Customer.created_at.desc()).all()
-    return jsonify([customer.to_dict() for customer in customers]), 200
+    return jsonify(fields.sparse([customer.to_dict() for customer in customers])), 200
 
 @customers_bp.route('', methods=['POST'])
 @jwt_required()
@@ -32,6 +34,7 @@ def create_customer():
         latitude=data.get('latitude'),
         longitude=data.get('longitude')
     )
+    customer.geo_region_id = region_assign.locate(customer.longitude, customer.latitude)
     
     db.session.add(customer)
     db.session.commit()
@@ -66,6 +69,8 @@ def update_customer(customer_id):
         customer.latitude = data.get('latitude')
     if 'longitude' in data:
         customer.longitude = data.get('longitude')
+    if 'latitude' in data or 'longitude' in data:
+        customer.geo_region_id = region_assign.locate(customer.longitude, customer.latitude)
     
     customer.updated_at = datetime.utcnow()
     db.session.commit()
@@ -78,6 +83,7 @@ def delete_customer(customer_id):
     """Mijozni o'chiradi"""
     user_id = int(get_jwt_identity())
     customer = Customer.query.get_or_404(customer_id)
+    snapshots.invalidate_for(customer_id=customer.id)
     db.session.delete(customer)
     db.session.commit()
     
@@ -86,23 +92,21 @@ def delete_customer(customer_id):
 @customers_bp.route('/map-data', methods=['GET'])
 @jwt_required()
 def get_map_data():
-    """Xarita uchun mijozlar ma'lumotlari"""
+    """
+    Xarita uchun mijozlar ma'lumotlari (koordinatasi borlari).
+    Query: bbox=minLon,minLat,maxLon,maxLat — faqat ko'rinish oynasidagilar (app/spatial.py indeksi),
+           zoom=0..22 — zoom < clusters.MAX_ZOOM da klasterlar ({'cluster': true, count, sales_amount, ...})
+           va yakka nuqtalar (app/clusters.py)
+    """
     user_id = int(get_jwt_identity())
-    customers = Customer.query.filter(
-        Customer.latitude.isnot(None),
-        Customer.longitude.isnot(None)
-    ).all()
-    
-    result = []
-    for customer in customers:
-        result.append({
-            'id': customer.id,
-            'name': customer.name,
-            'additional_name': customer.additional_name,
-            'phone': customer.phone,
-            'address': customer.address,
-            'latitude': float(customer.latitude),
-            'longitude': float(customer.longitude)
-        })
-    
-    return jsonify(result), 200
+    try:
+        bbox = spatial.parse_bbox(request.args.get('bbox'))
+    except ValueError:
+        return jsonify({'error': 'bbox formati: minLon,minLat,maxLon,maxLat'}), 400
+    zoom = request.args.get('zoom', type=int)
+    if zoom is not None and not 0 <= zoom <= 22:
+        return jsonify({'error': 'zoom 0..22 oralig\'ida bo\'lishi kerak'}), 400
+    if zoom is not None and zoom < clusters.MAX_ZOOM:
+        groups, points = clusters.at_zoom('customers', zoom, bbox)
+        return jsonify(groups + fields.sparse(points)), 200
+    return jsonify(fields.sparse(spatial.points('customers', bbox))), 200
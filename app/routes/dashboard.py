@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Sale, Customer, Product, OnlineSale
 from datetime import datetime, timedelta, date
-from sqlalchemy import func
-from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.exc import OperationalError
 from calendar import monthrange
+from itertools import islice
+from app import analytics, cache, parallel, snapshots
+from app.cache import cached
+from app.watermark import conditional
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -42,72 +44,187 @@ def _default_stats():
     }
 
 
+def _default_detailed_stats():
+    """detailed-stats uchun DB xatoligidagi standart javob"""
+    return {
+        'top_product': {'name': 'Ma\'lumot yo\'q', 'quantity': 0, 'amount': 0},
+        'top_customer': {'name': 'Ma\'lumot yo\'q', 'amount': 0},
+        'total_sales_count': 0
+    }
+
+
+def _month_start_end(year, month):
+    """Berilgan yil-oy uchun oyning birinchi va oxirgi sanasi"""
+    last_day = monthrange(year, month)[1]
+    start = date(year, month, 1)
+    end = date(year, month, last_day)
+    return start, end
+
+
+def _dynamics_year_arg(args):
+    """period=all bo'lsa None (birinchi sotuvdan hozirgacha), aks holda year (standart: joriy yil)"""
+    if args.get('period', '').strip().lower() == 'all':
+        return None
+    year_param = args.get('year', '').strip()
+    return int(year_param) if year_param.isdigit() else datetime.now().year
+
+
+class DashboardData:
+    """
+    Bitta so'rov ichidagi oraliq natijalar — har biri birinchi kerak bo'lganda
+    bir marta hisoblanadi. Alohida endpointlar ham, /bundle ham shu orqali ishlaydi,
+    shuning uchun bundle ichida bir nechta vidjet bitta natijani bo'lishadi
+    (masalan, stats va detailed — umumiy yig'indi; growth/profit/count — oylik qator).
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.today = datetime.now().date()
+        self._memo = {}
+
+    def _once(self, name, compute):
+        if name not in self._memo:
+            self._memo[name] = compute()
+        return self._memo[name]
+
+    def summary(self):
+        return self._once('summary', lambda: analytics.sales_summary(self.today))
+
+    def monthly(self):
+        return self._once('monthly', lambda: analytics.monthly_series(self.today, _dynamics_year_arg(self.args)))
+
+    def top_products(self):
+        return self._once('top_products', lambda: analytics.top_products(10))
+
+    def top_customers(self):
+        return self._once('top_customers', lambda: analytics.top_customers(10))
+
+
+def _stats_payload(data):
+    row = data.summary()
+    monthly_sales = _to_float(row['monthly_sales'])
+    last_month_sales = _to_float(row['last_month_sales'])
+
+    growth_percent = 0.0
+    if last_month_sales > 0:
+        growth_percent = ((monthly_sales - last_month_sales) / last_month_sales) * 100
+
+    return {
+        'daily_sales': _to_float(row['daily_sales']),
+        'monthly_sales': monthly_sales,
+        'yearly_sales': _to_float(row['yearly_sales']),
+        'total_revenue': _to_float(row['total_revenue']),
+        'monthly_profit': _to_float(row['monthly_profit']),
+        'total_profit': _to_float(row['total_profit']),
+        'total_quantity_sold': _to_int(row['total_quantity_sold']),
+        'total_quantity_sold_all_time': _to_int(row['total_quantity_sold_all_time']),
+        'growth_percent': round(growth_percent, 2),
+        'customers_count': _to_int(row['customers_count']),
+        'products_count': _to_int(row['products_count'])
+    }
+
+
+def _dynamics_payload(data, fields):
+    """Oylik qatordan kerakli maydonlarni ajratib oladi"""
+    return [{'month': row['month'], **{f: row[f] for f in fields}} for row in data.monthly()]
+
+
+DAILY_MAX_DAYS = 366
+
+
+def _daily_payload(data):
+    days = min(DAILY_MAX_DAYS, max(7, data.args.get('days', type=int) or 30))
+    end_date = data.today
+    start_date = end_date - timedelta(days=days)
+    rows = analytics.daily_totals(start_date, end_date)
+    return [{'date': str(r.sale_date), 'sales': _to_float(r.amount), 'count': _to_int(r.count)} for r in rows]
+
+
+def _weekly_payload(data):
+    weeks = min(26, max(4, data.args.get('weeks', type=int) or 12))
+    end_date = data.today
+    # Barcha haftalar bitta GROUP BY so'rovi bilan (oldin har hafta uchun 2 ta so'rov)
+    points = analytics.timeseries('week', end_date - timedelta(days=weeks * 7 - 1), end_date)
+    return [
+        {
+            'week': p['start'].isoformat(),
+            'label': f"{p['start'].day}.{p['start'].month}-{p['end'].day}.{p['end'].month}",
+            'sales': p['amount'],
+            'count': p['count']
+        }
+        for p in points
+    ]
+
+
+def _top_products_payload(data):
+    return [
+        {'id': p.id, 'name': p.name, 'total_quantity': _to_int(p.total_quantity), 'total_amount': _to_float(p.total_amount)}
+        for p in data.top_products()
+    ]
+
+
+def _top_customers_payload(data):
+    return [
+        {'id': c.id, 'name': c.name, 'total_quantity': _to_int(c.total_quantity), 'total_amount': _to_float(c.total_amount)}
+        for c in data.top_customers()
+    ]
+
+
+def _detailed_payload(data):
+    # Top mahsulot (miqdor bo'yicha) va top mijoz (summa bo'yicha) — top ro'yxatlarning birinchisi
+    top_product = data.top_products()[0] if data.top_products() else None
+    top_customer = data.top_customers()[0] if data.top_customers() else None
+    total_sales_count = data.summary()['total_sales_count']
+    return {
+        'top_product': {
+            'name': top_product.name if top_product else 'Ma\'lumot yo\'q',
+            'quantity': _to_int(top_product.total_quantity) if top_product else 0,
+            'amount': _to_float(top_product.total_amount) if top_product else 0
+        },
+        'top_customer': {
+            'name': top_customer.name if top_customer else 'Ma\'lumot yo\'q',
+            'amount': _to_float(top_customer.total_amount) if top_customer else 0
+        },
+        'total_sales_count': _to_int(total_sales_count)
+    }
+
+
+# Bundle vidjetlari: nom -> (payload funksiyasi, DB xatoligidagi standart qiymat)
+WIDGETS = {
+    'stats': (_stats_payload, _default_stats),
+    'growth': (lambda d: _dynamics_payload(d, ['sales']), list),
+    'profit': (lambda d: _dynamics_payload(d, ['profit']), list),
+    'sales_count': (lambda d: _dynamics_payload(d, ['count']), list),
+    'monthly': (lambda d: _dynamics_payload(d, ['sales', 'profit', 'count']), list),
+    'daily': (_daily_payload, list),
+    'weekly': (_weekly_payload, list),
+    'top_products': (_top_products_payload, list),
+    'top_customers': (_top_customers_payload, list),
+    'detailed': (_detailed_payload, _default_detailed_stats),
+}
+DEFAULT_BUNDLE = ('stats', 'growth', 'profit', 'sales_count', 'daily', 'weekly', 'top_products', 'top_customers', 'detailed')
+
+
+def _widget_response(name):
+    """Bitta vidjet uchun endpoint javobi; DB xatoligida standart qiymat (200)"""
+    build, default = WIDGETS[name]
+    try:
+        return jsonify(build(DashboardData(request.args))), 200
+    except OperationalError:
+        db.session.rollback()
+        return jsonify(default()), 200
+
+
 @dashboard_bp.route('/stats', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_stats():
-    """Dashboard statistikalarini qaytaradi — har bir ko'rsatkich alohida, matematikaga to'g'ri"""
+    """Dashboard statistikalarini qaytaradi — barcha ko'rsatkichlar bitta so'rovda, matematikaga to'g'ri"""
     get_jwt_identity()
-    today = datetime.now().date()
-    this_month_start = today.replace(day=1)
-    this_year_start = today.replace(month=1, day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    last_month_end = this_month_start - timedelta(days=1)
-
     try:
-        # Har biri alohida so'rov — sum(amount) va sum(quantity) bir xil jadvaldan, matematik jihatdan izchil
-        daily_sales = _to_float(db.session.query(func.sum(Sale.amount)).filter(Sale.sale_date == today).scalar())
-        monthly_sales = _to_float(db.session.query(func.sum(Sale.amount)).filter(
-            Sale.sale_date >= this_month_start, Sale.sale_date <= today
-        ).scalar())
-        yearly_sales = _to_float(db.session.query(func.sum(Sale.amount)).filter(
-            Sale.sale_date >= this_year_start, Sale.sale_date <= today
-        ).scalar())
-        total_revenue = _to_float(db.session.query(func.sum(Sale.amount)).scalar())
-
-        total_quantity_sold = _to_int(db.session.query(func.sum(Sale.quantity)).filter(
-            Sale.sale_date >= this_month_start, Sale.sale_date <= today
-        ).scalar())
-        total_quantity_sold_all_time = _to_int(db.session.query(func.sum(Sale.quantity)).scalar())
-
-        last_month_sales = _to_float(db.session.query(func.sum(Sale.amount)).filter(
-            Sale.sale_date >= last_month_start, Sale.sale_date <= last_month_end
-        ).scalar())
-
-        growth_percent = 0.0
-        if last_month_sales > 0:
-            growth_percent = ((monthly_sales - last_month_sales) / last_month_sales) * 100
-
-        # Foyda: saqlangan profit bor bo'lsa shuni, yo'q bo'lsa amount - (tan narxi * miqdor)
-        profit_expr = func.coalesce(Sale.profit, Sale.amount - (Product.purchase_price * Sale.quantity))
-        monthly_profit = _to_float(db.session.query(func.sum(profit_expr)).join(
-            Product, Sale.product_id == Product.id
-        ).filter(
-            Sale.sale_date >= this_month_start, Sale.sale_date <= today
-        ).scalar())
-        total_profit = _to_float(db.session.query(func.sum(profit_expr)).join(
-            Product, Sale.product_id == Product.id
-        ).scalar())
-
-        customers_count = _to_int(db.session.query(func.count(Customer.id)).scalar())
-        try:
-            products_count = _to_int(db.session.query(func.count(Product.id)).filter(Product.status == 'active').scalar())
-        except (OperationalError, ProgrammingError):
-            products_count = _to_int(db.session.query(func.count(Product.id)).scalar())
-
-        return jsonify({
-            'daily_sales': daily_sales,
-            'monthly_sales': monthly_sales,
-            'yearly_sales': yearly_sales,
-            'total_revenue': total_revenue,
-            'monthly_profit': monthly_profit,
-            'total_profit': total_profit,
-            'total_quantity_sold': total_quantity_sold,
-            'total_quantity_sold_all_time': total_quantity_sold_all_time,
-            'growth_percent': round(growth_percent, 2),
-            'customers_count': customers_count,
-            'products_count': products_count
-        }), 200
-
+        # Barcha davrlar bitta so'rovda — kunlik rollup bir marta o'qiladi (app/analytics.py)
+        return jsonify(_stats_payload(DashboardData(request.args))), 200
     except OperationalError as e:
         db.session.rollback()
         print(f"[Dashboard /stats] OperationalError: {e}", flush=True)
@@ -117,296 +234,187 @@ def get_stats():
         print(f"[Dashboard /stats] Xatolik: {type(e).__name__}: {e}", flush=True)
         return jsonify({**_default_stats(), 'error': str(e)}), 200
 
-def _month_start_end(year, month):
-    """Berilgan yil-oy uchun oyning birinchi va oxirgi sanasi"""
-    last_day = monthrange(year, month)[1]
-    start = date(year, month, 1)
-    end = date(year, month, last_day)
-    return start, end
+
+@dashboard_bp.route('/bundle', methods=['GET'])
+@jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
+def get_bundle():
+    """
+    Bir nechta dashboard vidjetini bitta so'rovda qaytaradi — birinchi chizish uchun bitta round-trip.
+    Query: widgets=stats,growth,profit,... (standart: asosiy vidjetlar);
+           period/year, days, weeks — alohida endpointlardagi kabi.
+    Javob: {vidjet_nomi: shu endpoint javobi bilan bir xil JSON}
+    """
+    get_jwt_identity()
+    raw = request.args.get('widgets', '').strip()
+    names = [w.strip() for w in raw.split(',') if w.strip()] if raw else list(DEFAULT_BUNDLE)
+    unknown = [w for w in names if w not in WIDGETS]
+    if unknown:
+        return jsonify({
+            'error': f'Noma\'lum vidjet: {", ".join(unknown)}',
+            'available': sorted(WIDGETS)
+        }), 400
+
+    data = DashboardData(request.args)
+    result = {}
+    for name in dict.fromkeys(names):
+        build, default = WIDGETS[name]
+        try:
+            result[name] = build(data)
+        except OperationalError:
+            db.session.rollback()
+            result[name] = default()
+    return jsonify(result), 200
 
 
 @dashboard_bp.route('/growth-dynamics', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_growth_dynamics():
     """
     O'sish dinamikasini qaytaradi.
     Query: year=2026 — shu yilning 12 oyi (Yanvar–Dekabr);
            period=all — birinchi sotuvdan hozirgacha har oy.
     """
-    try:
-        today = datetime.now().date()
-        period = request.args.get('period', '').strip().lower()
-        year_param = request.args.get('year', '').strip()
-
-        # Barcha davr: birinchi sotuvdan hozirgacha
-        if period == 'all':
-            first = db.session.query(func.min(Sale.sale_date)).scalar()
-            if not first:
-                return jsonify([]), 200
-            if isinstance(first, datetime):
-                first = first.date()
-            start_year, start_month = first.year, first.month
-            end_year, end_month = today.year, today.month
-            data = []
-            y, m = start_year, start_month
-            while (y, m) <= (end_year, end_month):
-                month_start, month_end = _month_start_end(y, m)
-                sales = db.session.query(func.sum(Sale.amount)).filter(
-                    Sale.sale_date >= month_start,
-                    Sale.sale_date <= month_end
-                ).scalar() or 0
-                data.append({'month': f'{y}-{m:02d}', 'sales': _to_float(sales)})
-                m += 1
-                if m > 12:
-                    m = 1
-                    y += 1
-            return jsonify(data), 200
-
-        # Aniq yil: 12 oy
-        if year_param.isdigit():
-            y = int(year_param)
-        else:
-            y = today.year
-        data = []
-        for month in range(1, 13):
-            month_start, month_end = _month_start_end(y, month)
-            sales = db.session.query(func.sum(Sale.amount)).filter(
-                Sale.sale_date >= month_start,
-                Sale.sale_date <= month_end
-            ).scalar() or 0
-            data.append({'month': f'{y}-{month:02d}', 'sales': _to_float(sales)})
-        return jsonify(data), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    return _widget_response('growth')
 
 
 @dashboard_bp.route('/profit-dynamics', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_profit_dynamics():
     """Oylik foyda dinamikasi. Query: year=2026 yoki period=all"""
-    try:
-        get_jwt_identity()
-        today = datetime.now().date()
-        period = request.args.get('period', '').strip().lower()
-        year_param = request.args.get('year', '').strip()
-        profit_expr = func.coalesce(Sale.profit, Sale.amount - (Product.purchase_price * Sale.quantity))
-
-        if period == 'all':
-            first = db.session.query(func.min(Sale.sale_date)).scalar()
-            if not first:
-                return jsonify([]), 200
-            if isinstance(first, datetime):
-                first = first.date()
-            y, m = first.year, first.month
-            data = []
-            while (y, m) <= (today.year, today.month):
-                month_start, month_end = _month_start_end(y, m)
-                profit = db.session.query(func.sum(profit_expr)).join(
-                    Product, Sale.product_id == Product.id
-                ).filter(Sale.sale_date >= month_start, Sale.sale_date <= month_end).scalar() or 0
-                data.append({'month': f'{y}-{m:02d}', 'profit': _to_float(profit)})
-                m += 1
-                if m > 12:
-                    m, y = 1, y + 1
-            return jsonify(data), 200
-
-        y = int(year_param) if year_param.isdigit() else today.year
-        data = []
-        for month in range(1, 13):
-            month_start, month_end = _month_start_end(y, month)
-            profit = db.session.query(func.sum(profit_expr)).join(
-                Product, Sale.product_id == Product.id
-            ).filter(Sale.sale_date >= month_start, Sale.sale_date <= month_end).scalar() or 0
-            data.append({'month': f'{y}-{month:02d}', 'profit': _to_float(profit)})
-        return jsonify(data), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    get_jwt_identity()
+    return _widget_response('profit')
+
+
+@dashboard_bp.route('/monthly-dynamics', methods=['GET'])
+@jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
+def get_monthly_dynamics():
+    """Oylik savdo, foyda va savdolar soni birgalikda (bitta so'rov). Query: year=2026 yoki period=all"""
+    get_jwt_identity()
+    return _widget_response('monthly')
 
 
 @dashboard_bp.route('/daily-sales', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_daily_sales():
-    """Oxirgi N kunlik savdo. Query: days=30"""
-    try:
-        get_jwt_identity()
-        days = min(90, max(7, request.args.get('days', type=int) or 30))
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=days)
-        rows = db.session.query(
-            Sale.sale_date,
-            func.sum(Sale.amount).label('amount'),
-            func.count(Sale.id).label('count')
-        ).filter(
-            Sale.sale_date >= start_date,
-            Sale.sale_date <= end_date
-        ).group_by(Sale.sale_date).order_by(Sale.sale_date).all()
-        result = [{'date': str(r.sale_date), 'sales': _to_float(r.amount), 'count': _to_int(r.count)} for r in rows]
-        return jsonify(result), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    """Oxirgi N kunlik savdo. Query: days=30 (7..366; uzunroq oraliq uchun /timeseries)"""
+    get_jwt_identity()
+    return _widget_response('daily')
 
 
 @dashboard_bp.route('/weekly-sales', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_weekly_sales():
     """Oxirgi N haftalik savdo. Query: weeks=12 (har hafta 7 kun)"""
+    get_jwt_identity()
+    return _widget_response('weekly')
+
+
+TIMESERIES_MAX_POINTS = 3660
+TIMESERIES_DEFAULT_SPAN = {'day': 30, 'week': 12 * 7, 'month': 365, 'quarter': 2 * 365, 'year': 5 * 365}
+
+
+@dashboard_bp.route('/timeseries', methods=['GET'])
+@jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
+def get_timeseries():
+    """
+    Ixtiyoriy granularlikdagi vaqt qatori — har qanday oraliq uchun bitta so'rov.
+    Query: granularity=day|week|month|quarter|year (standart: day),
+           metric=amount|quantity|profit|count (standart: amount),
+           start=YYYY-MM-DD, end=YYYY-MM-DD (standart: end=bugun),
+           product_id=, customer_id= (ixtiyoriy filtrlar)
+    Hafta — `end` da tugaydigan 7 kunlik oynalar; oy/chorak/yil — kalendar bo'yicha.
+    Javob: [{'start': 'YYYY-MM-DD', 'end': 'YYYY-MM-DD', 'value': ...}, ...]
+    """
+    get_jwt_identity()
+    granularity = request.args.get('granularity', 'day')
+    metric = request.args.get('metric', 'amount')
+    if granularity not in analytics.TIMESERIES_GRANULARITIES:
+        return jsonify({'error': f'granularity quyidagilardan biri bo\'lishi kerak: {", ".join(analytics.TIMESERIES_GRANULARITIES)}'}), 400
+    if metric not in analytics.TIMESERIES_METRICS:
+        return jsonify({'error': f'metric quyidagilardan biri bo\'lishi kerak: {", ".join(analytics.TIMESERIES_METRICS)}'}), 400
+    try:
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else date.today()
+        start_date = (
+            datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start')
+            else end_date - timedelta(days=TIMESERIES_DEFAULT_SPAN[granularity] - 1)
+        )
+    except ValueError:
+        return jsonify({'error': 'Sana formati noto\'g\'ri (YYYY-MM-DD)'}), 400
+    if start_date > end_date:
+        return jsonify({'error': 'start end dan katta bo\'lmasligi kerak'}), 400
+    if len(list(islice(analytics.iter_buckets(granularity, start_date, end_date), TIMESERIES_MAX_POINTS + 1))) > TIMESERIES_MAX_POINTS:
+        return jsonify({'error': f'Juda ko\'p nuqta (maksimum {TIMESERIES_MAX_POINTS}) — kattaroq granularity tanlang'}), 400
+
     try:
-        get_jwt_identity()
-        weeks = min(26, max(4, request.args.get('weeks', type=int) or 12))
-        end_date = datetime.now().date()
-        result = []
-        for i in range(weeks - 1, -1, -1):
-            week_end = end_date - timedelta(days=i * 7)
-            week_start = week_end - timedelta(days=6)
-            amount = db.session.query(func.sum(Sale.amount)).filter(
-                Sale.sale_date >= week_start,
-                Sale.sale_date <= week_end
-            ).scalar() or 0
-            count = db.session.query(func.count(Sale.id)).filter(
-                Sale.sale_date >= week_start,
-                Sale.sale_date <= week_end
-            ).scalar() or 0
-            result.append({
-                'week': week_start.isoformat(),
-                'label': f'{week_start.day}.{week_start.month}-{week_end.day}.{week_end.month}',
-                'sales': _to_float(amount),
-                'count': _to_int(count)
-            })
-        return jsonify(result), 200
+        points = analytics.timeseries(
+            granularity, start_date, end_date,
+            product_id=request.args.get('product_id', type=int),
+            customer_id=request.args.get('customer_id', type=int)
+        )
     except OperationalError:
         db.session.rollback()
         return jsonify([]), 200
+    return jsonify([
+        {'start': p['start'].isoformat(), 'end': p['end'].isoformat(), 'value': p[metric]}
+        for p in points
+    ]), 200
 
 
 @dashboard_bp.route('/sales-count-dynamics', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_sales_count_dynamics():
     """Oylik savdolar soni. Query: year= yoki period=all"""
-    try:
-        get_jwt_identity()
-        today = datetime.now().date()
-        period = request.args.get('period', '').strip().lower()
-        year_param = request.args.get('year', '').strip()
-
-        if period == 'all':
-            first = db.session.query(func.min(Sale.sale_date)).scalar()
-            if not first:
-                return jsonify([]), 200
-            if isinstance(first, datetime):
-                first = first.date()
-            y, m = first.year, first.month
-            data = []
-            while (y, m) <= (today.year, today.month):
-                month_start, month_end = _month_start_end(y, m)
-                cnt = db.session.query(func.count(Sale.id)).filter(
-                    Sale.sale_date >= month_start, Sale.sale_date <= month_end
-                ).scalar() or 0
-                data.append({'month': f'{y}-{m:02d}', 'count': _to_int(cnt)})
-                m += 1
-                if m > 12:
-                    m, y = 1, y + 1
-            return jsonify(data), 200
-
-        y = int(year_param) if year_param.isdigit() else today.year
-        data = []
-        for month in range(1, 13):
-            month_start, month_end = _month_start_end(y, month)
-            cnt = db.session.query(func.count(Sale.id)).filter(
-                Sale.sale_date >= month_start, Sale.sale_date <= month_end
-            ).scalar() or 0
-            data.append({'month': f'{y}-{month:02d}', 'count': _to_int(cnt)})
-        return jsonify(data), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    get_jwt_identity()
+    return _widget_response('sales_count')
 
 
 @dashboard_bp.route('/top-products', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_top_products():
     """Eng ko'p sotilgan mahsulotlar — barcha vaqt bo'yicha"""
-    try:
-        top_products = db.session.query(
-            Product.id,
-            Product.name,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.product_id == Product.id).group_by(
-            Product.id, Product.name
-        ).order_by(func.sum(Sale.quantity).desc()).limit(10).all()
-        result = [{'id': p.id, 'name': p.name, 'total_quantity': _to_int(p.total_quantity), 'total_amount': _to_float(p.total_amount)} for p in top_products]
-        return jsonify(result), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    return _widget_response('top_products')
+
 
 @dashboard_bp.route('/top-customers', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_top_customers():
     """Eng ko'p xarid qilgan mijozlar — barcha vaqt bo'yicha"""
-    try:
-        top_customers = db.session.query(
-            Customer.id,
-            Customer.name,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.customer_id == Customer.id).group_by(
-            Customer.id, Customer.name
-        ).order_by(func.sum(Sale.amount).desc()).limit(10).all()
-        result = [{'id': c.id, 'name': c.name, 'total_quantity': _to_int(c.total_quantity), 'total_amount': _to_float(c.total_amount)} for c in top_customers]
-        return jsonify(result), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify([]), 200
+    return _widget_response('top_customers')
+
 
 @dashboard_bp.route('/detailed-stats', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_detailed_stats():
     """Batafsil statistikalar — barcha vaqt bo'yicha (jami miqdor va summa)"""
-    try:
-        top_product = db.session.query(
-            Product.name,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.product_id == Product.id).group_by(
-            Product.id, Product.name
-        ).order_by(func.sum(Sale.quantity).desc()).first()
-
-        top_customer = db.session.query(
-            Customer.name,
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.customer_id == Customer.id).group_by(
-            Customer.id, Customer.name
-        ).order_by(func.sum(Sale.amount).desc()).first()
-
-        total_sales_count = db.session.query(func.count(Sale.id)).scalar() or 0
-
-        return jsonify({
-            'top_product': {
-                'name': top_product.name if top_product else 'Ma\'lumot yo\'q',
-                'quantity': _to_int(top_product.total_quantity) if top_product else 0,
-                'amount': _to_float(top_product.total_amount) if top_product else 0
-            },
-            'top_customer': {
-                'name': top_customer.name if top_customer else 'Ma\'lumot yo\'q',
-                'amount': _to_float(top_customer.total_amount) if top_customer else 0
-            },
-            'total_sales_count': _to_int(total_sales_count)
-        }), 200
-    except OperationalError:
-        db.session.rollback()
-        return jsonify({
-            'top_product': {'name': 'Ma\'lumot yo\'q', 'quantity': 0, 'amount': 0},
-            'top_customer': {'name': 'Ma\'lumot yo\'q', 'amount': 0},
-            'total_sales_count': 0
-        }), 200
+    return _widget_response('detailed')
 
 
 @dashboard_bp.route('/monthly-stats', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
+@cached
 def get_monthly_stats():
     """
     Tanlangan oy uchun to'liq statistika.
@@ -419,71 +427,29 @@ def get_monthly_stats():
         if not year or not month or month < 1 or month > 12:
             return jsonify({'error': 'year va month parametrlari kerak (1-12)'}), 400
         
-        month_start, month_end = _month_start_end(year, month)
-        
-        # Oy davomidagi jami savdo summasi
-        total_sales = _to_float(db.session.query(func.sum(Sale.amount)).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).scalar())
+        # Yopilgan oy — tayyor snapshotdan (faqat shu oy ichidagi savdo o'zgarsa qayta quriladi)
+        snapshot = snapshots.get(year, month, datetime.now().date())
+        if snapshot is not None:
+            return jsonify(snapshot), 200
         
-        # Sotilgan mahsulotlar soni
-        total_quantity = _to_int(db.session.query(func.sum(Sale.quantity)).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).scalar())
-        
-        # Savdolar soni
-        sales_count = _to_int(db.session.query(func.count(Sale.id)).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).scalar())
-        
-        # Sof foyda
-        profit_expr = func.coalesce(Sale.profit, Sale.amount - (Product.purchase_price * Sale.quantity))
-        total_profit = _to_float(db.session.query(func.sum(profit_expr)).join(
-            Product, Sale.product_id == Product.id
-        ).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).scalar())
-        
-        # Top mahsulotlar (shu oyda)
-        top_products = db.session.query(
-            Product.id,
-            Product.name,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.product_id == Product.id).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).group_by(Product.id, Product.name).order_by(
-            func.sum(Sale.quantity).desc()
-        ).limit(10).all()
-        
-        # Top mijozlar (shu oyda)
-        top_customers = db.session.query(
-            Customer.id,
-            Customer.name,
-            Customer.additional_name,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.amount).label('total_amount')
-        ).join(Sale, Sale.customer_id == Customer.id).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).group_by(Customer.id, Customer.name, Customer.additional_name).order_by(
-            func.sum(Sale.amount).desc()
-        ).limit(10).all()
+        month_start, month_end = _month_start_end(year, month)
         
-        # Kunlik savdolar (grafik uchun)
-        daily_sales = db.session.query(
-            Sale.sale_date,
-            func.sum(Sale.amount).label('amount'),
-            func.sum(Sale.quantity).label('quantity')
-        ).filter(
-            Sale.sale_date >= month_start,
-            Sale.sale_date <= month_end
-        ).group_by(Sale.sale_date).order_by(Sale.sale_date).all()
+        # Jami ko'rsatkichlar, top mahsulot/mijozlar va kunlik qator — bir-biriga bog'liq emas,
+        # PARALLEL_QUERIES=1 bo'lsa alohida ulanishlarda parallel bajariladi
+        results = parallel.run({
+            'totals': lambda: analytics.period_totals(month_start, month_end),
+            'top_products': lambda: analytics.top_products(10, month_start, month_end),
+            'top_customers': lambda: analytics.top_customers(10, month_start, month_end),
+            'daily_sales': lambda: analytics.daily_totals(month_start, month_end),
+        })
+        totals = results['totals']
+        total_sales = _to_float(totals.amount)
+        total_quantity = _to_int(totals.quantity)
+        sales_count = _to_int(totals.count)
+        total_profit = _to_float(totals.profit)
+        top_products = results['top_products']
+        top_customers = results['top_customers']
+        daily_sales = results['daily_sales']
         
         return jsonify({
             'year': year,
@@ -509,3 +475,10 @@ def get_monthly_stats():
     except OperationalError:
         db.session.rollback()
         return jsonify({'error': 'Ma\'lumotlar bazasi xatosi'}), 500
+
+
+@dashboard_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """Server keshi hisoblagichlari (hits/misses) — monitoring uchun"""
+    return jsonify(cache.stats()), 200
@@ -0,0 +1,88 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app import fields, geo_index
+from app.models import Customer, Shop
+
+geo_bp = Blueprint('geo', __name__)
+
+NEAREST_K_MAX = 100
+WITHIN_RADIUS_MAX_KM = 500
+WITHIN_LIMIT_DEFAULT = 1000
+WITHIN_LIMIT_MAX = 10000
+
+_ORIGINS = {'customer_id': ('customers', Customer), 'shop_id': ('shops', Shop)}
+
+
+def _origin():
+    """
+    Qidiruv markazi: lat/lon yoki customer_id/shop_id (shu obyekt koordinatasi).
+    Qaytaradi: (lon, lat, (jadval, id) yoki None) yoki xato javobi (str)
+    """
+    for arg, (table, model) in _ORIGINS.items():
+        obj_id = request.args.get(arg, type=int)
+        if obj_id is not None:
+            obj = model.query.get_or_404(obj_id)
+            if obj.latitude is None or obj.longitude is None:
+                return f'{arg}={obj_id} koordinatasi yo\'q'
+            return float(obj.longitude), float(obj.latitude), (table, obj_id)
+    lat, lon = request.args.get('lat', type=float), request.args.get('lon', type=float)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return 'lat/lon (yoki customer_id/shop_id) kiritilishi shart'
+    return lon, lat, None
+
+
+def _results(found):
+    items = fields.sparse([item for item, _ in found])
+    return [{**item, 'distance_km': round(km, 3)} for item, (_, km) in zip(items, found)]
+
+
+@geo_bp.route('/nearest', methods=['GET'])
+@jwt_required()
+def get_nearest():
+    """
+    Eng yaqin do'konlar/mijozlar (haversine, k-d daraxt — app/geo_index.py).
+    Query: lat, lon yoki customer_id / shop_id; target=shops|customers (standart shops), k=1 (1..100)
+    Javob: {'origin': {latitude, longitude}, 'results': [{...map-data, distance_km}]}
+    """
+    target = request.args.get('target', 'shops')
+    if target not in geo_index.TARGETS:
+        return jsonify({'error': f'target faqat: {", ".join(geo_index.TARGETS)}'}), 400
+    origin = _origin()
+    if isinstance(origin, str):
+        return jsonify({'error': origin}), 400
+    lon, lat, source = origin
+    k = min(NEAREST_K_MAX, max(1, request.args.get('k', type=int) or 1))
+    # Markaz shu jadvaldan bo'lsa, uning o'zi natijaga kirmaydi
+    exclude = source[1] if source and source[0] == target else None
+    found = geo_index.tree(target).nearest(lon, lat, k, exclude)
+    return jsonify({'origin': {'latitude': lat, 'longitude': lon}, 'results': _results(found)}), 200
+
+
+@geo_bp.route('/within', methods=['GET'])
+@jwt_required()
+def get_within():
+    """
+    Radius ichidagi mijozlar/do'konlar, masofa bo'yicha tartiblangan.
+    Query: lat, lon yoki customer_id / shop_id; target=customers|shops (standart customers),
+           radius_km (0..500), limit=1000 (1..10000)
+    Javob: {'origin', 'count' (jami topilgan), 'results': [{...map-data, distance_km}]}
+    """
+    target = request.args.get('target', 'customers')
+    if target not in geo_index.TARGETS:
+        return jsonify({'error': f'target faqat: {", ".join(geo_index.TARGETS)}'}), 400
+    origin = _origin()
+    if isinstance(origin, str):
+        return jsonify({'error': origin}), 400
+    lon, lat, source = origin
+    radius = request.args.get('radius_km', type=float)
+    if radius is None or not 0 < radius <= WITHIN_RADIUS_MAX_KM:
+        return jsonify({'error': f'radius_km 0..{WITHIN_RADIUS_MAX_KM} oralig\'ida bo\'lishi kerak'}), 400
+    limit = min(WITHIN_LIMIT_MAX, max(1, request.args.get('limit', type=int) or WITHIN_LIMIT_DEFAULT))
+    found = geo_index.tree(target).within(lon, lat, radius)
+    if source and source[0] == target:
+        found = [(item, km) for item, km in found if item['id'] != source[1]]
+    return jsonify({
+        'origin': {'latitude': lat, 'longitude': lon},
+        'count': len(found),
+        'results': _results(found[:limit]),
+    }), 200
@@ -1,19 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from app import db, snapshots, fields
 from app.models import Product, Sale
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from app.watermark import conditional
 
 products_bp = Blueprint('products', __name__)
 
 @products_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('products')
 def get_products():
     """Barcha mahsulotlarni qaytaradi"""
     user_id = int(get_jwt_identity())
     products = Product.query.order_by(Product.created_at.desc()).all()
-    return jsonify([product.to_dict() for product in products]), 200
+    return jsonify(fields.sparse([product.to_dict() for product in products])), 200
 
 @products_bp.route('', methods=['POST'])
 @jwt_required()
@@ -80,6 +82,7 @@ def delete_product(product_id):
     """Mahsulotni o'chiradi"""
     user_id = int(get_jwt_identity())
     product = Product.query.get_or_404(product_id)
+    snapshots.invalidate_for(product_id=product.id)
     db.session.delete(product)
     db.session.commit()
     
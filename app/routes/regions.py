@@ -1,18 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required
-from app import db
+from app import db, fields, spatial, analytics, region_assign, region_geometry, watermark
 from app.models import Region, Shop, Product, Sale
 from datetime import datetime
 from sqlalchemy import func
+from app.watermark import conditional
 
 regions_bp = Blueprint('regions', __name__)
 
 @regions_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('regions', 'shops')
 def get_regions():
     """Barcha hududlarni qaytaradi"""
     regions = Region.query.order_by(Region.name).all()
-    return jsonify([region.to_dict() for region in regions]), 200
+    return jsonify(fields.sparse([region.to_dict() for region in regions])), 200
 
 @regions_bp.route('', methods=['POST'])
 @jwt_required()
@@ -37,8 +39,12 @@ def create_region():
     
     db.session.add(region)
     db.session.commit()
+    result = region.to_dict()
+    if region.polygon_coordinates:
+        # Faqat yangi poligon bbox'idagi mijoz/do'konlar (app/region_assign.py)
+        region_assign.reassign_around(region_assign.bbox(region.id, region.polygon_coordinates))
     
-    return jsonify(region.to_dict()), 201
+    return jsonify(result), 201
 
 @regions_bp.route('/<int:region_id>', methods=['GET'])
 @jwt_required()
@@ -75,16 +81,25 @@ def update_region(region_id):
         region.latitude = data['latitude']
     if data.get('longitude') is not None:
         region.longitude = data['longitude']
+    polygon_changed = False
+    old_bbox = region_assign.bbox(region.id, region.polygon_coordinates) if region.polygon_coordinates else None
     if data.get('polygon_coordinates') is not None:
         import json
-        region.polygon_coordinates = json.dumps(data['polygon_coordinates']) if isinstance(data['polygon_coordinates'], (list, dict)) else data['polygon_coordinates']
+        polygon = json.dumps(data['polygon_coordinates']) if isinstance(data['polygon_coordinates'], (list, dict)) else data['polygon_coordinates']
+        polygon_changed = polygon != region.polygon_coordinates
+        region.polygon_coordinates = polygon
     if data.get('status'):
         region.status = data['status']
     
     region.updated_at = datetime.utcnow()
     db.session.commit()
+    result = region.to_dict()
+    if polygon_changed:
+        # Poligon o'zgardi — eski va yangi poligon ichidagi mijoz/do'konlar qayta biriktiriladi (app/region_assign.py)
+        new_bbox = region_assign.bbox(region.id, region.polygon_coordinates) if region.polygon_coordinates else None
+        region_assign.reassign_around(old_bbox, new_bbox)
     
-    return jsonify(region.to_dict()), 200
+    return jsonify(result), 200
 
 @regions_bp.route('/<int:region_id>', methods=['DELETE'])
 @jwt_required()
@@ -92,6 +107,8 @@ def delete_region(region_id):
     """Hududni o'chiradi"""
     region = Region.query.get_or_404(region_id)
     db.session.delete(region)
+    # geo_region_id bazada ON DELETE SET NULL bilan tozalanadi — ORM buni ko'rmaydi
+    watermark.touch('customers', 'shops')
     db.session.commit()
     
     return jsonify({'message': 'Hudud muvaffaqiyatli o\'chirildi'}), 200
@@ -99,33 +116,81 @@ def delete_region(region_id):
 @regions_bp.route('/map-data', methods=['GET'])
 @jwt_required()
 def get_map_data():
-    """Xarita uchun barcha hududlar ma'lumotlari (markerlar uchun)"""
-    regions = Region.query.all()
-    result = []
-    
-    for region in regions:
-        shops_count = Shop.query.filter_by(region_id=region.id).count()
-        result.append({
-            'id': region.id,
-            'name': region.name,
-            'latitude': float(region.latitude) if region.latitude else None,
-            'longitude': float(region.longitude) if region.longitude else None,
-            'status': region.status,
-            'shops_count': shops_count
-        })
-    
-    return jsonify(result), 200
+    """
+    Xarita uchun barcha hududlar ma'lumotlari (markerlar uchun).
+    Query: bbox=minLon,minLat,maxLon,maxLat — faqat markazi oynada bo'lganlar (app/spatial.py indeksi)
+    """
+    try:
+        bbox = spatial.parse_bbox(request.args.get('bbox'))
+    except ValueError:
+        return jsonify({'error': 'bbox formati: minLon,minLat,maxLon,maxLat'}), 400
+    return jsonify(fields.sparse(spatial.points('regions', bbox))), 200
+
+@regions_bp.route('/assign', methods=['POST'])
+@jwt_required()
+def assign_regions():
+    """Barcha mijoz va do'konlarni koordinatasi tushgan hudud poligoniga biriktiradi (geo_region_id)"""
+    return jsonify(region_assign.assign()), 200
+
+@regions_bp.route('/sales', methods=['GET'])
+@jwt_required()
+@conditional('sales', 'customers', 'regions')
+def get_region_sales():
+    """
+    Hudud (poligon) bo'yicha savdo — mijozlarning geo_region_id si orqali.
+    Query: start, end (YYYY-MM-DD, ixtiyoriy)
+    """
+    try:
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Sana formati: YYYY-MM-DD'}), 400
+    names = dict(db.session.query(Region.id, Region.name).all())
+    return jsonify([{
+        'region_id': row.region_id,
+        'region_name': names.get(row.region_id),
+        'total_amount': float(row.total_amount or 0),
+        'total_quantity': int(row.total_quantity or 0),
+        'sales_count': int(row.sales_count or 0),
+        'customers_count': row.customers_count,
+    } for row in analytics.region_sales(start, end)]), 200
+
+@regions_bp.route('/geojson', methods=['GET'])
+@jwt_required()
+@conditional('regions', 'shops')
+def get_regions_geojson():
+    """
+    Hudud poligonlari FeatureCollection (app/region_geometry.py keshidan, tayyor gzip tana).
+    Query: zoom=0..22 — shu zoom uchun soddalashtirilgan geometriya (berilmasa — to'liq aniqlik),
+           status=occupied|in_progress|planned (ixtiyoriy)
+    """
+    zoom = request.args.get('zoom', type=int)
+    if zoom is not None and not 0 <= zoom <= 22:
+        return jsonify({'error': 'zoom 0..22 oralig\'ida bo\'lishi kerak'}), 400
+    status = request.args.get('status') or None
+    if status is not None and status not in region_geometry.STATUSES:
+        return jsonify({'error': 'status ' + '|'.join(region_geometry.STATUSES) + ' dan biri bo\'lishi kerak'}), 400
+    body, compressed = region_geometry.feature_collection(zoom, status)
+    if 'gzip' in request.accept_encodings:
+        response = current_app.response_class(compressed, mimetype='application/geo+json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(body, mimetype='application/geo+json')
+    response.vary.add('Accept-Encoding')
+    return response
 
 @regions_bp.route('/occupied-regions', methods=['GET'])
 @jwt_required()
 def get_occupied_regions():
     """Egallangan hududlar GeoJSON ma'lumotlari"""
     regions = Region.query.filter_by(status='occupied').all()
+    shops_counts = dict(db.session.query(Shop.region_id, func.count(Shop.id)).filter(
+        Shop.region_id.in_([region.id for region in regions])
+    ).group_by(Shop.region_id).all())
     result = []
     
     for region in regions:
-        import json
-        shops_count = Shop.query.filter_by(region_id=region.id).count()
+        shops_count = shops_counts.get(region.id, 0)
         
         region_data = {
             'id': region.id,
@@ -136,14 +201,8 @@ def get_occupied_regions():
             'longitude': float(region.longitude) if region.longitude else None
         }
         
-        # Agar polygon koordinatalari bo'lsa
-        if region.polygon_coordinates:
-            try:
-                region_data['polygon'] = json.loads(region.polygon_coordinates)
-            except:
-                region_data['polygon'] = None
-        else:
-            region_data['polygon'] = None
+        # Agar polygon koordinatalari bo'lsa (keshdan — har so'rovda json.loads yo'q)
+        region_data['polygon'] = region_geometry.parsed(region.id, region.polygon_coordinates)
         
         result.append(region_data)
     
@@ -1,29 +1,99 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models import Sale, OnlineSale, Customer, Product
+from app.models import Sale, OnlineSale, Product
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract
+import base64
+import binascii
+from sqlalchemy import or_, and_
+from app import rollup, analytics, bulk_import, import_jobs, exports, write_behind, sales_sync, fields
+from app.cache import cached
+from app.watermark import conditional
 
 sales_bp = Blueprint('sales', __name__)
 
+SALES_PAGE_DEFAULT = 50
+SALES_PAGE_MAX = 500
+
+
+def _encode_cursor(sale):
+    """Sahifa oxirgi qatoridan cursor: base64('YYYY-MM-DD:id')"""
+    raw = f'{sale.sale_date.isoformat()}:{sale.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _filter_sales(query, args):
+    """Ro'yxat va eksport uchun umumiy filtrlar; sana noto'g'ri bo'lsa ValueError"""
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    if start_date:
+        query = query.filter(Sale.sale_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+    if end_date:
+        query = query.filter(Sale.sale_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    customer_id = args.get('customer_id', type=int)
+    product_id = args.get('product_id', type=int)
+    min_amount = args.get('min_amount', type=float)
+    max_amount = args.get('max_amount', type=float)
+    if customer_id is not None:
+        query = query.filter(Sale.customer_id == customer_id)
+    if product_id is not None:
+        query = query.filter(Sale.product_id == product_id)
+    if min_amount is not None:
+        query = query.filter(Sale.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Sale.amount <= max_amount)
+    return query
+
+
+def _decode_cursor(value):
+    """cursor -> (sale_date, id); noto'g'ri bo'lsa ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        day, sale_id = raw.split(':')
+        return datetime.strptime(day, '%Y-%m-%d').date(), int(sale_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(str(e))
+
+
 @sales_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products', 'customers')
 def get_sales():
-    """Barcha savdolarni qaytaradi"""
+    """
+    Savdolar ro'yxati — keyset sahifalash (sale_date, id kamayish tartibida).
+    Query: limit=50 (1..500), cursor= (oldingi javobdagi next_cursor),
+           start_date=, end_date= (YYYY-MM-DD), customer_id=, product_id=, min_amount=, max_amount=,
+           fields=id,amount,... (faqat shu maydonlar)
+    Javob: {'items': [...], 'next_cursor': '...' yoki null}
+    Keyingi sahifa OFFSET emas, oxirgi (sale_date, id) dan keyingi qatorlar — chuqur sahifalar ham birinchisidek arzon.
+    """
     user_id = int(get_jwt_identity())
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    limit = min(SALES_PAGE_MAX, max(1, request.args.get('limit', type=int) or SALES_PAGE_DEFAULT))
     
-    query = Sale.query
+    try:
+        query = _filter_sales(Sale.list_query(), request.args)
+        cursor = _decode_cursor(request.args.get('cursor')) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Sana yoki cursor formati noto\'g\'ri'}), 400
     
-    if start_date:
-        query = query.filter(Sale.sale_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
-    if end_date:
-        query = query.filter(Sale.sale_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+    if cursor is not None:
+        cursor_date, cursor_id = cursor
+        query = query.filter(or_(
+            Sale.sale_date < cursor_date,
+            and_(Sale.sale_date == cursor_date, Sale.id < cursor_id)
+        ))
     
-    sales = query.order_by(Sale.sale_date.desc()).all()
-    return jsonify([sale.to_dict() for sale in sales]), 200
+    # limit + 1 ta qator — keyingi sahifa borligini bilish uchun
+    # Bitta JOIN'li proyeksiya — sahifa hajmidan qat'i nazar bitta SELECT (N+1 lazy-load yo'q)
+    sales = query.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(sales) > limit:
+        sales = sales[:limit]
+        next_cursor = _encode_cursor(sales[-1])
+    return jsonify({
+        'items': fields.sparse([Sale.row_to_dict(row) for row in sales]),
+        'next_cursor': next_cursor
+    }), 200
 
 @sales_bp.route('', methods=['POST'])
 @jwt_required()
@@ -35,6 +105,22 @@ def create_sale():
     if not data or not data.get('customer_id') or not data.get('product_id') or not data.get('amount'):
         return jsonify({'error': 'customer_id, product_id va amount kiritilishi shart'}), 400
     
+    if write_behind.enabled(current_app):
+        # Write-behind: tekshiruv shu yerda, yozish fon thread'ida paketlab (app/write_behind.py)
+        customers, products = bulk_import.prefetch([data])
+        try:
+            values = bulk_import.row_values(data, customers, products, datetime.now().date())
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+        ticket = write_behind.enqueue(current_app._get_current_object(), values)
+        if ticket is not None:
+            return jsonify({
+                'ticket': ticket,
+                'status': 'queued',
+                'sale': {k: (v.isoformat() if k == 'sale_date' else v) for k, v in values.items() if k != 'created_at'}
+            }), 202
+        # Navbat to'la — odatdagidek sinxron yoziladi
+    
     quantity = data.get('quantity', 1)
     amount = float(data['amount'])
     product = Product.query.get(data['product_id'])
@@ -59,9 +145,27 @@ def create_sale():
         sale_date=datetime.strptime(data.get('sale_date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
     )
     db.session.add(sale)
+    rollup.record(sale)
     db.session.commit()
     return jsonify(sale.to_dict()), 201
 
+@sales_bp.route('/queue', methods=['GET'])
+@jwt_required()
+def get_write_queue_stats():
+    """Write-behind navbati hisoblagichlari: pending, committed, failed, batches"""
+    user_id = int(get_jwt_identity())
+    return jsonify({'enabled': write_behind.enabled(current_app), **write_behind.stats()}), 200
+
+@sales_bp.route('/queue/<ticket>', methods=['GET'])
+@jwt_required()
+def get_write_queue_ticket(ticket):
+    """Navbatga qo'yilgan savdo holati: queued | committed | failed"""
+    user_id = int(get_jwt_identity())
+    entry = write_behind.status(ticket)
+    if entry is None:
+        return jsonify({'error': 'Ticket topilmadi'}), 404
+    return jsonify(entry), 200
+
 @sales_bp.route('/<int:sale_id>', methods=['GET'])
 @jwt_required()
 def get_sale(sale_id):
@@ -77,6 +181,7 @@ def update_sale(sale_id):
     user_id = int(get_jwt_identity())
     sale = Sale.query.get_or_404(sale_id)
     data = request.get_json()
+    before = rollup.snapshot(sale)
     
     if data.get('customer_id'):
         sale.customer_id = data['customer_id']
@@ -109,6 +214,7 @@ def update_sale(sale_id):
             purchase = float(purchase) if purchase is not None else 0
     sale.unit_price = round(float(sale.amount) / (sale.quantity or 1), 2) if sale.quantity else None
     sale.profit = round(float(sale.amount) - (float(purchase or 0) * (sale.quantity or 0)), 2)
+    rollup.apply([(before, -1), (rollup.snapshot(sale), 1)])
     db.session.commit()
     return jsonify(sale.to_dict()), 200
 
@@ -118,6 +224,7 @@ def delete_sale(sale_id):
     """Savdoni o'chiradi"""
     user_id = int(get_jwt_identity())
     sale = Sale.query.get_or_404(sale_id)
+    rollup.record(sale, -1)
     db.session.delete(sale)
     db.session.commit()
     
@@ -125,6 +232,8 @@ def delete_sale(sale_id):
 
 @sales_bp.route('/statistics', methods=['GET'])
 @jwt_required()
+@conditional('sales', 'products')
+@cached
 def get_statistics():
     """Savdo statistikasi"""
     user_id = int(get_jwt_identity())
@@ -145,23 +254,14 @@ def get_statistics():
         start_date = today.replace(day=1)
         end_date = today
     
-    total_sales = db.session.query(func.sum(Sale.amount)).filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
-    ).scalar() or 0
-    
-    total_quantity = db.session.query(func.sum(Sale.quantity)).filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
-    ).scalar() or 0
+    totals = analytics.period_totals(start_date, end_date)
+    total_sales = totals.amount or 0
+    total_quantity = totals.quantity or 0
     
     if period == 'month':
         last_month_start = (start_date - timedelta(days=1)).replace(day=1)
         last_month_end = start_date - timedelta(days=1)
-        last_month_sales = db.session.query(func.sum(Sale.amount)).filter(
-            Sale.sale_date >= last_month_start,
-            Sale.sale_date <= last_month_end
-        ).scalar() or 0
+        last_month_sales = analytics.period_totals(last_month_start, last_month_end).amount or 0
         
         growth_percent = 0
         if last_month_sales > 0:
@@ -180,11 +280,12 @@ def get_statistics():
 
 @sales_bp.route('/online', methods=['GET'])
 @jwt_required()
+@conditional('online_sales', 'products')
 def get_online_sales():
     """Barcha online savdolarni qaytaradi"""
     user_id = int(get_jwt_identity())
-    online_sales = OnlineSale.query.order_by(OnlineSale.sale_date.desc()).all()
-    return jsonify([sale.to_dict() for sale in online_sales]), 200
+    online_sales = OnlineSale.list_query().order_by(OnlineSale.sale_date.desc()).all()
+    return jsonify(fields.sparse([OnlineSale.row_to_dict(row) for row in online_sales])), 200
 
 @sales_bp.route('/online', methods=['POST'])
 @jwt_required()
@@ -212,75 +313,139 @@ def create_online_sale():
 @sales_bp.route('/bulk-import', methods=['POST'])
 @jwt_required()
 def bulk_import_sales():
-    """Tarixiy ma'lumotlarni bulk import qilish"""
+    """Tarixiy ma'lumotlarni bulk import qilish (har BULK_IMPORT_CHUNK_SIZE qatorda commit)"""
     user_id = int(get_jwt_identity())
     data = request.get_json()
     
     if not data or not data.get('sales') or not isinstance(data['sales'], list):
         return jsonify({'error': 'sales array kiritilishi shart'}), 400
     
-    created_sales = []
-    errors = []
+    # Mijoz/mahsulotlar ikkita IN so'rovi bilan, yozish — bo'laklab ko'p qatorli INSERT (app/bulk_import.py)
+    chunk_size = current_app.config.get('BULK_IMPORT_CHUNK_SIZE', bulk_import.DEFAULT_CHUNK_SIZE)
+    values, errors = bulk_import.prepare(data['sales'])
+    created_count, chunk_errors = bulk_import.insert(values, chunk_size)
+    if values and not created_count:
+        return jsonify({'error': f'Xatolik yuz berdi: {chunk_errors[0]}'}), 500
+    errors += chunk_errors
+    return jsonify({
+        'message': f'{created_count} ta savdo muvaffaqiyatli qo\'shildi',
+        'created_count': created_count,
+        'errors': errors if errors else None
+    }), 201
+
+@sales_bp.route('/sync', methods=['POST'])
+@jwt_required()
+def sync_sales():
+    """
+    Offline mijozlardan savdolar paketi (har birida client_key). Qayta yuborilgan savdo
+    ikki marta yozilmaydi; har element uchun holat: created | duplicate | error (app/sales_sync.py)
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data.get('sales'), list):
+        return jsonify({'error': 'sales array kiritilishi shart'}), 400
+    if len(data['sales']) > sales_sync.MAX_BATCH:
+        return jsonify({'error': f'Bitta paketda ko\'pi bilan {sales_sync.MAX_BATCH} ta savdo'}), 400
+    
+    results = sales_sync.sync(data['sales'])
+    counts = {status: sum(1 for r in results if r['status'] == status) for status in ('created', 'duplicate', 'error')}
+    return jsonify({
+        'results': results,
+        'created_count': counts['created'],
+        'duplicate_count': counts['duplicate'],
+        'error_count': counts['error']
+    }), 200
+
+
+@sales_bp.route('/import-jobs', methods=['POST'])
+@jwt_required()
+def create_import_job():
+    """
+    CSV/XLSX fayldan savdo importi (multipart: file=...). Fon vazifasi sifatida bajariladi — darhol 202.
+    Sarlavha: customer_id, product_id, amount, quantity, sale_date, purchase_price_at_sale
+    Holat: GET /api/sales/import-jobs/<id>
+    """
+    user_id = int(get_jwt_identity())
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'file kiritilishi shart (multipart/form-data)'}), 400
+    fmt = import_jobs.detect_format(upload.filename)
+    if fmt is None:
+        return jsonify({'error': 'Faqat .csv yoki .xlsx fayllar qabul qilinadi'}), 400
+    if fmt == 'xlsx' and not import_jobs.xlsx_available():
+        return jsonify({'error': 'XLSX uchun openpyxl o\'rnatilmagan — faylni CSV qilib yuklang'}), 400
     
-    for idx, sale_data in enumerate(data['sales']):
-        try:
-            if not sale_data.get('customer_id') or not sale_data.get('product_id') or not sale_data.get('amount'):
-                errors.append(f'Qator {idx + 1}: customer_id, product_id va amount kiritilishi shart')
-                continue
-            
-            customer = Customer.query.get(sale_data['customer_id'])
-            product = Product.query.get(sale_data['product_id'])
-            
-            if not customer:
-                errors.append(f'Qator {idx + 1}: Mijoz topilmadi (ID: {sale_data["customer_id"]})')
-                continue
-            
-            if not product:
-                errors.append(f'Qator {idx + 1}: Mahsulot topilmadi (ID: {sale_data["product_id"]})')
-                continue
-            
-            sale_date = datetime.now().date()
-            if sale_data.get('sale_date'):
-                try:
-                    sale_date = datetime.strptime(sale_data['sale_date'], '%Y-%m-%d').date()
-                except ValueError:
-                    errors.append(f'Qator {idx + 1}: Noto\'g\'ri sana formati')
-                    continue
-            
-            quantity = sale_data.get('quantity', 1)
-            amount = float(sale_data['amount'])
-            purchase_price_at_sale = sale_data.get('purchase_price_at_sale')
-            if purchase_price_at_sale is not None:
-                purchase_price_at_sale = float(purchase_price_at_sale)
-            elif product.purchase_price is not None:
-                purchase_price_at_sale = float(product.purchase_price)
-            else:
-                purchase_price_at_sale = 0
-            unit_price = round(amount / quantity, 2) if quantity else 0
-            profit = round(amount - (purchase_price_at_sale * quantity), 2)
-            sale = Sale(
-                customer_id=sale_data['customer_id'],
-                product_id=sale_data['product_id'],
-                quantity=quantity,
-                amount=amount,
-                unit_price=unit_price,
-                purchase_price_at_sale=purchase_price_at_sale,
-                profit=profit,
-                sale_date=sale_date
-            )
-            
-            db.session.add(sale)
-            created_sales.append(sale)
-        except Exception as e:
-            errors.append(f'Qator {idx + 1}: {str(e)}')
+    job = import_jobs.submit(current_app._get_current_object(), upload, fmt)
+    return jsonify(job), 202
+
+
+@sales_bp.route('/import-jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import_job(job_id):
+    """Import vazifasi holati: status, rows_processed, rows_created, rows_failed, rows_per_second, errors"""
+    user_id = int(get_jwt_identity())
+    job = import_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Import vazifasi topilmadi'}), 404
+    return jsonify(job), 200
+
+
+def _export_response(query, to_dict, columns, name):
+    """?format=csv|arrow|parquet bo'yicha oqimli javob"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': f'format quyidagilardan biri bo\'lishi kerak: {", ".join(exports.FORMATS)}'}), 400
+    if fmt != 'csv' and not exports.columnar_available():
+        return jsonify({'error': f'{fmt} uchun pyarrow o\'rnatilmagan — format=csv dan foydalaning'}), 400
     
+    if fmt == 'csv':
+        chunks = exports.csv_stream(query, to_dict, columns)
+    else:
+        chunks = exports.columnar_stream(query, to_dict, columns, fmt)
+    filename = f'{name}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{exports.EXTENSIONS[fmt]}'
+    return Response(
+        stream_with_context(chunks),
+        content_type=exports.CONTENT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@sales_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_sales():
+    """
+    Savdolarni eksport qilish (oqim bilan, hajm cheklanmagan).
+    Query: format=csv|arrow|parquet (standart: csv); filtrlar GET /api/sales dagi kabi
+    """
+    user_id = int(get_jwt_identity())
+    try:
+        query = _filter_sales(Sale.list_query(), request.args)
+    except ValueError:
+        return jsonify({'error': 'Sana formati noto\'g\'ri (YYYY-MM-DD)'}), 400
+    query = query.order_by(Sale.sale_date.desc(), Sale.id.desc())
+    return _export_response(query, Sale.row_to_dict, exports.SALE_COLUMNS, 'sales')
+
+
+@sales_bp.route('/online/export', methods=['GET'])
+@jwt_required()
+def export_online_sales():
+    """
+    Online savdolarni eksport qilish (oqim bilan).
+    Query: format=csv|arrow|parquet; start_date=, end_date=, platform=, product_id=
+    """
+    user_id = int(get_jwt_identity())
+    query = OnlineSale.list_query()
     try:
-        db.session.commit()
-        return jsonify({
-            'message': f'{len(created_sales)} ta savdo muvaffaqiyatli qo\'shildi',
-            'created_count': len(created_sales),
-            'errors': errors if errors else None
-        }), 201
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Xatolik yuz berdi: {str(e)}'}), 500
\ No newline at end of file
+        if request.args.get('start_date'):
+            query = query.filter(OnlineSale.sale_date >= datetime.strptime(request.args['start_date'], '%Y-%m-%d').date())
+        if request.args.get('end_date'):
+            query = query.filter(OnlineSale.sale_date <= datetime.strptime(request.args['end_date'], '%Y-%m-%d').date())
+    except ValueError:
+        return jsonify({'error': 'Sana formati noto\'g\'ri (YYYY-MM-DD)'}), 400
+    if request.args.get('platform'):
+        query = query.filter(OnlineSale.platform == request.args['platform'])
+    if request.args.get('product_id', type=int) is not None:
+        query = query.filter(OnlineSale.product_id == request.args.get('product_id', type=int))
+    query = query.order_by(OnlineSale.sale_date.desc(), OnlineSale.id.desc())
+    return _export_response(query, OnlineSale.row_to_dict, exports.ONLINE_SALE_COLUMNS, 'online-sales')
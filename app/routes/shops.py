@@ -1,18 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from app import db
+from app import db, fields, spatial, clusters, region_assign
 from app.models import Shop, Region, Product, Sale
 from datetime import datetime
 from sqlalchemy import func
+from app.cache import cached
+from app.watermark import conditional
 
 shops_bp = Blueprint('shops', __name__)
 
 @shops_bp.route('', methods=['GET'])
 @jwt_required()
+@conditional('shops', 'regions')
 def get_shops():
     """Barcha do'konlarni qaytaradi"""
     shops = Shop.query.order_by(Shop.created_at.desc()).all()
-    return jsonify([shop.to_dict() for shop in shops]), 200
+    return jsonify(fields.sparse([shop.to_dict() for shop in shops])), 200
 
 @shops_bp.route('', methods=['POST'])
 @jwt_required()
@@ -32,6 +35,7 @@ def create_shop():
         size=data.get('size', 'medium'),
         status=data.get('status', 'active')
     )
+    shop.geo_region_id = region_assign.locate(shop.longitude, shop.latitude)
     
     db.session.add(shop)
     db.session.commit()
@@ -70,6 +74,8 @@ def update_shop(shop_id):
         shop.latitude = data['latitude']
     if data.get('longitude') is not None:
         shop.longitude = data['longitude']
+    if data.get('latitude') is not None or data.get('longitude') is not None:
+        shop.geo_region_id = region_assign.locate(shop.longitude, shop.latitude)
     if data.get('size'):
         shop.size = data['size']
     if data.get('status'):
@@ -96,6 +102,7 @@ def delete_shop(shop_id):
 
 @shops_bp.route('/analysis/top-shops', methods=['GET'])
 @jwt_required()
+@cached
 def get_top_shops():
     """Eng ko'p savdo qiladigan do'konlar"""
     today = datetime.now().date()
@@ -129,6 +136,7 @@ def get_top_shops():
 
 @shops_bp.route('/analysis/top-regions', methods=['GET'])
 @jwt_required()
+@cached
 def get_top_regions():
     """Eng kuchli hududlar"""
     today = datetime.now().date()
@@ -160,22 +168,21 @@ def get_top_regions():
 @shops_bp.route('/map-data', methods=['GET'])
 @jwt_required()
 def get_shops_map_data():
-    """Xarita uchun barcha do'konlar ma'lumotlari"""
-    shops = Shop.query.filter_by(status='active').all()
-    result = []
-    
-    for shop in shops:
-        if shop.latitude and shop.longitude:
-            result.append({
-                'id': shop.id,
-                'name': shop.name,
-                'latitude': float(shop.latitude),
-                'longitude': float(shop.longitude),
-                'region_name': shop.region.name if shop.region else None,
-                'phone': shop.phone,
-                'size': shop.size,
-                'products_count': len(shop.products)
-            })
-    
-    return jsonify(result), 200
+    """
+    Xarita uchun faol do'konlar ma'lumotlari.
+    Query: bbox=minLon,minLat,maxLon,maxLat — faqat ko'rinish oynasidagilar (app/spatial.py indeksi),
+           zoom=0..22 — zoom < clusters.MAX_ZOOM da klasterlar ({'cluster': true, count, products_count, ...})
+           va yakka nuqtalar (app/clusters.py)
+    """
+    try:
+        bbox = spatial.parse_bbox(request.args.get('bbox'))
+    except ValueError:
+        return jsonify({'error': 'bbox formati: minLon,minLat,maxLon,maxLat'}), 400
+    zoom = request.args.get('zoom', type=int)
+    if zoom is not None and not 0 <= zoom <= 22:
+        return jsonify({'error': 'zoom 0..22 oralig\'ida bo\'lishi kerak'}), 400
+    if zoom is not None and zoom < clusters.MAX_ZOOM:
+        groups, points = clusters.at_zoom('shops', zoom, bbox)
+        return jsonify(groups + fields.sparse(points)), 200
+    return jsonify(fields.sparse(spatial.points('shops', bbox))), 200
 
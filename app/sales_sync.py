@@ -0,0 +1,113 @@
+"""
+Offline mijozlar (mobil ilova, savdo agentlari) uchun savdolarni paketlab sinxronlash.
+
+Har savdo mijoz tomonida yaratilgan client_key (idempotency kaliti) bilan keladi.
+Aloqa uzilib, paket qayta yuborilsa ham savdo ikki marta yozilmaydi:
+1. Paketdagi barcha kalitlar sales.client_key unikal indeksi bo'yicha bitta IN so'rovi bilan tekshiriladi;
+2. Yangi savdolar app/bulk_import.py orqali bitta ko'p qatorli INSERT + rollup + commit bilan yoziladi;
+3. Paket rad etilsa (bitta qatorning baza xatosi, masalan Numeric(10,2) dan oshgan summa, yoki
+   parallel so'rov shu orada yozgan kalit) — qatorlar bittadan qayta yoziladi: o'tganlari
+   created, kaliti bazada paydo bo'lganlari duplicate, qolganlari o'z xatosi bilan error.
+
+Har element uchun holat: created | duplicate | error.
+"""
+from datetime import datetime
+from app import db, bulk_import
+from app.models import Sale
+
+MAX_BATCH = 1000
+KEY_MAX_LENGTH = 64
+
+
+def _existing(keys):
+    """{client_key: sale_id} — unikal indeks bo'yicha bitta IN so'rovi"""
+    if not keys:
+        return {}
+    return dict(db.session.query(Sale.client_key, Sale.id).filter(Sale.client_key.in_(keys)).all())
+
+
+def _key(item):
+    if not isinstance(item, dict):
+        raise bulk_import.RowError('Savdo obyekt bo\'lishi kerak')
+    key = item.get('client_key')
+    if not isinstance(key, str) or not key.strip():
+        raise bulk_import.RowError('client_key kiritilishi shart')
+    key = key.strip()
+    if len(key) > KEY_MAX_LENGTH:
+        raise bulk_import.RowError(f'client_key {KEY_MAX_LENGTH} belgidan oshmasligi kerak')
+    return key
+
+
+def _insert_one(result, index, values):
+    """Bitta qatorni yozadi; kalit allaqachon bor bo'lsa (parallel so'rov) — duplicate"""
+    created, errors = bulk_import.insert([(index, values)], 1)
+    if created:
+        result['status'] = 'created'
+        return
+    raced = _existing([values['client_key']])
+    if values['client_key'] in raced:
+        result.update(status='duplicate', id=raced[values['client_key']])
+    else:
+        result.update(status='error', error=errors[0].split(': ', 1)[-1] if errors else 'Xatolik')
+
+
+def sync(items):
+    """
+    Paketni idempotent yozadi.
+    Qaytaradi: [{'index', 'client_key', 'status', 'id', 'error'}, ...] — items tartibida
+    """
+    results = []
+    keys = {}  # client_key -> birinchi uchragan element indeksi
+    for index, item in enumerate(items):
+        result = {'index': index, 'client_key': None, 'status': None, 'id': None, 'error': None}
+        results.append(result)
+        try:
+            key = _key(item)
+        except bulk_import.RowError as e:
+            result.update(status='error', error=str(e))
+            continue
+        result['client_key'] = key
+        if key in keys:
+            result['status'] = 'duplicate'  # paket ichida takror — id birinchisidan olinadi
+        else:
+            keys[key] = index
+
+    existing = _existing(list(keys))
+    customers, products = bulk_import.prefetch([items[i] for i in keys.values()])
+    today = datetime.now().date()
+    pending = []
+    for key, index in keys.items():
+        result = results[index]
+        if key in existing:
+            result.update(status='duplicate', id=existing[key])
+            continue
+        try:
+            values = bulk_import.row_values(items[index], customers, products, today)
+        except Exception as e:
+            result.update(status='error', error=str(e))
+            continue
+        values['client_key'] = key
+        pending.append((index, values))
+
+    if pending:
+        created, _ = bulk_import.insert(pending, len(pending))
+        if created:
+            for index, _ in pending:
+                results[index]['status'] = 'created'
+        else:
+            # Paket rad etildi (bitta qator xatosi yoki parallel so'rov yozgan kalit) —
+            # qatorma-qator qayta yoziladi, har element o'z holatini oladi
+            for index, values in pending:
+                _insert_one(results[index], index, values)
+
+    ids = _existing([r['client_key'] for r in results if r['status'] == 'created'])
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = ids.get(result['client_key'])
+        elif result['status'] == 'duplicate' and result['id'] is None:
+            first = results[keys[result['client_key']]]
+            if first['status'] == 'error':
+                result.update(status='error', error=first['error'])
+            else:
+                result['id'] = first['id']
+    return results
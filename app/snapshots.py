@@ -0,0 +1,351 @@
+"""
+Yopilgan oylar uchun o'zgarmas snapshotlar (monthly_snapshots).
+
+O'tgan oylar faqat kimdir o'sha oyga sanalangan savdoni kiritsa/o'zgartirsa
+o'zgaradi. Shuning uchun har bir yopilgan oy uchun jami ko'rsatkichlar, top
+mahsulotlar, top mijozlar va kunlik qator bir marta hisoblanib saqlanadi va
+qayta ishlatiladi. Savdo yozuvi shu oy ichidagi sanaga tegsa snapshot
+o'chiriladi (app/rollup.py). Joriy oy har doim jonli hisoblanadi.
+
+Top mahsulot/mijozlar snapshotda faqat id bilan saqlanadi, nomlar o'qishda bitta IN
+so'rovi bilan qo'shiladi — mahsulot/mijoz tahriri snapshotlarni bekor qilmaydi.
+O'chirishda faqat shu mahsulot/mijoz savdosi bor oylar o'chiriladi (invalidate_for).
+
+Snapshotlar GET so'rovida yozilmaydi: yo'q oy rollup'dan jonli hisoblanadi va
+build() fon thread'ida navbatga qo'yiladi (SNAPSHOT_AUTO_BUILD, bir vaqtda bittadan);
+qo'lda: python3 build_snapshots.py. build() hisoblashdan keyin yangi tranzaksiyada
+data_versions va oyning rollup jamilarini qayta tekshiradi — oraliqda savdo kiritilgan
+oy saqlanmaydi (aks holda eskirgan snapshot o'zgarmas bo'lib qolardi).
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from calendar import monthrange
+from flask import current_app
+from sqlalchemy import func, extract, delete, and_, or_
+from sqlalchemy.exc import IntegrityError
+from app import db, watermark
+from app.models import Product, Customer, MonthlySnapshot, SalesDailyRollup as R
+
+TOP_LIMIT = 10
+BUILD_CHUNK = 24      # bitta hisoblash/saqlash tranzaksiyasidagi oylar
+BUILD_ATTEMPTS = 3    # yozuvlar davom etayotgan oylar uchun qayta urinishlar
+WATCHED = ('sales',)  # snapshot qiymatlari bog'liq jadvallar (nomlar o'qishda qo'shiladi)
+
+_lock = threading.Lock()
+_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snapshot-build')
+_state = {'scheduled': False}
+
+
+def is_closed(year, month, today):
+    """Oy to'liq o'tib bo'lganmi (joriy va kelajak oylar — yo'q)"""
+    return (year, month) < (today.year, today.month)
+
+
+def _month_of(d):
+    return d.year, d.month
+
+
+def _range_of(months):
+    first, last = min(months), max(months)
+    return date(first[0], first[1], 1), date(last[0], last[1], monthrange(last[0], last[1])[1])
+
+
+def _totals(months):
+    """{(yil, oy): jami ko'rsatkichlar} — bitta GROUP BY so'rovi (savdosiz oylar nol)"""
+    start, end = _range_of(months)
+    y_col = extract('year', R.sale_date)
+    m_col = extract('month', R.sale_date)
+    result = {
+        ym: {'total_sales': 0.0, 'total_quantity': 0, 'sales_count': 0, 'total_profit': 0.0}
+        for ym in months
+    }
+    rows = db.session.query(
+        y_col.label('y'), m_col.label('m'),
+        func.sum(R.amount).label('amount'),
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.sales_count).label('count'),
+        func.sum(R.profit).label('profit')
+    ).filter(R.sale_date >= start, R.sale_date <= end).group_by(y_col, m_col).all()
+    for r in rows:
+        totals = result.get((int(r.y), int(r.m)))
+        if totals is not None:
+            totals.update(
+                total_sales=float(r.amount or 0),
+                total_quantity=int(r.quantity or 0),
+                sales_count=int(r.count or 0),
+                total_profit=float(r.profit or 0)
+            )
+    return result
+
+
+def _fingerprint(values):
+    return (round(values['total_sales'], 2), values['total_quantity'],
+            values['sales_count'], round(values['total_profit'], 2))
+
+
+def _compute(months):
+    """
+    Berilgan oylar uchun snapshot qiymatlarini rollup'dan hisoblaydi.
+    Oylar soni qancha bo'lishidan qat'i nazar 4 ta GROUP BY so'rovi.
+    """
+    start, end = _range_of(months)
+    y_col = extract('year', R.sale_date)
+    m_col = extract('month', R.sale_date)
+    in_range = (R.sale_date >= start, R.sale_date <= end)
+
+    result = {
+        ym: {**totals, 'top_products': [], 'top_customers': [], 'daily_sales': []}
+        for ym, totals in _totals(sorted(set(months))).items()
+    }
+
+    daily = db.session.query(
+        R.sale_date,
+        func.sum(R.amount).label('amount'),
+        func.sum(R.quantity).label('quantity')
+    ).filter(*in_range).group_by(R.sale_date).order_by(R.sale_date).all()
+    for d in daily:
+        snap = result.get(_month_of(d.sale_date))
+        if snap is not None:
+            snap['daily_sales'].append({
+                'date': str(d.sale_date), 'amount': float(d.amount or 0), 'quantity': int(d.quantity or 0)
+            })
+
+    products = db.session.query(
+        y_col.label('y'), m_col.label('m'),
+        Product.id, Product.name,
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.amount).label('amount')
+    ).join(Product, R.product_id == Product.id).filter(*in_range).group_by(
+        y_col, m_col, Product.id, Product.name
+    ).all()
+    for p in sorted(products, key=lambda p: p.quantity or 0, reverse=True):
+        snap = result.get((int(p.y), int(p.m)))
+        if snap is not None and len(snap['top_products']) < TOP_LIMIT:
+            snap['top_products'].append({
+                'id': p.id, 'name': p.name, 'quantity': int(p.quantity or 0), 'amount': float(p.amount or 0)
+            })
+
+    customers = db.session.query(
+        y_col.label('y'), m_col.label('m'),
+        Customer.id, Customer.name, Customer.additional_name,
+        func.sum(R.quantity).label('quantity'),
+        func.sum(R.amount).label('amount')
+    ).join(Customer, R.customer_id == Customer.id).filter(*in_range).group_by(
+        y_col, m_col, Customer.id, Customer.name, Customer.additional_name
+    ).all()
+    for c in sorted(customers, key=lambda c: c.amount or 0, reverse=True):
+        snap = result.get((int(c.y), int(c.m)))
+        if snap is not None and len(snap['top_customers']) < TOP_LIMIT:
+            snap['top_customers'].append({
+                'id': c.id, 'name': c.name, 'additional_name': c.additional_name,
+                'quantity': int(c.quantity or 0), 'amount': float(c.amount or 0)
+            })
+    return result
+
+
+def _period_filter(closed):
+    period_key = MonthlySnapshot.year * 100 + MonthlySnapshot.month
+    return (period_key >= closed[0][0] * 100 + closed[0][1],
+            period_key <= closed[-1][0] * 100 + closed[-1][1])
+
+
+def _with_names(snaps):
+    """Saqlangan snapshotlarning top ro'yxatlariga joriy nomlarni qo'shadi — ikkita IN so'rovi"""
+    product_ids = {p['id'] for snap in snaps for p in snap['top_products']}
+    customer_ids = {c['id'] for snap in snaps for c in snap['top_customers']}
+    products = dict(db.session.query(Product.id, Product.name).filter(
+        Product.id.in_(product_ids)
+    ).all()) if product_ids else {}
+    customers = {
+        c.id: c for c in db.session.query(Customer.id, Customer.name, Customer.additional_name).filter(
+            Customer.id.in_(customer_ids)
+        ).all()
+    } if customer_ids else {}
+    for snap in snaps:
+        for p in snap['top_products']:
+            p['name'] = products.get(p['id'])
+        for c in snap['top_customers']:
+            customer = customers.get(c['id'])
+            c['name'] = customer.name if customer else None
+            c['additional_name'] = customer.additional_name if customer else None
+    return snaps
+
+
+def _stored(closed):
+    """Saqlangan snapshotlar: {(yil, oy): dict} (faqat closed ichidagilari, nomlar bilan)"""
+    if not closed:
+        return {}
+    wanted = set(closed)
+    found = {
+        (s.year, s.month): s.to_dict()
+        for s in MonthlySnapshot.query.filter(*_period_filter(closed)).all()
+        if (s.year, s.month) in wanted
+    }
+    _with_names(list(found.values()))
+    return found
+
+
+def _request_build(today):
+    """Saqlanmagan yopilgan oylar uchun fon build() — navbatda bittadan ortiq bo'lmaydi"""
+    app = current_app._get_current_object()
+    if not app.config.get('SNAPSHOT_AUTO_BUILD', True):
+        return
+    with _lock:
+        if _state['scheduled']:
+            return
+        _state['scheduled'] = True
+    _builder.submit(_build_in_background, app, today)
+
+
+def _build_in_background(app, today):
+    try:
+        with app.app_context():
+            build(today)
+    except Exception as e:
+        print(f"⚠️  Snapshotlarni qurishda xato: {e}")
+    finally:
+        with _lock:
+            _state['scheduled'] = False
+
+
+def stored_totals(months, today):
+    """
+    Yopilgan oylarning saqlangan jami ko'rsatkichlari: {(yil, oy): {'total_sales', 'total_profit',
+    'sales_count'}} — details o'qilmaydi. Saqlanmagan yopilgan oylar uchun fon build() navbatga qo'yiladi.
+    """
+    closed = sorted({ym for ym in months if is_closed(ym[0], ym[1], today)})
+    if not closed:
+        return {}
+    wanted = set(closed)
+    found = {
+        (r.year, r.month): {
+            'total_sales': float(r.total_sales or 0),
+            'total_profit': float(r.total_profit or 0),
+            'sales_count': int(r.sales_count or 0),
+        }
+        for r in db.session.query(
+            MonthlySnapshot.year, MonthlySnapshot.month, MonthlySnapshot.total_sales,
+            MonthlySnapshot.total_profit, MonthlySnapshot.sales_count
+        ).filter(*_period_filter(closed)).all()
+        if (r.year, r.month) in wanted
+    }
+    if len(found) < len(closed):
+        _request_build(today)
+    return found
+
+
+def get_many(months, today):
+    """
+    Yopilgan oylar uchun snapshotlarni qaytaradi: {(yil, oy): MonthlySnapshot.to_dict()}.
+    Saqlanmagan oylar bitta paketda jonli hisoblanadi va fon build() navbatga qo'yiladi.
+    Ochiq oylar e'tiborsiz qoldiriladi.
+    """
+    closed = sorted({ym for ym in months if is_closed(ym[0], ym[1], today)})
+    found = _stored(closed)
+    missing = [ym for ym in closed if ym not in found]
+    if missing:
+        for (y, m), values in _compute(missing).items():
+            found[(y, m)] = {'year': y, 'month': m, **values}
+        _request_build(today)
+    return found
+
+
+def _closed_months(today):
+    """Birinchi savdo oyidan o'tgan oygacha barcha (yil, oy)"""
+    first = db.session.query(func.min(R.sale_date)).scalar()
+    if first is None:
+        return []
+    months, y, m = [], first.year, first.month
+    while is_closed(y, m, today):
+        months.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+
+def build(today, months=None):
+    """
+    Saqlanmagan yopilgan oylar snapshotlarini quradi va saqlaydi (months=None — barcha oylar).
+    Har bo'lak: versiyalar o'qiladi -> hisoblanadi -> commit; keyin yangi tranzaksiyada
+    versiyalar va oylarning rollup jamilari qayta o'qiladi va faqat o'zgarmagan oylar
+    saqlanadi. O'zgarganlari BUILD_ATTEMPTS martagacha qayta hisoblanadi.
+    Qaytaradi: {'existing', 'built', 'skipped'}
+    """
+    closed = sorted({ym for ym in (_closed_months(today) if months is None else months)
+                     if is_closed(ym[0], ym[1], today)})
+    existing = _stored(closed)
+    pending = [ym for ym in closed if ym not in existing]
+    stats = {'existing': len(existing), 'built': 0, 'skipped': 0}
+    db.session.commit()
+    for start in range(0, len(pending), BUILD_CHUNK):
+        chunk = pending[start:start + BUILD_CHUNK]
+        for _ in range(BUILD_ATTEMPTS):
+            before = watermark.current(WATCHED)
+            computed = _compute(chunk)
+            db.session.commit()
+
+            # Saqlash tranzaksiyasi: hisoblashdan keyin kiritilgan savdo shu yerda ko'rinadi
+            after = watermark.current(WATCHED)
+            fresh = _totals(chunk)
+            stable = [
+                ym for ym in chunk
+                if after == before and _fingerprint(fresh[ym]) == _fingerprint(computed[ym])
+            ]
+            for y, m in stable:
+                values = computed[(y, m)]
+                # Nomlar saqlanmaydi — o'qishda joriy nomlar qo'shiladi (_with_names)
+                details = {
+                    'top_products': [{k: p[k] for k in ('id', 'quantity', 'amount')} for p in values['top_products']],
+                    'top_customers': [{k: c[k] for k in ('id', 'quantity', 'amount')} for c in values['top_customers']],
+                    'daily_sales': values['daily_sales'],
+                }
+                db.session.add(MonthlySnapshot(
+                    year=y, month=m,
+                    total_sales=values['total_sales'],
+                    total_quantity=values['total_quantity'],
+                    sales_count=values['sales_count'],
+                    total_profit=values['total_profit'],
+                    details=json.dumps(details, ensure_ascii=False)
+                ))
+            try:
+                db.session.commit()
+                stats['built'] += len(stable)
+            except IntegrityError:
+                # Boshqa jarayon shu oylarni allaqachon saqlagan
+                db.session.rollback()
+                stats['existing'] += len(stable)
+            chunk = [ym for ym in chunk if ym not in stable]
+            if not chunk:
+                break
+        stats['skipped'] += len(chunk)
+    return stats
+
+
+def get(year, month, today):
+    """Bitta yopilgan oy snapshoti (dict) yoki ochiq oy bo'lsa None"""
+    return get_many([(year, month)], today).get((year, month))
+
+
+def invalidate_dates(dates):
+    """Berilgan sanalar tushgan oylarning snapshotlarini o'chiradi (commit qilmaydi)"""
+    months = sorted({_month_of(d) for d in dates if d is not None})
+    if months:
+        db.session.execute(delete(MonthlySnapshot).where(or_(*[
+            and_(MonthlySnapshot.year == y, MonthlySnapshot.month == m) for y, m in months
+        ])))
+
+
+def invalidate_for(product_id=None, customer_id=None):
+    """Mahsulot yoki mijoz savdolari bor oylarning snapshotlarini o'chiradi (commit qilmaydi)"""
+    query = db.session.query(R.sale_date).distinct()
+    if product_id is not None:
+        query = query.filter(R.product_id == product_id)
+    if customer_id is not None:
+        query = query.filter(R.customer_id == customer_id)
+    invalidate_dates([d for (d,) in query.all()])
+
+
+def invalidate_all():
+    """Barcha snapshotlarni o'chiradi (commit qilmaydi)"""
+    db.session.execute(delete(MonthlySnapshot))
@@ -0,0 +1,252 @@
+"""
+Xarita nuqtalari uchun jarayon ichidagi fazoviy indeks (grid) — customers, shops, regions.
+
+Har qatlam (layer) map-data javobidagi tayyor dict'larni va ularni CELL_DEG gradusli
+katakchalarga ajratgan grid'ni xotirada saqlaydi. ?bbox= so'rovi faqat ko'rinish
+oynasiga tushgan katakchalarni ko'radi — xarita har surilganda/kattalashtirilganda
+faqat ko'rinadigan nuqtalar yuboriladi, bazaga so'rov yo'q.
+
+Yangilanish (har o'qishdan oldin refresh(), bitta PK so'rov — data_versions):
+- shu jarayondagi ORM yozuvlari session hodisalari orqali kuzatiladi: o'zgargan id'lar
+  commitdan keyin bitta IN so'rovi bilan qayta yuklanadi (inkremental);
+- data_versions hisoblagichi kutilgandan farq qilsa (boshqa jarayon, Core yozuv,
+  bog'liq jadval o'zgardi) — qatlam to'liq qayta quriladi.
+"""
+import math
+import threading
+from collections import Counter
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db, watermark
+from app.models import Customer, Shop, Region, region_shop_products
+
+CELL_DEG = 0.1  # ~11 km
+
+
+def parse_bbox(value):
+    """'minLon,minLat,maxLon,maxLat' -> tuple yoki None; noto'g'ri bo'lsa ValueError"""
+    if not value:
+        return None
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(p) for p in parts):
+        raise ValueError('bbox: 4 ta son kerak')
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError('bbox chegaralari noto\'g\'ri')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _load_customers(ids=None):
+    query = db.session.query(
+        Customer.id, Customer.name, Customer.additional_name, Customer.phone, Customer.address,
+        Customer.latitude, Customer.longitude
+    ).filter(Customer.latitude.isnot(None), Customer.longitude.isnot(None))
+    if ids is not None:
+        query = query.filter(Customer.id.in_(ids))
+    return [{
+        'id': c.id,
+        'name': c.name,
+        'additional_name': c.additional_name,
+        'phone': c.phone,
+        'address': c.address,
+        'latitude': float(c.latitude),
+        'longitude': float(c.longitude)
+    } for c in query.all()]
+
+
+def _load_shops(ids=None):
+    products_count = db.session.query(
+        region_shop_products.c.shop_id, func.count().label('n')
+    ).group_by(region_shop_products.c.shop_id).subquery()
+    query = db.session.query(
+        Shop.id, Shop.name, Shop.latitude, Shop.longitude, Shop.phone, Shop.size,
+        Region.name.label('region_name'), products_count.c.n
+    ).outerjoin(Region, Shop.region_id == Region.id).outerjoin(
+        products_count, products_count.c.shop_id == Shop.id
+    ).filter(Shop.status == 'active')
+    if ids is not None:
+        query = query.filter(Shop.id.in_(ids))
+    return [{
+        'id': s.id,
+        'name': s.name,
+        'latitude': float(s.latitude),
+        'longitude': float(s.longitude),
+        'region_name': s.region_name,
+        'phone': s.phone,
+        'size': s.size,
+        'products_count': s.n or 0
+    } for s in query.all() if s.latitude and s.longitude]
+
+
+def _load_regions(ids=None):
+    shops_count = db.session.query(
+        Shop.region_id, func.count(Shop.id).label('n')
+    ).group_by(Shop.region_id).subquery()
+    query = db.session.query(
+        Region.id, Region.name, Region.latitude, Region.longitude, Region.status, shops_count.c.n
+    ).outerjoin(shops_count, shops_count.c.region_id == Region.id)
+    if ids is not None:
+        query = query.filter(Region.id.in_(ids))
+    return [{
+        'id': r.id,
+        'name': r.name,
+        'latitude': float(r.latitude) if r.latitude else None,
+        'longitude': float(r.longitude) if r.longitude else None,
+        'status': r.status,
+        'shops_count': r.n or 0
+    } for r in query.all()]
+
+
+class PointLayer:
+    """Bitta jadval nuqtalari: {id: payload} + grid {(cx, cy): {id}}"""
+
+    def __init__(self, table, tables, load):
+        self.table = table      # asosiy jadval (id'lari inkremental kuzatiladi)
+        self.tables = tables    # javob bog'liq jadvallar (masalan, shops -> regions.name)
+        self._load = load
+        self._items = {}
+        self._grid = {}
+        self._ordered = None    # all() natijasi (id tartibida), o'zgarishda tashlanadi
+        self._versions = None
+        self._dirty = set()
+        self._bumps = Counter()
+        self._lock = threading.RLock()
+        self.generation = 0     # har yangilanishda oshadi — undan hosil keshlar uchun
+
+    @staticmethod
+    def _cell(lon, lat):
+        return math.floor(lon / CELL_DEG), math.floor(lat / CELL_DEG)
+
+    def _remove(self, item_id):
+        item = self._items.pop(item_id, None)
+        self._ordered = None
+        if item is not None and item['longitude'] is not None and item['latitude'] is not None:
+            cell = self._grid.get(self._cell(item['longitude'], item['latitude']))
+            if cell is not None:
+                cell.discard(item_id)
+                if not cell:
+                    del self._grid[self._cell(item['longitude'], item['latitude'])]
+
+    def _put(self, item):
+        self._remove(item['id'])
+        self._items[item['id']] = item
+        self._ordered = None
+        if item['longitude'] is not None and item['latitude'] is not None:
+            self._grid.setdefault(self._cell(item['longitude'], item['latitude']), set()).add(item['id'])
+
+    def _changed(self, ids, bumps):
+        """Session hodisasidan (commitdan keyin)"""
+        with self._lock:
+            self._dirty |= ids
+            self._bumps.update(bumps)
+
+    def refresh(self):
+        """Indeksni bazadagi holatga keltiradi (o'zgarmagan bo'lsa — bitta PK so'rov)"""
+        with self._lock:
+            dirty, bumps = self._dirty, self._bumps
+            self._dirty, self._bumps = set(), Counter()
+            versions = watermark.current(self.tables)
+            if versions == self._versions:
+                # Hisoblagich hali oshmagan (boshqa thread commitdan keyingi bump oralig'ida)
+                self._dirty |= dirty
+                self._bumps.update(bumps)
+                return
+            incremental = self._versions is not None and all(
+                versions.get(t) == self._versions.get(t, 0) + bumps[t] and (t == self.table or not bumps[t])
+                for t in self.tables
+            )
+            if incremental and dirty:
+                found = {item['id']: item for item in self._load(sorted(dirty))}
+                for item_id in dirty:
+                    if item_id in found:
+                        self._put(found[item_id])
+                    else:
+                        self._remove(item_id)
+            elif not incremental:
+                self._items, self._grid, self._ordered = {}, {}, None
+                for item in self._load():
+                    self._put(item)
+            self._versions = versions
+            self.generation += 1
+
+    def all(self):
+        with self._lock:
+            if self._ordered is None:
+                self._ordered = [self._items[i] for i in sorted(self._items)]
+            return self._ordered
+
+    def within(self, bbox):
+        """bbox ichidagi nuqtalar (id tartibida); minLon > maxLon — 180° meridian orqali"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        spans = [(min_lon, max_lon)] if min_lon <= max_lon else [(min_lon, 180.0), (-180.0, max_lon)]
+        cy0, cy1 = math.floor(min_lat / CELL_DEG), math.floor(max_lat / CELL_DEG)
+        found = []
+        with self._lock:
+            for lo, hi in spans:
+                cx0, cx1 = math.floor(lo / CELL_DEG), math.floor(hi / CELL_DEG)
+                if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._grid):
+                    # Katta oyna (mamlakat darajasi) — band katakchalarni ko'rib chiqish arzonroq
+                    cells = [k for k in self._grid if cx0 <= k[0] <= cx1 and cy0 <= k[1] <= cy1]
+                else:
+                    cells = [(x, y) for x in range(cx0, cx1 + 1) for y in range(cy0, cy1 + 1) if (x, y) in self._grid]
+                for cell in cells:
+                    for item_id in self._grid[cell]:
+                        item = self._items[item_id]
+                        if lo <= item['longitude'] <= hi and min_lat <= item['latitude'] <= max_lat:
+                            found.append(item)
+        found.sort(key=lambda item: item['id'])
+        return found
+
+
+LAYERS = {
+    'customers': PointLayer('customers', ('customers',), _load_customers),
+    'shops': PointLayer('shops', ('shops', 'regions'), _load_shops),
+    'regions': PointLayer('regions', ('regions', 'shops'), _load_regions),
+}
+_MODELS = {Customer: 'customers', Shop: 'shops', Region: 'regions'}
+
+
+def points(name, bbox=None):
+    """Qatlam nuqtalari (map-data dict'lari); bbox berilsa — faqat oyna ichidagilari"""
+    layer = LAYERS[name]
+    layer.refresh()
+    return layer.within(bbox) if bbox else layer.all()
+
+
+def _after_flush(session, flush_context):
+    # watermark bilan bir xil qoida: commitda ORM tegilgan jadval hisoblagichi bittaga oshadi
+    touched, ids = set(), {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = watermark.TRACKED.get(type(obj))
+        if table is None:
+            continue
+        touched.add(table)
+        if table in LAYERS and obj.id is not None:
+            ids.setdefault(table, set()).add(obj.id)
+    if touched:
+        pending = session.info.setdefault('spatial_pending', {'tables': set(), 'ids': {}})
+        pending['tables'].update(touched)
+        for table, changed in ids.items():
+            pending['ids'].setdefault(table, set()).update(changed)
+
+
+def _after_commit(session):
+    pending = session.info.pop('spatial_pending', None)
+    if not pending:
+        return
+    for name, layer in LAYERS.items():
+        bumps = Counter({t: 1 for t in layer.tables if t in pending['tables']})
+        if bumps:
+            layer._changed(pending['ids'].get(name, set()), bumps)
+
+
+def _after_rollback(session):
+    session.info.pop('spatial_pending', None)
+
+
+def init_app(app):
+    """SQLAlchemy session hodisalarini ro'yxatdan o'tkazadi (bir marta)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
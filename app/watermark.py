@@ -0,0 +1,139 @@
+"""
+Shartli GET (ETag / If-None-Match) uchun jadval watermarklari (data_versions).
+
+Kuzatiladigan jadvalga ORM orqali yozuv bo'lsa, tranzaksiya commit qilingandan
+keyin `data_versions` dagi hisoblagich alohida qisqa tranzaksiyada oshadi — yozuvchi
+tranzaksiyalar umumiy hisoblagich qatorini qulflab bir-birini kutmaydi (bulk import
+bo'laklari, write-behind). GET endpoint avval faqat shu hisoblagichlarni o'qiydi
+(bitta PK so'rov) va mijozning ETag'i mos kelsa asosiy so'rov va serializatsiyasiz
+304 qaytaradi.
+
+Hisoblagich bazada saqlanadi, shuning uchun bir nechta worker va qayta
+ishga tushirishdan keyin ham ETag bir xil bo'ladi. ORM'ni chetlab o'tadigan
+yozuvlar (Core INSERT/UPDATE) `touch()` ni o'zi chaqirishi kerak.
+
+Bir commit uchun oshish: ORM orqali tegilgan jadval — 1, har touch() chaqiruvi — yana 1
+(app/spatial.py commitdagi ORM o'zgarishlarini shu qoida bo'yicha kutadi; Core yozuv
+hisoblagichni kutilgandan oshiradi va qatlam to'liq qayta quriladi).
+"""
+import hashlib
+from datetime import date, datetime
+from functools import wraps
+from flask import request, current_app
+from collections import Counter
+from sqlalchemy import event, update, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from app import db
+from app.models import DataVersion, Sale, OnlineSale, Product, Customer, Shop, Region
+
+TRACKED = {model: model.__tablename__ for model in (Sale, OnlineSale, Product, Customer, Shop, Region)}
+
+
+def ensure_rows():
+    """Har bir kuzatiladigan jadval uchun hisoblagich qatori mavjudligini ta'minlaydi (ishga tushishda)"""
+    existing = {name for (name,) in db.session.query(DataVersion.name).all()}
+    missing = [name for name in TRACKED.values() if name not in existing]
+    if missing:
+        db.session.add_all([DataVersion(name=name, version=0) for name in missing])
+        db.session.commit()
+    return missing
+
+
+def _bump_stmt(tables, amount=1):
+    return update(DataVersion).where(DataVersion.name.in_(sorted(tables))).values(
+        version=DataVersion.version + amount, updated_at=datetime.utcnow()
+    )
+
+
+def _pending(session):
+    return session.info.setdefault('watermark_pending', {'orm': set(), 'touched': Counter()})
+
+
+def touch(*tables):
+    """ORM'siz yozuvdan keyin: hisoblagichlar joriy session commit qilinganda oshadi"""
+    if tables:
+        _pending(db.session)['touched'].update(tables)
+
+
+def current(tables):
+    """{jadval: versiya} — bitta PK bo'yicha so'rov"""
+    rows = db.session.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(tables))
+    ).all()
+    return {name: version for name, version in rows}
+
+
+def _after_flush(session, flush_context):
+    tables = {
+        TRACKED[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in TRACKED
+    }
+    if tables:
+        _pending(session)['orm'].update(tables)
+
+
+def _after_commit(session):
+    pending = session.info.pop('watermark_pending', None)
+    if not pending:
+        return
+    amounts = Counter(pending['touched'])
+    amounts.update(pending['orm'])
+    by_amount = {}
+    for table, amount in amounts.items():
+        by_amount.setdefault(amount, []).append(table)
+    # Alohida ulanish va qisqa tranzaksiya — qator qulfi faqat shu UPDATE davomida
+    with session.get_bind().begin() as conn:
+        for amount, tables in sorted(by_amount.items()):
+            conn.execute(_bump_stmt(tables, amount))
+
+
+def _after_rollback(session):
+    session.info.pop('watermark_pending', None)
+
+
+def _etag(versions):
+    args = sorted((k, v) for k, vs in request.args.lists() for v in vs)
+    raw = f'{request.path}|{args}|{sorted(versions.items())}|{date.today().isoformat()}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+def conditional(*tables):
+    """
+    GET javobiga ETag qo'yadi va If-None-Match mos kelsa 304 qaytaradi (view chaqirilmaydi).
+    @jwt_required() dan keyin, @cached dan oldin qo'yiladi. tables — javob bog'liq jadvallar.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('CONDITIONAL_GET_ENABLED', True):
+                return view(*args, **kwargs)
+            try:
+                versions = current(tables)
+            except (OperationalError, ProgrammingError):
+                db.session.rollback()
+                return view(*args, **kwargs)
+            etag = _etag(versions)
+            if request.if_none_match.contains_weak(etag):
+                rv = current_app.response_class(status=304)
+                rv.set_etag(etag, weak=True)
+                return rv
+
+            rv = current_app.make_response(view(*args, **kwargs))
+            if rv.status_code == 200:
+                rv.set_etag(etag, weak=True)
+                # Brauzer har safar qayta tekshiradi (If-None-Match), o'zgarmagan bo'lsa 304
+                rv.headers['Cache-Control'] = 'private, no-cache'
+            return rv
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    """Sozlama va SQLAlchemy session hodisalarini ro'yxatdan o'tkazadi (bir marta)"""
+    app.config.setdefault('CONDITIONAL_GET_ENABLED', True)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
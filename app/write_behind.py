@@ -0,0 +1,171 @@
+"""
+POST /api/sales uchun write-behind navbati (ixtiyoriy, SALES_WRITE_BEHIND=1).
+
+Tekshiruvdan o'tgan savdo jarayon ichidagi navbatga qo'yiladi va chaqiruvchi darhol
+ticket oladi (202). Fon thread'i navbatni paketlab yozadi: birinchi savdodan keyin
+ko'pi bilan MAX_DELAY_MS kutadi yoki MAX_BATCH ta yig'ilsa darhol — bitta ko'p qatorli
+INSERT + rollup + bitta commit (app/bulk_import.insert). Har savdo uchun alohida
+commit (fsync) o'rniga paket uchun bitta.
+
+Ishonchlilik: toza to'xtashda (SIGTERM / interpreter exit) atexit orqali navbat
+to'liq bazaga yoziladi (drain). Jarayon keskin o'ldirilsa (SIGKILL, OOM) oxirgi
+MAX_DELAY_MS ichidagi yozilmagan savdolar yo'qoladi — shuning uchun rejim ixtiyoriy.
+Navbat to'lsa (MAX_PENDING) savdo odatdagidek sinxron yoziladi.
+"""
+import atexit
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from app import bulk_import
+
+DEFAULT_MAX_BATCH = 500
+DEFAULT_MAX_DELAY_MS = 200
+DEFAULT_MAX_PENDING = 10000
+MAX_TICKETS = 20000
+
+_cond = threading.Condition()
+_pending = deque()  # (ticket, values, navbatga qo'yilgan vaqt)
+_tickets = OrderedDict()  # ticket -> {'status': queued|committed|failed, 'error': ...}
+_state = {'app': None, 'thread': None, 'stopping': False, 'atexit': False,
+          'committed': 0, 'failed': 0, 'batches': 0}
+
+
+def enabled(app):
+    return bool(app.config.get('SALES_WRITE_BEHIND'))
+
+
+def _set_status(ticket, status, error=None):
+    # _cond ushlangan holda chaqiriladi
+    entry = _tickets.get(ticket)
+    if entry is not None:
+        entry['status'] = status
+        entry['error'] = error
+
+
+def enqueue(app, values):
+    """
+    Tekshirilgan savdo qiymatlarini navbatga qo'yadi. Qaytaradi: ticket
+    yoki None (navbat to'la yoki to'xtash jarayonida — chaqiruvchi sinxron yozadi).
+    """
+    with _cond:
+        if _state['stopping'] or len(_pending) >= app.config.get('SALES_WRITE_BEHIND_MAX_PENDING', DEFAULT_MAX_PENDING):
+            return None
+        _ensure_flusher(app)
+        ticket = uuid.uuid4().hex
+        _pending.append((ticket, values, time.monotonic()))
+        _tickets[ticket] = {'status': 'queued', 'error': None}
+        while len(_tickets) > MAX_TICKETS:
+            _tickets.popitem(last=False)
+        _cond.notify()
+        return ticket
+
+
+def status(ticket):
+    """Ticket holati (dict) yoki None"""
+    with _cond:
+        entry = _tickets.get(ticket)
+        return dict(entry, ticket=ticket) if entry else None
+
+
+def stats():
+    """Navbat hisoblagichlari — monitoring uchun"""
+    with _cond:
+        return {
+            'pending': len(_pending),
+            'committed': _state['committed'],
+            'failed': _state['failed'],
+            'batches': _state['batches'],
+            'avg_batch_size': round(_state['committed'] / _state['batches'], 1) if _state['batches'] else 0.0,
+        }
+
+
+def _ensure_flusher(app):
+    # _cond ushlangan holda chaqiriladi; thread birinchi savdoda (gunicorn fork'dan keyin) ishga tushadi
+    thread = _state['thread']
+    if thread is None or not thread.is_alive():
+        _state['app'] = app
+        thread = threading.Thread(target=_flusher, name='sales-write-behind', daemon=True)
+        _state['thread'] = thread
+        thread.start()
+
+
+def _next_batch(max_batch, max_delay):
+    """Paket tayyor bo'lguncha kutadi: MAX_BATCH ta yoki eng eski savdodan MAX_DELAY o'tdi"""
+    with _cond:
+        while not _pending and not _state['stopping']:
+            _cond.wait()
+        if not _pending:
+            return None
+        deadline = _pending[0][2] + max_delay
+        while len(_pending) < max_batch and not _state['stopping']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _cond.wait(remaining)
+        return [_pending.popleft() for _ in range(min(max_batch, len(_pending)))]
+
+
+def _write(app, batch):
+    """Paketni bitta INSERT + commit bilan yozadi; xato bo'lsa savdolarni alohida yozib, xatolisini ajratadi"""
+    results = {}
+    with app.app_context():
+        created, _ = bulk_import.insert([(ticket, values) for ticket, values, _ in batch], len(batch))
+        for ticket, values, _ in batch:
+            if created:
+                results[ticket] = None
+                continue
+            ok, row_errors = bulk_import.insert([(ticket, values)], 1)
+            results[ticket] = None if ok else (row_errors[0].split(': ', 1)[-1] if row_errors else 'Xatolik')
+    with _cond:
+        _state['batches'] += 1
+        for ticket, error in results.items():
+            _set_status(ticket, 'failed' if error else 'committed', error)
+            _state['failed' if error else 'committed'] += 1
+
+
+def _flusher():
+    app = _state['app']
+    max_batch = max(1, int(app.config.get('SALES_WRITE_BEHIND_MAX_BATCH', DEFAULT_MAX_BATCH)))
+    max_delay = max(0, int(app.config.get('SALES_WRITE_BEHIND_MAX_DELAY_MS', DEFAULT_MAX_DELAY_MS))) / 1000
+    while True:
+        batch = _next_batch(max_batch, max_delay)
+        if batch is None:
+            return
+        try:
+            _write(app, batch)
+        except Exception as e:
+            print(f"⚠️  write-behind: paket yozilmadi: {e}")
+            with _cond:
+                for ticket, _, _ in batch:
+                    _set_status(ticket, 'failed', str(e))
+                    _state['failed'] += 1
+
+
+def drain(timeout=30):
+    """Yangi savdolarni qabul qilishni to'xtatadi va navbatdagilarni bazaga yozadi (toza to'xtashda)"""
+    with _cond:
+        _state['stopping'] = True
+        _cond.notify_all()
+        thread = _state['thread']
+    if thread is not None and thread.is_alive():
+        thread.join(timeout)
+    # Flusher ishlamagan bo'lsa (yoki vaqt tugadi) — qolganini shu thread'da yozamiz
+    app = _state['app']
+    while app is not None:
+        with _cond:
+            batch = [_pending.popleft() for _ in range(len(_pending))]
+        if not batch:
+            break
+        _write(app, batch)
+
+
+def init_app(app):
+    """Sozlamalar; rejim yoqilgan bo'lsa jarayon chiqishida navbat bo'shatiladi"""
+    app.config.setdefault('SALES_WRITE_BEHIND', False)
+    app.config.setdefault('SALES_WRITE_BEHIND_MAX_BATCH', DEFAULT_MAX_BATCH)
+    app.config.setdefault('SALES_WRITE_BEHIND_MAX_DELAY_MS', DEFAULT_MAX_DELAY_MS)
+    app.config.setdefault('SALES_WRITE_BEHIND_MAX_PENDING', DEFAULT_MAX_PENDING)
+    if enabled(app) and not _state['atexit']:
+        _state['atexit'] = True
+        atexit.register(drain)
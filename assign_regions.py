@@ -0,0 +1,23 @@
+"""
+Mijoz va do'konlarni hudud poligonlariga qayta biriktirish skripti (app/region_assign.py)
+customers.geo_region_id / shops.geo_region_id ni koordinata tushgan poligon bo'yicha yangilaydi.
+Poligonlar yoki koordinatalar bazaga to'g'ridan-to'g'ri (ilovani chetlab) yozilganda ishga tushiring.
+
+Ishlatish:
+    python3 assign_regions.py
+"""
+from app import create_app
+from app.region_assign import assign
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Hududlarga biriktirilmoqda...")
+        for name, stats in assign().items():
+            print(f"✅ {name}: {stats['assigned']:,}/{stats['total']:,} biriktirildi, "
+                  f"{stats['changed']:,} ta o'zgardi")
+
+
+if __name__ == '__main__':
+    main()
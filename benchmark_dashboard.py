@@ -0,0 +1,145 @@
+"""
+Dashboard agregatsiyasi benchmark skripti
+/api/dashboard/stats uchun eski (har ko'rsatkich alohida so'rov, xom `sales`) va yangi
+(bitta so'rov, kunlik rollup ustida, app/analytics.py) usullarning round-trip soni va vaqtini solishtiradi.
+
+Ishlatish:
+    BENCH_DATABASE_URL=postgresql://... python3 benchmark_dashboard.py --seed 1000000
+    python3 benchmark_dashboard.py                  # mavjud ma'lumotlar ustida, 5 marta
+
+DIQQAT: --seed berilganda ko'rsatilgan bazaga soxta savdolar yoziladi.
+Ishlab chiqarish bazasida ishga tushirmang — alohida BENCH_DATABASE_URL bering.
+"""
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+BENCH_DATABASE_URL = os.getenv('BENCH_DATABASE_URL')
+if BENCH_DATABASE_URL:
+    os.environ['DATABASE_URL'] = BENCH_DATABASE_URL
+
+from sqlalchemy import func, event
+from app import create_app, db
+from app.models import Sale, Product, Customer
+from app.analytics import sales_summary
+from app.rollup import rebuild
+from app.watermark import touch
+
+
+def legacy_stats(today):
+    """Eski get_stats: har bir ko'rsatkich alohida so'rov"""
+    this_month_start = today.replace(day=1)
+    this_year_start = today.replace(month=1, day=1)
+    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
+    last_month_end = this_month_start - timedelta(days=1)
+    q = db.session.query
+    profit_expr = func.coalesce(Sale.profit, Sale.amount - (Product.purchase_price * Sale.quantity))
+    return {
+        'daily_sales': q(func.sum(Sale.amount)).filter(Sale.sale_date == today).scalar(),
+        'monthly_sales': q(func.sum(Sale.amount)).filter(Sale.sale_date >= this_month_start, Sale.sale_date <= today).scalar(),
+        'yearly_sales': q(func.sum(Sale.amount)).filter(Sale.sale_date >= this_year_start, Sale.sale_date <= today).scalar(),
+        'total_revenue': q(func.sum(Sale.amount)).scalar(),
+        'total_quantity_sold': q(func.sum(Sale.quantity)).filter(Sale.sale_date >= this_month_start, Sale.sale_date <= today).scalar(),
+        'total_quantity_sold_all_time': q(func.sum(Sale.quantity)).scalar(),
+        'last_month_sales': q(func.sum(Sale.amount)).filter(Sale.sale_date >= last_month_start, Sale.sale_date <= last_month_end).scalar(),
+        'monthly_profit': q(func.sum(profit_expr)).join(Product, Sale.product_id == Product.id).filter(
+            Sale.sale_date >= this_month_start, Sale.sale_date <= today).scalar(),
+        'total_profit': q(func.sum(profit_expr)).join(Product, Sale.product_id == Product.id).scalar(),
+        'customers_count': q(func.count(Customer.id)).scalar(),
+        'products_count': q(func.count(Product.id)).filter(Product.status == 'active').scalar(),
+    }
+
+
+def seed(count, days=6 * 365, chunk=20000):
+    """Benchmark uchun soxta mahsulot, mijoz va savdolarni yozadi (multi-row INSERT bilan)"""
+    if Product.query.count() < 20:
+        db.session.add_all([
+            Product(name=f'Bench mahsulot {i}', package_type='1kg', purchase_price=10 + i, sale_price=15 + i)
+            for i in range(20)
+        ])
+    if Customer.query.count() < 200:
+        db.session.add_all([Customer(name=f'Bench mijoz {i}') for i in range(200)])
+    db.session.commit()
+    product_ids = [p.id for p in Product.query.with_entities(Product.id).all()]
+    customer_ids = [c.id for c in Customer.query.with_entities(Customer.id).all()]
+
+    today = datetime.now().date()
+    rnd = random.Random(42)
+    inserted = 0
+    print(f"🔄 {count:,} ta savdo yozilmoqda...")
+    while inserted < count:
+        rows = []
+        for _ in range(min(chunk, count - inserted)):
+            qty = rnd.randint(1, 10)
+            amount = qty * rnd.randint(15, 40)
+            rows.append({
+                'customer_id': rnd.choice(customer_ids),
+                'product_id': rnd.choice(product_ids),
+                'quantity': qty,
+                'amount': amount,
+                'unit_price': round(amount / qty, 2),
+                'purchase_price_at_sale': None,
+                'profit': None if rnd.random() < 0.3 else round(amount * 0.3, 2),
+                'sale_date': today - timedelta(days=rnd.randint(0, days)),
+                'created_at': datetime.utcnow(),
+            })
+        db.session.execute(Sale.__table__.insert(), rows)
+        touch('sales')
+        db.session.commit()
+        inserted += len(rows)
+        print(f"  … {inserted:,}", end='\r', flush=True)
+    print(f"\n✅ {inserted:,} ta savdo qo'shildi")
+    print(f"🔄 sales_daily_rollup qayta qurilmoqda... {rebuild():,} ta qator")
+
+
+def measure(fn, today, runs):
+    """fn ni runs marta ishga tushiradi; (round-trip soni, o'rtacha ms, natija) qaytaradi"""
+    counter = {'n': 0}
+
+    def on_execute(*args, **kwargs):
+        counter['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    try:
+        fn(today)  # isitish (kesh/plan)
+        counter['n'] = 0
+        started = time.perf_counter()
+        for _ in range(runs):
+            result = fn(today)
+        elapsed = (time.perf_counter() - started) / runs * 1000
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+    return counter['n'] // runs, elapsed, result
+
+
+def main():
+    args = sys.argv[1:]
+    seed_count = int(args[args.index('--seed') + 1]) if '--seed' in args else 0
+    runs = int(args[args.index('--runs') + 1]) if '--runs' in args else 5
+
+    app = create_app()
+    with app.app_context():
+        if seed_count:
+            seed(seed_count)
+        total = db.session.query(func.count(Sale.id)).scalar()
+        today = datetime.now().date()
+        print(f"\n📊 Baza: {db.engine.dialect.name}, savdolar soni: {total:,}, takrorlar: {runs}")
+
+        old_trips, old_ms, old = measure(legacy_stats, today, runs)
+        new_trips, new_ms, new = measure(sales_summary, today, runs)
+
+        print(f"  Eski usul:  {old_trips:>3} ta so'rov, {old_ms:10.1f} ms")
+        print(f"  Yangi usul: {new_trips:>3} ta so'rov, {new_ms:10.1f} ms")
+        if new_ms:
+            print(f"  Tezlashish: {old_ms / new_ms:.1f}x")
+        mismatched = [k for k in old if (old[k] or 0) != (new[k] or 0)]
+        if mismatched:
+            print(f"  ⚠️  Natijalar farq qiladi: {', '.join(mismatched)}")
+        else:
+            print("  ✅ Natijalar bir xil")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Yopilgan oylar snapshotlarini (monthly_snapshots) qurish skripti
+Saqlanmagan (yangi yopilgan yoki savdo o'zgargani uchun o'chirilgan) oylarni
+rollup'dan hisoblab saqlaydi. Ilova ham saqlanmagan oylarni o'qiganda ularni fon
+thread'ida quradi (SNAPSHOT_AUTO_BUILD); skript SNAPSHOT_AUTO_BUILD=0 bo'lganda
+yoki oylarni oldindan tayyorlash uchun ishlatiladi.
+
+Ishlatish:
+    python3 build_snapshots.py
+"""
+from datetime import datetime
+from app import create_app
+from app.snapshots import build
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Oylik snapshotlar qurilmoqda...")
+        stats = build(datetime.now().date())
+        print(f"✅ Tayyor: {stats['built']} ta yangi, {stats['existing']} ta mavjud")
+        if stats['skipped']:
+            print(f"⚠️  {stats['skipped']} ta oy yozuvlar davom etayotgani uchun o'tkazib yuborildi — keyinroq qayta ishga tushiring")
+
+
+if __name__ == '__main__':
+    main()
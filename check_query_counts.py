@@ -0,0 +1,147 @@
+"""
+Savdo ro'yxatlari SQL so'rovlari soni tekshiruvi (N+1 yo'qligi)
+Vaqtinchalik SQLite bazasiga mahsulot, mijoz va savdolarni yozadi, so'ng
+/api/sales ning barcha sahifalarini cursor bilan aylanib chiqadi va har sahifa
+bir xil sondagi so'rov bilan qaytishini tekshiradi. /api/sales/online sahifalanmaydi —
+u turli hajmdagi ro'yxatlarda so'rovlar soni qatorlar soniga bog'liq emasligi bilan tekshiriladi.
+Javoblar Sale.to_dict() / OnlineSale.to_dict() bilan ham solishtiriladi.
+
+Ishlatish:
+    python3 check_query_counts.py
+    CHECK_DATABASE_URL=postgresql://... python3 check_query_counts.py
+
+DIQQAT: CHECK_DATABASE_URL berilganda ko'rsatilgan bazaga soxta ma'lumotlar yoziladi.
+Ishlab chiqarish bazasida ishga tushirmang.
+"""
+import os
+import sys
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+CHECK_DATABASE_URL = os.getenv('CHECK_DATABASE_URL')
+_tmp_dir = None
+if CHECK_DATABASE_URL:
+    os.environ['DATABASE_URL'] = CHECK_DATABASE_URL
+else:
+    _tmp_dir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp_dir.name, 'check.db')
+
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models import User, Sale, OnlineSale, Product, Customer
+from app.watermark import touch
+
+PAGE_SIZE = 25
+SALES_COUNT = 230
+ONLINE_SIZES = (5, 60, 240)
+
+
+def seed(rnd):
+    """Soxta foydalanuvchi, mahsulot, mijoz va savdolar; (user id, mahsulot id'lari) qaytaradi"""
+    user = User.query.filter_by(username='query_check').first()
+    if user is None:
+        user = User(username='query_check', email='query_check@example.com', role='admin')
+        user.set_password(os.urandom(8).hex())
+        db.session.add(user)
+    products = [Product(name=f'Tekshiruv mahsulot {i}', package_type='1kg', purchase_price=10 + i, sale_price=15 + i)
+                for i in range(6)]
+    customers = [Customer(name=f'Tekshiruv mijoz {i}') for i in range(8)]
+    db.session.add_all(products + customers)
+    db.session.commit()
+
+    today = datetime.now().date()
+    for i in range(SALES_COUNT):
+        qty = rnd.randint(1, 5)
+        db.session.add(Sale(
+            customer_id=rnd.choice(customers).id,
+            product_id=rnd.choice(products).id,
+            quantity=qty,
+            amount=qty * rnd.randint(15, 40),
+            profit=None if i % 3 == 0 else qty * 5,
+            sale_date=today - timedelta(days=rnd.randint(0, 400)),
+        ))
+    db.session.commit()
+    return user.id, [p.id for p in products]
+
+
+def add_online(rnd, product_ids, count):
+    today = datetime.now().date()
+    db.session.add_all([
+        OnlineSale(platform=rnd.choice(('uzum_market', 'yandex_market')), product_id=rnd.choice(product_ids),
+                   quantity=2, amount=50, sale_date=today - timedelta(days=rnd.randint(0, 60)))
+        for _ in range(count)
+    ])
+    touch('online_sales')
+    db.session.commit()
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+    failures = []
+    counter = {'n': 0}
+
+    def get(url, headers):
+        counter['n'] = 0
+        response = client.get(url, headers=headers)
+        return response, counter['n']
+
+    with app.app_context():
+        db.create_all()
+        rnd = random.Random(7)
+        user_id, product_ids = seed(rnd)
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity=str(user_id))}
+        expected_sales = [
+            s.to_dict() for s in Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc()).all()
+        ]
+        event.listen(db.engine, 'before_cursor_execute', lambda *args, **kwargs: counter.__setitem__('n', counter['n'] + 1))
+
+        # /api/sales — barcha sahifalar
+        items, counts, cursor = [], [], None
+        get(f'/api/sales?limit={PAGE_SIZE}', headers)  # isitish
+        while True:
+            url = f'/api/sales?limit={PAGE_SIZE}' + (f'&cursor={cursor}' if cursor else '')
+            response, n = get(url, headers)
+            if response.status_code != 200:
+                failures.append(f'{url}: HTTP {response.status_code}')
+                break
+            body = response.get_json()
+            items += body['items']
+            counts.append(n)
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+        print(f"  /api/sales: {len(counts)} ta sahifa, so'rovlar: {counts}")
+        if len(set(counts)) != 1:
+            failures.append(f"/api/sales: sahifalardagi so'rovlar soni bir xil emas: {counts}")
+        if items != expected_sales:
+            failures.append('/api/sales: javob Sale.to_dict() bilan mos emas')
+
+        # /api/sales/online — hajm oshganda so'rovlar soni o'zgarmasligi kerak
+        online_counts = []
+        for size in ONLINE_SIZES:
+            add_online(rnd, product_ids, size - OnlineSale.query.count())
+            expected_online = [
+                s.to_dict() for s in OnlineSale.query.order_by(OnlineSale.sale_date.desc()).all()
+            ]
+            get('/api/sales/online', headers)  # isitish
+            response, n = get('/api/sales/online', headers)
+            online_counts.append(n)
+            body = response.get_json()
+            if sorted(body, key=lambda s: s['id']) != sorted(expected_online, key=lambda s: s['id']):
+                failures.append(f'/api/sales/online ({size} ta): javob OnlineSale.to_dict() bilan mos emas')
+        print(f"  /api/sales/online: {dict(zip(ONLINE_SIZES, online_counts))} (qatorlar soni: so'rovlar)")
+        if len(set(online_counts)) != 1:
+            failures.append(f"/api/sales/online: so'rovlar soni qatorlar soniga bog'liq: {online_counts}")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Har sahifa o'zgarmas sondagi so'rov bilan qaytadi")
+
+
+if __name__ == '__main__':
+    main()
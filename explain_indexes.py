@@ -0,0 +1,84 @@
+"""
+Analitika so'rovlari indekslardan foydalanishini EXPLAIN bilan tekshirish skripti
+Dashboard/ro'yxat so'rovlarining tipik shakllari uchun reja olinadi va kutilgan indeks
+(app/models.py __table_args__, app/migrations.py 1-versiya) rejada borligi tekshiriladi.
+
+PostgreSQL: kichik jadvalda planner seq scan'ni tanlashi mumkin, shuning uchun
+enable_seqscan=off bilan "indeks ishlatilishi mumkinmi" tekshiriladi.
+MySQL: faqat EXPLAIN dagi key (possible_keys — optimizator tanlamagan bo'lishi mumkin);
+max_seeks_for_key=1 bilan indeks table scan'dan afzal ko'riladi. SQLite: EXPLAIN QUERY PLAN.
+
+Ishlatish:
+    python3 explain_indexes.py          # joriy DATABASE_URL / MySQL sozlamalari bo'yicha
+Chiqish kodi 1 — biror so'rov kutilgan indeksni ishlatmasa.
+"""
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, text
+from app import create_app, db
+from app.models import Sale, OnlineSale, SalesDailyRollup
+
+
+def checks(today):
+    month_start = today.replace(day=1)
+    year_ago = today - timedelta(days=365)
+    return [
+        ('Savdolar ro\'yxati: mijoz + sana oralig\'i', 'ix_sales_customer_id_sale_date',
+         select(Sale.id, Sale.amount).where(Sale.customer_id == 1, Sale.sale_date >= year_ago)
+         .order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(50)),
+        ('Mahsulot savdolari joriy oyda', 'ix_sales_product_id_sale_date',
+         select(func.sum(Sale.amount)).where(Sale.product_id == 1, Sale.sale_date >= month_start)),
+        ('Joriy oy jami (xom sales)', 'ix_sales_sale_date',
+         select(func.sum(Sale.amount), func.count(Sale.id)).where(Sale.sale_date.between(month_start, today))),
+        ('Online savdolar: platforma + sana', 'ix_online_sales_platform_sale_date',
+         select(func.sum(OnlineSale.amount)).where(OnlineSale.platform == 'uzum_market',
+                                                   OnlineSale.sale_date >= month_start)),
+        ('Timeseries: mahsulot filtri (rollup)', 'ix_sales_daily_rollup_product_id_sale_date',
+         select(SalesDailyRollup.sale_date, func.sum(SalesDailyRollup.amount))
+         .where(SalesDailyRollup.product_id == 1, SalesDailyRollup.sale_date.between(year_ago, today))
+         .group_by(SalesDailyRollup.sale_date)),
+        ('Timeseries: mijoz filtri (rollup)', 'ix_sales_daily_rollup_customer_id_sale_date',
+         select(SalesDailyRollup.sale_date, func.sum(SalesDailyRollup.amount))
+         .where(SalesDailyRollup.customer_id == 1, SalesDailyRollup.sale_date.between(year_ago, today))
+         .group_by(SalesDailyRollup.sale_date)),
+    ]
+
+
+def plan(conn, dialect, sql):
+    """So'rov rejasi: (indeks nomi qidiriladigan matn yoki MySQL key'lari to'plami, chiqarish uchun matn)"""
+    if dialect == 'postgresql':
+        conn.execute(text('SET LOCAL enable_seqscan = off'))
+        result = '\n'.join(row[0] for row in conn.execute(text('EXPLAIN ' + sql)))
+        return result, result
+    if dialect == 'mysql':
+        conn.execute(text('SET SESSION max_seeks_for_key = 1'))
+        rows = conn.execute(text('EXPLAIN ' + sql)).mappings().all()
+        # Faqat tanlangan indeks (key) hisoblanadi; possible_keys — faqat xato xabarida
+        used = {key for row in rows if row['key'] for key in row['key'].split(',')}
+        return used, '\n'.join(f"key={row['key']} possible_keys={row['possible_keys']}" for row in rows)
+    result = '\n'.join(str(row[-1]) for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+    return result, result
+
+
+def main():
+    app = create_app()
+    failed = 0
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        print(f"🔎 EXPLAIN ({dialect})\n")
+        for title, index, stmt in checks(datetime.now().date()):
+            sql = str(stmt.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+            with db.engine.connect() as conn:
+                with conn.begin():
+                    used, result = plan(conn, dialect, sql)
+            ok = index in used
+            failed += not ok
+            print(f"{'✅' if ok else '❌'} {title}: {index}")
+            if not ok:
+                print('   ' + result.replace('\n', '\n   '))
+    print("\nHammasi indeksdan foydalanadi" if not failed else f"\n{failed} ta so'rov indekssiz")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+sales oylik bo'limlarini boshqarish skripti (PostgreSQL, SALES_PARTITIONING=1) — app/partitions.py
+
+Ishlatish:
+    python3 manage_partitions.py              # kelgusi oylar bo'limlarini yaratish (cron: oyiga bir marta)
+    python3 manage_partitions.py --migrate    # mavjud oddiy jadvalni bo'limlarga ko'chirish (texnik tanaffusda)
+    python3 manage_partitions.py --status     # bo'limlar ro'yxati
+"""
+import sys
+from app import create_app, db
+from app import partitions
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("❌ Bo'limlar faqat PostgreSQL da qo'llab-quvvatlanadi")
+            sys.exit(1)
+        months_ahead = app.config.get('SALES_PARTITION_MONTHS_AHEAD', partitions.DEFAULT_MONTHS_AHEAD)
+        if '--migrate' in sys.argv:
+            if partitions.is_partitioned():
+                print("ℹ️  sales allaqachon bo'limlarga ajratilgan")
+            else:
+                print("🔄 sales oylik bo'limlarga ko'chirilmoqda (jadval bloklanadi)...")
+                rows = partitions.migrate(months_ahead)
+                print(f"✅ Tayyor: {rows:,} ta qator ko'chirildi")
+        elif '--status' not in sys.argv:
+            if not partitions.is_partitioned():
+                print("❌ sales oddiy jadval — avval: python3 manage_partitions.py --migrate")
+                sys.exit(1)
+            created = partitions.ensure_partitions(months_ahead)
+            print("✅ Yangi bo'limlar: " + (', '.join(created) if created else "yo'q"))
+        if partitions.is_partitioned():
+            for name, bound in partitions.partitions():
+                print(f"  {name:<20} {bound}")
+        db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""
+Kunlik savdo rollup jadvalini (sales_daily_rollup) qayta qurish skripti
+Mavjud savdolardan jadvalni noldan hisoblaydi. Ma'lumotlar to'g'ridan-to'g'ri
+bazaga (ilovani chetlab) yozilganda yoki mahsulot tan narxlari o'zgarganda ishga tushiring.
+
+Ishlatish:
+    python3 rebuild_rollup.py
+"""
+from app import create_app
+from app.rollup import rebuild
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        print("🔄 sales_daily_rollup qayta qurilmoqda...")
+        rows = rebuild()
+        print(f"✅ Tayyor: {rows:,} ta qator")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+Versiyalangan sxema migratsiyalarini qo'llash skripti (app/migrations.py)
+Ilova ishga tushganda ham avtomatik bajariladi; bu skript — deploydan oldin qo'lda
+bajarish yoki holatni ko'rish uchun.
+
+Ishlatish:
+    python3 run_migrations.py            # qo'llanmaganlarini bajarish
+    python3 run_migrations.py --status   # faqat holat
+"""
+import sys
+from app import create_app
+from app import migrations
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        if '--status' not in sys.argv:
+            for version, name in migrations.upgrade():
+                print(f"✅ {version}: {name} qo'llandi")
+        done = migrations.applied()
+        for version, name, _ in migrations.MIGRATIONS:
+            state = f"qo'llangan ({done[version]:%Y-%m-%d %H:%M})" if version in done else 'kutilmoqda'
+            print(f"  {version:>3}  {name:<32} {state}")
+
+
+if __name__ == '__main__':
+    main()
@@ -100,6 +100,22 @@ async function apiRequest(endpoint, options = {}, cacheOpts = {}) {
     }
 }
 
+/**
+ * Keshsiz GET — tez-tez o'zgaradigan parametrlar (xarita oynasi va h.k.) uchun
+ * @param {string} endpoint
+ * @param {object} params — query parametrlari
+ */
+async function apiGetFresh(endpoint, params = {}) {
+    const qs = new URLSearchParams(params).toString();
+    const response = await fetch(`${API_BASE_URL}${endpoint}${qs ? '?' + qs : ''}`, {
+        headers: { 'Authorization': `Bearer ${(getAuthToken() || '').trim()}` },
+        cache: 'no-store'
+    });
+    const data = await response.json().catch(() => ({ error: 'Server xatosi' }));
+    if (!response.ok) throw new Error(data.error || 'Xatolik yuz berdi');
+    return data;
+}
+
 // Auth API
 const authAPI = {
     login: async (username, password) => {
@@ -155,12 +171,24 @@ const dashboardAPI = {
         const key = 'dash_profit_' + (params.period || params.year || 'cur');
         return await apiRequest('/dashboard/profit-dynamics' + query, {}, { key });
     },
+    getMonthlyDynamics: async (params = {}) => {
+        const q = new URLSearchParams();
+        if (params.period === 'all') q.append('period', 'all');
+        else if (params.year) q.append('year', params.year);
+        const query = q.toString() ? '?' + q.toString() : '';
+        const key = 'dash_monthly_dyn_' + (params.period || params.year || 'cur');
+        return await apiRequest('/dashboard/monthly-dynamics' + query, {}, { key });
+    },
     getDailySales: async (days = 30) => {
         return await apiRequest('/dashboard/daily-sales?days=' + days, {}, { key: 'dash_daily_' + days });
     },
     getWeeklySales: async (weeks = 12) => {
         return await apiRequest('/dashboard/weekly-sales?weeks=' + weeks, {}, { key: 'dash_weekly_' + weeks });
     },
+    getTimeseries: async (params = {}) => {
+        const q = new URLSearchParams(params).toString();
+        return await apiRequest('/dashboard/timeseries' + (q ? '?' + q : ''), {}, { key: 'dash_ts_' + q });
+    },
     getSalesCountDynamics: async (params = {}) => {
         const q = new URLSearchParams();
         if (params.period === 'all') q.append('period', 'all');
@@ -181,6 +209,42 @@ const dashboardAPI = {
         return await apiRequest('/dashboard/detailed-stats', {}, { key: 'dash_detailed' });
     },
     
+    /**
+     * Bir nechta vidjetni bitta so'rovda oladi va natijalarni alohida getter'lar
+     * kalitlari bilan keshga yozadi — keyingi getStats(), getTopProducts() va h.k. keshdan o'qiladi.
+     * @param {object} params — { year, period, days, weeks }
+     */
+    loadBundle: async (params = {}) => {
+        const widgets = ['stats', 'growth', 'profit', 'sales_count', 'monthly', 'daily', 'weekly', 'top_products', 'top_customers', 'detailed'];
+        const q = new URLSearchParams({ widgets: widgets.join(',') });
+        if (params.period === 'all') q.append('period', 'all');
+        else if (params.year) q.append('year', params.year);
+        const days = params.days || 30;
+        const weeks = params.weeks || 12;
+        q.append('days', days);
+        q.append('weeks', weeks);
+        const data = await apiRequest('/dashboard/bundle?' + q.toString(), {}, { key: 'dash_bundle_' + q.toString() });
+        if (typeof cacheSet === 'function' && data && !data.error) {
+            const p = params.period || params.year || 'cur';
+            const keys = {
+                stats: 'dash_stats',
+                growth: 'dash_growth_' + p,
+                profit: 'dash_profit_' + p,
+                sales_count: 'dash_count_' + p,
+                monthly: 'dash_monthly_dyn_' + p,
+                daily: 'dash_daily_' + days,
+                weekly: 'dash_weekly_' + weeks,
+                top_products: 'dash_top_prod',
+                top_customers: 'dash_top_cust',
+                detailed: 'dash_detailed'
+            };
+            Object.keys(keys).forEach(function(w) {
+                if (data[w] !== undefined) cacheSet(keys[w], data[w]);
+            });
+        }
+        return data;
+    },
+    
     getMonthlyStats: async (year, month) => {
         const key = `dash_monthly_${year}_${month}`;
         return await apiRequest(`/dashboard/monthly-stats?year=${year}&month=${month}`, {}, { key });
@@ -257,26 +321,73 @@ const customersAPI = {
         }, { invalidate: ['customers', 'dash'] });
     },
     
-    getMapData: async () => {
+    /**
+     * params berilmasa — barcha mijozlar (keshlanadi); { bbox: 'minLon,minLat,maxLon,maxLat' } —
+     * faqat ko'rinish oynasidagilar (har surilishda yangi oyna, keshlanmaydi)
+     */
+    getMapData: async (params = null) => {
+        if (params) return await apiGetFresh('/customers/map-data', params);
         return await apiRequest('/customers/map-data', {}, { key: 'customers_map' });
     }
 };
 
 // Sales API (keshlanadi)
 const salesAPI = {
-    getAll: async (startDate, endDate) => {
-        const params = new URLSearchParams();
-        if (startDate) params.append('start_date', startDate);
-        if (endDate) params.append('end_date', endDate);
-        const query = params.toString() ? `?${params.toString()}` : '';
-        const key = 'sales_' + (startDate || '') + '_' + (endDate || '');
-        return await apiRequest(`/sales${query}`, {}, { key });
+    /**
+     * Savdolar sahifasi: { items, next_cursor }
+     * @param {object} params — start_date, end_date, customer_id, product_id, min_amount, max_amount, limit, cursor
+     */
+    getPage: async (params = {}) => {
+        const q = new URLSearchParams();
+        Object.keys(params).forEach(k => {
+            if (params[k] !== undefined && params[k] !== null && params[k] !== '') q.append(k, params[k]);
+        });
+        const query = q.toString() ? `?${q.toString()}` : '';
+        return await apiRequest(`/sales${query}`, {}, { key: 'sales_' + q.toString() });
     },
     
     getOne: async (id) => {
         return await apiRequest(`/sales/${id}`, {}, { key: `sale_${id}` });
     },
     
+    /**
+     * Offline savdolar paketi — har birida client_key; qayta yuborish xavfsiz.
+     * { results: [{ index, client_key, status: created|duplicate|error, id, error }], ... }
+     */
+    sync: async (sales) => {
+        return await apiRequest('/sales/sync', {
+            method: 'POST',
+            body: JSON.stringify({ sales })
+        }, { invalidate: ['sales', 'dash', 'products', 'customers'] });
+    },
+    
+    /**
+     * CSV/XLSX faylni fon importiga yuboradi — { id, status, ... } (202)
+     */
+    importFile: async (file) => {
+        const form = new FormData();
+        form.append('file', file);
+        const response = await fetch(`${API_BASE_URL}/sales/import-jobs`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${(getAuthToken() || '').trim()}` },
+            body: form
+        });
+        const data = await response.json().catch(() => ({ error: 'Server xatosi' }));
+        if (!response.ok) throw new Error(data.error || 'Xatolik yuz berdi');
+        return data;
+    },
+    
+    // Holat tez-tez o'zgaradi — brauzer keshisiz to'g'ridan-to'g'ri so'raladi
+    getImportJob: async (id) => {
+        const response = await fetch(`${API_BASE_URL}/sales/import-jobs/${id}`, {
+            headers: { 'Authorization': `Bearer ${(getAuthToken() || '').trim()}` },
+            cache: 'no-store'
+        });
+        const data = await response.json().catch(() => ({ error: 'Server xatosi' }));
+        if (!response.ok) throw new Error(data.error || 'Xatolik yuz berdi');
+        return data;
+    },
+    
     create: async (saleData) => {
         return await apiRequest('/sales', {
             method: 'POST',
@@ -321,6 +432,38 @@ const salesAPI = {
     }
 };
 
+// Changes API — lokal nusxani delta bilan yangilash (keshlanmaydi)
+const changesAPI = {
+    /**
+     * since dan keyingi o'zgarishlar: { changes: [{ cursor, table, id, op: upsert|delete, data }], next_cursor, has_more }
+     * since berilmasa — faqat joriy next_cursor (to'liq ro'yxatni yuklashdan oldin oling)
+     */
+    get: async (since = null, limit = 500, tables = null) => {
+        const qs = new URLSearchParams({ limit });
+        if (since !== null) qs.set('since', since);
+        if (tables) qs.set('tables', tables.join(','));
+        const response = await fetch(`${API_BASE_URL}/changes?${qs}`, {
+            headers: { 'Authorization': `Bearer ${(getAuthToken() || '').trim()}` },
+            cache: 'no-store'
+        });
+        const data = await response.json().catch(() => ({ error: 'Server xatosi' }));
+        if (!response.ok) throw new Error(data.error || 'Xatolik yuz berdi');
+        return data;
+    }
+};
+
+// Geo API — eng yaqin nuqta va radius qidiruvi (keshlanmaydi)
+const geoAPI = {
+    /** params: { lat, lon } yoki { customer_id } / { shop_id }; target: 'shops' | 'customers'; k */
+    nearest: async (params) => {
+        return await apiGetFresh('/geo/nearest', params);
+    },
+    /** params: { lat, lon } yoki { customer_id } / { shop_id }; target; radius_km; limit */
+    within: async (params) => {
+        return await apiGetFresh('/geo/within', params);
+    }
+};
+
 // Config API (token keshlanadi)
 const configAPI = {
     getMapboxToken: async () => {
@@ -358,8 +501,18 @@ const regionsAPI = {
         }, { invalidate: ['regions', 'shops'] });
     },
     
-    getMapData: async () => {
+    /** params berilmasa — barcha hudud markerlari (keshlanadi); { bbox } — faqat ko'rinish oynasidagilar */
+    getMapData: async (params = null) => {
+        if (params) return await apiGetFresh('/regions/map-data', params);
         return await apiRequest('/regions/map-data', {}, { key: 'regions_map' });
+    },
+    
+    /** Poligonlar FeatureCollection; zoom berilsa — shu zoom uchun soddalashtirilgan */
+    getGeoJSON: async (zoom = null, status = null) => {
+        const params = {};
+        if (zoom !== null) params.zoom = zoom;
+        if (status) params.status = status;
+        return await apiGetFresh('/regions/geojson', params);
     }
 };
 